@@ -10,8 +10,20 @@ def help() -> None:
     print("Test")
 
 
+def compile_stix(*src_paths: str, snapshot_dir: str | None = None) -> None:
+    """
+    Compiles STIX bundles or folders (e.g. CAPEC, enterprise-attack.json) into the snapshots
+    the MITRE interactors open at startup.
+    """
+    from ragintel.tools.interactors.mitre import StixStore
+
+    for src_path in src_paths:
+        snapshot_path = StixStore.compile(src_path, snapshot_dir)
+        print(f"{src_path} -> {snapshot_path}")
+
+
 def main() -> None:
-    fire.Fire({"help": help})
+    fire.Fire({"help": help, "compile-stix": compile_stix})
 
 
 if __name__ == "__main__":
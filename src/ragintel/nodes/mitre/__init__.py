@@ -0,0 +1,19 @@
+from loguru import logger
+
+from ragintel.nodes.mitre.attack_nodes import (
+    AttackGroupNode,
+    AttackMitigationNode,
+    AttackObjectNode,
+    AttackSoftwareNode,
+    AttackTacticNode,
+    AttackTechniqueNode,
+)
+
+__all__ = [
+    "AttackGroupNode",
+    "AttackMitigationNode",
+    "AttackObjectNode",
+    "AttackSoftwareNode",
+    "AttackTacticNode",
+    "AttackTechniqueNode",
+]
@@ -0,0 +1,49 @@
+from loguru import logger
+from pydantic import BaseModel
+
+
+class AttackObjectNode(BaseModel):
+    node_type: str = "mitre_attack"
+    node_subtype: str
+    id: str
+    stix_id: str
+    name: str
+    description: str
+    url: str
+    domains: list[str]
+    version: str
+    modified: str
+
+    class Config:
+        populate_by_name = True
+
+
+class AttackTechniqueNode(AttackObjectNode):
+    node_subtype: str = "technique"
+    tactics: list[str]
+    platforms: list[str]
+    data_sources: list[str]
+    detection: str
+    is_subtechnique: bool
+    parent_id: str
+
+
+class AttackTacticNode(AttackObjectNode):
+    node_subtype: str = "tactic"
+    shortname: str
+
+
+class AttackGroupNode(AttackObjectNode):
+    node_subtype: str = "group"
+    aliases: list[str]
+
+
+class AttackSoftwareNode(AttackObjectNode):
+    node_subtype: str = "software"
+    software_type: str
+    aliases: list[str]
+    platforms: list[str]
+
+
+class AttackMitigationNode(AttackObjectNode):
+    node_subtype: str = "mitigation"
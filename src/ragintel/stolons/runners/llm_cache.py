@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from loguru import logger
+
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_MAX_BYTES = 64 * 1024**2
+
+
+class LLMResponseCache:
+    """SQLite store of LLM responses, keyed by the request that produced them.
+
+    The key covers the model and its sampling parameters, the hash of the fully rendered prompt
+    (retrieved context included) and the output schema, so a different model, setting or schema
+    never serves a stale answer. Values are the final outputs of a chain: plain text, or the JSON
+    of an already parsed structured result. Entries expire ttl seconds after they were written,
+    and once the store grows past max_bytes the least recently used entries are evicted.
+
+    Sampled responses are not reproducible, so the cache is only used when the temperature is at
+    most max_temperature.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path | None = None,
+        ttl: float | None = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_temperature: float = 0.0,
+    ):
+        """
+        Initialize the LLMResponseCache.
+
+        Args:
+            db_path (str | Path | None): Path to the SQLite database. Defaults to the
+                RAGINTEL_LLM_CACHE_PATH environment variable or "./data/llm_cache.sqlite".
+            ttl (float | None): Seconds a response is served for after being written. None keeps
+                responses until they are evicted. Default is 30 days.
+            max_bytes (int): Size of the stored responses the cache is trimmed to, in bytes.
+                Default is 64 MiB.
+            max_temperature (float): Highest temperature whose responses are cached.
+        """
+        if db_path is None:
+            db_path = os.getenv("RAGINTEL_LLM_CACHE_PATH", "./data/llm_cache.sqlite")
+
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key BLOB PRIMARY KEY,
+                value BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses(used_at)")
+        self.conn.commit()
+        (self._size,) = self.conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM responses"
+        ).fetchone()
+        logger.debug(f"Initialized LLMResponseCache at {self.db_path} ({self._size} bytes)")
+
+    def __reduce__(self):
+        # Worker processes reopen the same database rather than sharing the connection
+        return type(self), (self.db_path, self.ttl, self.max_bytes, self.max_temperature)
+
+    def cacheable(self, temperature: float | None) -> bool:
+        """
+        Whether responses sampled at a temperature are deterministic enough to be cached.
+        """
+        return (temperature or 0.0) <= self.max_temperature
+
+    @staticmethod
+    def key(
+        model: str,
+        temperature: float | None,
+        top_p: float | None,
+        max_tokens: int | None,
+        prompt: str,
+        schema: str,
+    ) -> bytes:
+        """
+        Builds the cache key of a request.
+
+        Args:
+            model (str): The model name.
+            temperature (float | None): The sampling temperature.
+            top_p (float | None): The nucleus sampling parameter.
+            max_tokens (int | None): The response token limit.
+            prompt (str): The rendered prompt sent to the model.
+            schema (str): Identifies the output the response is turned into, e.g. "text" or the
+                JSON schema of a Pydantic model.
+        """
+        params = json.dumps([model, temperature, top_p, max_tokens, schema])
+        digest = hashlib.blake2b(params.encode(), digest_size=16)
+        digest.update(b"\0" + hashlib.blake2b(prompt.encode()).digest())
+        return digest.digest()
+
+    def get(self, key: bytes) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and row[1] + self.ttl <= now:
+                with self.conn:
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= len(row[0])
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            # Mark the entry as recently used for eviction
+            with self.conn:
+                self.conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+
+        self.hits += 1
+        return row[0].decode("utf-8")
+
+    def put(self, key: bytes, value: str) -> None:
+        now = time.time()
+        blob = value.encode("utf-8")
+        with self._lock:
+            with self.conn:
+                (previous,) = self.conn.execute(
+                    "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, blob, now, now)
+                )
+            self._size += len(blob) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def purge_expired(self) -> int:
+        """
+        Deletes the responses older than the TTL.
+
+        Returns:
+            int: The number of deleted responses.
+        """
+        if self.ttl is None:
+            return 0
+
+        with self._lock, self.conn:
+            deleted = self.conn.execute(
+                "DELETE FROM responses WHERE created_at <= ?", (time.time() - self.ttl,)
+            ).rowcount
+            (self._size,) = self.conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM responses"
+            ).fetchone()
+        return deleted
+
+    def _evict(self) -> None:
+        # Expired responses go first, then the least recently used ones until the store is back
+        # to 90% of the limit, so that we do not evict again on every following put
+        target = int(self.max_bytes * 0.9)
+        with self.conn:
+            if self.ttl is not None:
+                self.conn.execute(
+                    "DELETE FROM responses WHERE created_at <= ?", (time.time() - self.ttl,)
+                )
+            (self._size,) = self.conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM responses"
+            ).fetchone()
+
+            evicted = []
+            excess = self._size - target
+            rows = self.conn.execute("SELECT key, LENGTH(value) FROM responses ORDER BY used_at")
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                evicted.append((key,))
+                excess -= size
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+            (self._size,) = self.conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM responses"
+            ).fetchone()
+
+        logger.debug(f"Evicted {len(evicted)} LLM responses, {self._size} bytes remain")
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self) -> None:
+        self.conn.close()
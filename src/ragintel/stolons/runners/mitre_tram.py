@@ -1,14 +1,141 @@
+import multiprocessing
+import os
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import NamedTuple
+
+import numpy as np
 import pandas as pd
 import torch
 import transformers
 from loguru import logger
 from tqdm import tqdm
 
+from ragintel.stolons.runners.tram_cache import WindowPredictionCache, model_fingerprint
 from ragintel.utils.base import config_loader
 
+DEFAULT_MODEL_PATH = "scibert_multi_label_model"
+DEFAULT_TOKENIZER = "allenai/scibert_scivocab_uncased"
+
+# BERT's position embeddings stop at 512 tokens
+MAX_SEQUENCE_LENGTH = 512
+
+# Columns of the predict_multi_label result. start and end are character offsets of the
+# segment in the document
+SEGMENT_COLUMNS = ["segment", "label(s)", "start", "end"]
+
+# Checked by verify_onnx_backend, covers the kind of behaviour descriptions the model tags
+CALIBRATION_TEXT = (
+    "The threat actor sent spearphishing emails with a malicious Word attachment that dropped a "
+    "loader to the user's AppData folder. The loader created a scheduled task and a registry "
+    "run key for persistence, then injected its payload into a legitimate process. It used "
+    "PowerShell and cmd.exe to enumerate running processes, installed security software, the "
+    "network configuration and the logged-on user. Credentials were dumped from LSASS memory "
+    "with a renamed copy of a common tool. The operators moved laterally over RDP with valid "
+    "domain accounts and deployed a remote access tool on several servers. Collected files were "
+    "staged in a hidden directory, compressed and exfiltrated over the existing HTTPS command "
+    "and control channel, after which the tools and logs were deleted from disk."
+)
+
+# Code points str.split() treats as separators (none exist above U+3000)
+WHITESPACE_CODE_POINTS = np.array([c for c in range(0x3001) if chr(c).isspace()], dtype=np.uint32)
+
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS and Windows
+        return os.cpu_count() or 1
+
+
+# The interactor of a predict_many worker process, created once by _init_worker
+_worker_interactor: "MitreTRAMInteractor | None" = None
+
+
+def _init_worker(interactor_kwargs: dict) -> None:
+    global _worker_interactor  # noqa: PLW0603
+    _worker_interactor = MitreTRAMInteractor(**interactor_kwargs)
+
+
+def _predict_documents(
+    documents: list[str], threshold: float, n: int, stride: int
+) -> list[pd.DataFrame]:
+    return _worker_interactor.predict_documents(documents, threshold, n, stride)
+
+
+class TokenWindows(NamedTuple):
+    """Overlapping windows over a single tokenization of a document.
+
+    Windows are [starts[i], ends[i]) ranges into input_ids, which holds the document's tokens
+    without special tokens. offsets maps every token back to its characters in the document.
+    """
+
+    document: str
+    input_ids: torch.Tensor
+    offsets: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+
+    @property
+    def count(self) -> int:
+        return len(self.starts)
+
+    def window(self, index: int) -> torch.Tensor:
+        # A view into input_ids, no copy
+        return self.input_ids[self.starts[index] : self.ends[index]]
+
+    def text(self, first: int, last: int | None = None) -> str:
+        """
+        Returns the document text spanned by windows first to last (inclusive).
+        """
+        last = first if last is None else last
+        return self.document[
+            self.offsets[self.starts[first], 0] : self.offsets[self.ends[last] - 1, 1]
+        ]
+
 
 class MitreTRAMInteractor:
-    def __init__(self, api_key: str | None = None, config_file: str | None = None):
+    def __init__(
+        self,
+        api_key: str | None = None,
+        config_file: str | None = None,
+        model_path: str = DEFAULT_MODEL_PATH,
+        tokenizer_path: str = DEFAULT_TOKENIZER,
+        device: str | None = None,
+        num_threads: int | None = None,
+        max_batch_tokens: int = 8192,
+        max_batch_size: int = 64,
+        backend: str = "torch",
+        onnx_dir: str | None = None,
+        onnx_sessions: int = 1,
+        agreement_tolerance: float = 0.02,
+        prediction_cache: WindowPredictionCache | None = None,
+    ):
+        """
+        Initialize the MitreTRAMInteractor.
+
+        Args:
+            api_key (str | None): The API key, unused by the local model.
+            config_file (str | None): The path to the configuration file.
+            model_path (str): Path or hub name of the fine-tuned SciBERT multi-label model.
+            tokenizer_path (str): Path or hub name of the tokenizer.
+            device (str | None): Torch device, e.g. "cpu". Defaults to CUDA when available.
+            num_threads (int | None): Intra-op threads used by torch on CPU. Defaults to the
+                number of CPUs this process may run on.
+            max_batch_tokens (int): Token budget of a batch (rows x padded length). Batches of
+                short windows hold more rows than batches of long ones.
+            max_batch_size (int): Maximum number of windows in a batch.
+            backend (str): "torch" runs the model in PyTorch. "onnx" runs a cached, dynamically
+                quantized int8 ONNX export with ONNX Runtime (CPU only), see OnnxTRAMBackend.
+            onnx_dir (str | None): Where ONNX exports are cached.
+            onnx_sessions (int): Number of pooled ONNX Runtime sessions.
+            agreement_tolerance (float): Maximum fraction of calibration windows whose labels
+                may differ between the ONNX and PyTorch backends. Above it, the interactor falls
+                back to PyTorch.
+            prediction_cache (WindowPredictionCache | None): Cache of window probabilities.
+                Windows found in it are not run through the model again. Default is None.
+        """
         if config_file is not None:
             _config_loader = config_loader.ConfigLoader()
             config = _config_loader.load_config(config_file)
@@ -21,13 +148,52 @@ class MitreTRAMInteractor:
                 msg = "Missing API key"
                 raise ValueError(msg)
 
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        bert = (
-            transformers.BertForSequenceClassification.from_pretrained("scibert_multi_label_model")
-            .to(device)
-            .eval()
-        )
-        tokenizer = transformers.BertTokenizer.from_pretrained("allenai/scibert_scivocab_uncased")
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        if self.device.type == "cpu":
+            self._configure_threads(num_threads)
+
+        self.model_path = model_path
+        self.backend = backend
+        # Recreates an equivalent interactor in predict_many worker processes
+        self._worker_kwargs = {
+            "model_path": model_path,
+            "tokenizer_path": tokenizer_path,
+            "device": "cpu",
+            "max_batch_tokens": max_batch_tokens,
+            "max_batch_size": max_batch_size,
+            "backend": backend,
+            "onnx_dir": onnx_dir,
+            "agreement_tolerance": agreement_tolerance,
+            "prediction_cache": prediction_cache,
+        }
+        self.prediction_cache = prediction_cache
+        self._model_versions: dict[str, str] = {}
+        self.bert = None
+        self.onnx_backend = None
+        if backend == "onnx":
+            try:
+                from ragintel.stolons.runners.tram_onnx import OnnxTRAMBackend
+            except ImportError:
+                logger.error("Missing onnxruntime library")
+                raise
+
+            # The PyTorch model is only loaded when the export is not cached yet
+            self.onnx_backend = OnnxTRAMBackend.from_pretrained(
+                model_path,
+                load_model=self._load_torch_model,
+                cache_dir=onnx_dir,
+                sessions=onnx_sessions,
+                num_threads=num_threads,
+            )
+        elif backend == "torch":
+            self.bert = self._load_torch_model()
+        else:
+            msg = f"Unsupported backend: {backend}"
+            raise ValueError(msg)
+
+        self.tokenizer = transformers.BertTokenizerFast.from_pretrained(tokenizer_path)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
 
         self.CLASSES = (
             "T1003.001",
@@ -157,55 +323,455 @@ class MitreTRAMInteractor:
             "T1078.002": "Domain Accounts",
         }
 
-        def create_subsequences(self, document: str, n: int = 13, stride: int = 5) -> list[str]:
-            words = document.split()
-            return [" ".join(words[i : i + n]) for i in range(0, len(words), stride)]
-
-        def predict_multi_label(
-            self, document: str, threshold: float = 0.5, n: int = 13, stride: int = 5
-        ):
-            text_instances = create_subsequences(document, n, stride)
-            tokenized_instances = tokenizer(
-                text_instances,
-                return_tensors="pt",
-                padding="max_length",
-                truncation=True,
-                max_length=512,
-            ).input_ids
-
-            predictions = []
-            batch_size = 10
-            slice_starts = tqdm(list(range(0, tokenized_instances.shape[0], batch_size)))
-
-            with torch.no_grad():
-                for i in slice_starts:
-                    x = tokenized_instances[i : i + batch_size].to(device)
-                    out = bert(x, attention_mask=x.ne(tokenizer.pad_token_id).to(int))
-                    predictions.extend(out.logits.sigmoid().to("cpu"))
-
-            probabilities = pd.DataFrame(
-                torch.vstack(predictions), columns=self.CLASSES, index=text_instances
+        if self.onnx_backend is not None:
+            agreement = self.onnx_backend.metadata.get("agreement")
+            if agreement is None:
+                self.verify_onnx_backend(tolerance=agreement_tolerance)
+            elif agreement < 1 - agreement_tolerance:
+                logger.warning(f"Cached ONNX export only agreed on {agreement:.1%} of windows")
+                self._fall_back_to_torch()
+
+    def _load_torch_model(self) -> transformers.BertForSequenceClassification:
+        return (
+            transformers.BertForSequenceClassification.from_pretrained(self.model_path)
+            .to(self.device)
+            .eval()
+        )
+
+    def _fall_back_to_torch(self) -> None:
+        logger.warning("Falling back to the PyTorch backend")
+        self.onnx_backend = None
+        self.backend = "torch"
+        if self.bert is None:
+            self.bert = self._load_torch_model()
+
+    def verify_onnx_backend(
+        self, document: str = CALIBRATION_TEXT, threshold: float = 0.5, tolerance: float = 0.02
+    ) -> float:
+        """
+        Compares the labels of the ONNX backend with those of the PyTorch model on a document,
+        records the result next to the cached export, and falls back to PyTorch if they agree
+        on less than 1 - tolerance of the windows.
+
+        Returns:
+            float: The fraction of windows with identical labels.
+        """
+        windows = self.tokenize_windows(document)
+        slices = [windows.window(i) for i in range(windows.count)]
+
+        # Both backends have to actually run, not serve cached windows
+        prediction_cache = self.prediction_cache
+        onnx_backend = self.onnx_backend
+        self.prediction_cache = None
+        try:
+            onnx_probabilities = self.predict_token_windows(
+                slices, show_progress=False, add_special_tokens=True
+            )
+            self.onnx_backend = None
+            self.bert = self.bert or self._load_torch_model()
+            torch_probabilities = self.predict_token_windows(
+                slices, show_progress=False, add_special_tokens=True
+            )
+        finally:
+            self.onnx_backend = onnx_backend
+            self.prediction_cache = prediction_cache
+
+        from ragintel.stolons.runners.tram_onnx import label_agreement
+
+        agreement = label_agreement(torch_probabilities, onnx_probabilities, threshold)
+        max_abs_diff = float(np.abs(torch_probabilities - onnx_probabilities).max(initial=0))
+        self.onnx_backend.record_agreement(agreement, max_abs_diff)
+        logger.info(
+            f"ONNX backend agrees with PyTorch on {agreement:.1%} of windows "
+            f"(max probability difference {max_abs_diff:.4f})"
+        )
+
+        if agreement < 1 - tolerance:
+            self._fall_back_to_torch()
+        else:
+            # Only the ONNX sessions are needed from now on
+            self.bert = None
+        return agreement
+
+    def _configure_threads(self, num_threads: int | None) -> None:
+        num_threads = num_threads or _available_cpus()
+        torch.set_num_threads(num_threads)
+        try:
+            # Batches are run one after another, inter-op parallelism only adds contention
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Can only be set before torch runs its first parallel work in this process
+            pass
+        logger.debug(f"Running torch on {num_threads} CPU threads")
+
+    def create_subsequences(self, document: str, n: int = 13, stride: int = 5) -> list[str]:
+        words = document.split()
+        return [" ".join(words[i : i + n]) for i in range(0, len(words), stride)]
+
+    def tokenize_windows(self, document: str, n: int = 13, stride: int = 5) -> TokenWindows:
+        """
+        Tokenizes a document once and lays windows of n words every stride words over it.
+
+        Words are whitespace-separated, as in create_subsequences, and are located from the
+        character gaps between token offsets, so no window text is built or tokenized again.
+        Windows longer than the model's 512 tokens are truncated.
+
+        Args:
+            document (str): The report text.
+            n (int): Words per window. Default is 13.
+            stride (int): Words between the starts of consecutive windows. Default is 5.
+
+        Returns:
+            TokenWindows: The document tokens and the token range of every window.
+        """
+        encoding = self.tokenizer(
+            document,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False,
+        )
+        input_ids = torch.tensor(encoding.input_ids, dtype=torch.long)
+        offsets = np.asarray(encoding.offset_mapping, dtype=np.int64).reshape(-1, 2)
+        num_tokens = len(input_ids)
+        if num_tokens == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return TokenWindows(document, input_ids, offsets, empty, empty)
+
+        # A token starts a new word when whitespace sits between it and the previous token
+        code_points = np.frombuffer(document.encode("utf-32-le"), dtype="<u4")
+        whitespace = np.concatenate(([0], np.cumsum(np.isin(code_points, WHITESPACE_CODE_POINTS))))
+        gap_has_whitespace = whitespace[offsets[1:, 0]] > whitespace[offsets[:-1, 1]]
+        word_starts = np.concatenate(([0], np.flatnonzero(gap_has_whitespace) + 1))
+
+        window_words = np.arange(0, len(word_starts), stride)
+        starts = word_starts[window_words]
+        end_words = window_words + n
+        ends = np.where(
+            end_words < len(word_starts),
+            word_starts[np.minimum(end_words, len(word_starts) - 1)],
+            num_tokens,
+        )
+        ends = np.minimum(ends, starts + MAX_SEQUENCE_LENGTH - 2)
+        return TokenWindows(document, input_ids, offsets, starts, ends)
+
+    def _iter_batches(self, lengths: np.ndarray) -> Iterator[np.ndarray]:
+        """
+        Groups sequence indices into batches of similar length.
+
+        Sequences are sorted by length so each batch is padded only to its own longest member,
+        and each batch takes as many rows as fit in max_batch_tokens at that length.
+        """
+        order = np.argsort(lengths, kind="stable")
+        start = 0
+        while start < len(order):
+            end = start + 1
+            while end < len(order) and end - start < self.max_batch_size:
+                # Sorted ascending, so the candidate sets the padded length of the batch
+                if (end - start + 1) * lengths[order[end]] > self.max_batch_tokens:
+                    break
+                end += 1
+            yield order[start:end]
+            start = end
+
+    @property
+    def model_version(self) -> str:
+        """
+        Identifies the model and the backend currently running it, e.g. in prediction cache keys.
+        """
+        backend = "onnx" if self.onnx_backend is not None else "torch"
+        if backend not in self._model_versions:
+            if backend == "onnx":
+                runtime = f"onnx:{self.onnx_backend.model_file.parent.name}"
+            else:
+                runtime = f"torch:{torch.__version__}:{transformers.__version__}"
+            self._model_versions[backend] = model_fingerprint(self.model_path, runtime)
+        return self._model_versions[backend]
+
+    def predict_token_windows(
+        self,
+        windows: Sequence[Sequence[int] | torch.Tensor],
+        show_progress: bool = True,
+        add_special_tokens: bool = False,
+    ) -> np.ndarray:
+        """
+        Runs the classifier over tokenized windows.
+
+        With a prediction cache, windows found in it are served from it and only the others are
+        batched and run through the model. Repeated windows are run once.
+
+        Args:
+            windows (Sequence[Sequence[int] | torch.Tensor]): Input ids of each window, at most
+                512 tokens each including special tokens.
+            show_progress (bool): Display a progress bar over batches. Default is True.
+            add_special_tokens (bool): Wrap every window in [CLS] ... [SEP] while building its
+                batch. Set it for windows sliced from a tokenization without special tokens.
+
+        Returns:
+            np.ndarray: Label probabilities, one row per window in input order and one column
+            per entry of CLASSES.
+        """
+        probabilities = np.zeros((len(windows), len(self.CLASSES)), dtype=np.float32)
+        if not windows:
+            return probabilities
+
+        if self.prediction_cache is None:
+            self._predict_into(
+                probabilities, windows, np.arange(len(windows)), show_progress, add_special_tokens
+            )
+            return probabilities
+
+        model_version = self.model_version
+        special = (
+            ([self.tokenizer.cls_token_id], [self.tokenizer.sep_token_id])
+            if add_special_tokens
+            else ([], [])
+        )
+        keys = [
+            self.prediction_cache.key(
+                model_version, np.concatenate([special[0], np.asarray(window), special[1]])
             )
+            for window in windows
+        ]
+        cached = self.prediction_cache.get_many(keys)
+
+        # The first occurrence of every key that is not cached runs through the model
+        first_index: dict[bytes, int] = {}
+        for index, key in enumerate(keys):
+            if key in cached:
+                probabilities[index] = cached[key]
+            else:
+                first_index.setdefault(key, index)
+
+        if first_index:
+            misses = np.fromiter(first_index.values(), dtype=np.int64, count=len(first_index))
+            self._predict_into(probabilities, windows, misses, show_progress, add_special_tokens)
+            self.prediction_cache.put_many(
+                {key: probabilities[index] for key, index in first_index.items()}
+            )
+            for index, key in enumerate(keys):
+                if key in first_index:
+                    probabilities[index] = probabilities[first_index[key]]
+
+        logger.debug(
+            f"Served {len(windows) - len(first_index)}/{len(windows)} windows without the model "
+            f"(cache hit rate {self.prediction_cache.hit_rate:.1%})"
+        )
+        return probabilities
+
+    def _predict_into(
+        self,
+        probabilities: np.ndarray,
+        windows: Sequence[Sequence[int] | torch.Tensor],
+        indices: np.ndarray,
+        show_progress: bool,
+        add_special_tokens: bool,
+    ) -> None:
+        # Runs the windows at indices through the model, in length-bucketed batches
+        extra = 2 if add_special_tokens else 0
+        lengths = np.fromiter((len(windows[i]) + extra for i in indices), dtype=np.int64)
+        batches = list(self._iter_batches(lengths))
+        pad_token_id = self.tokenizer.pad_token_id
 
-            result: list[tuple[str, set[str]]] = [
-                (text, {self.ID_TO_NAME[k] + " - " + k for k, v in clses.items() if v})
-                for text, clses in probabilities.gt(threshold).T.to_dict().items()
-            ]
+        with torch.inference_mode():
+            for batch in tqdm(batches, disable=not show_progress):
+                max_length = int(lengths[batch].max())
+                input_ids = torch.full((len(batch), max_length), pad_token_id, dtype=torch.long)
+                for row, position in enumerate(batch):
+                    length = lengths[position]
+                    window = torch.as_tensor(windows[indices[position]])
+                    if add_special_tokens:
+                        input_ids[row, 0] = self.tokenizer.cls_token_id
+                        input_ids[row, 1 : length - 1] = window
+                        input_ids[row, length - 1] = self.tokenizer.sep_token_id
+                    else:
+                        input_ids[row, :length] = window
+                attention_mask = (
+                    torch.arange(max_length) < torch.as_tensor(lengths[batch])[:, None]
+                ).long()
 
-            result_iter = iter(result)
-            current_text, current_labels = next(result_iter)
-            overlap = n - stride
-            out = []
+                probabilities[indices[batch]] = self._forward(input_ids, attention_mask)
+
+    def _forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> np.ndarray:
+        if self.onnx_backend is not None:
+            logits = self.onnx_backend.predict_logits(input_ids.numpy(), attention_mask.numpy())
+            # Numerically stable sigmoid
+            return np.exp(-np.logaddexp(0, -logits)).astype(np.float32)
+
+        logits = self.bert(
+            input_ids.to(self.device), attention_mask=attention_mask.to(self.device)
+        ).logits
+        return logits.sigmoid().float().cpu().numpy()
+
+    def predict_proba(self, texts: list[str], show_progress: bool = True) -> np.ndarray:
+        """
+        Returns the label probabilities of each text, see predict_token_windows.
+        """
+        # No padding here, every batch is padded to its own longest window later
+        input_ids = self.tokenizer(
+            texts, truncation=True, max_length=MAX_SEQUENCE_LENGTH, padding=False
+        ).input_ids
+        return self.predict_token_windows(input_ids, show_progress=show_progress)
+
+    def _segments(
+        self, windows: TokenWindows, probabilities: np.ndarray, threshold: float
+    ) -> pd.DataFrame:
+        if not windows.count:
+            return pd.DataFrame(columns=SEGMENT_COLUMNS)
+
+        # Run-length encode the label vectors: a segment starts at every window whose labels
+        # differ from the previous window's
+        predicted = probabilities > threshold
+        changed = np.any(predicted[1:] != predicted[:-1], axis=1)
+        firsts = np.flatnonzero(np.concatenate(([True], changed)))
+        lasts = np.append(firsts[1:] - 1, windows.count - 1)
+
+        # Character spans of the segments, from the first and last window's token offsets
+        starts = windows.offsets[windows.starts[firsts], 0]
+        ends = windows.offsets[windows.ends[lasts] - 1, 1]
+
+        # Label names are only looked up once per segment, not once per window
+        labels = [
+            {f"{self.ID_TO_NAME[self.CLASSES[k]]} - {self.CLASSES[k]}" for k in np.flatnonzero(row)}
+            for row in predicted[firsts]
+        ]
+        return pd.DataFrame(
+            {
+                "segment": [windows.document[start:end] for start, end in zip(starts, ends)],
+                "label(s)": labels,
+                "start": starts,
+                "end": ends,
+            },
+            columns=SEGMENT_COLUMNS,
+        )
+
+    def predict_documents(
+        self,
+        documents: Sequence[str],
+        threshold: float = 0.5,
+        n: int = 13,
+        stride: int = 5,
+        show_progress: bool = False,
+    ) -> list[pd.DataFrame]:
+        """
+        Tags several documents at once. The windows of all documents are packed into shared
+        batches, which keeps batches full even when each document is short.
+
+        Returns:
+            list[pd.DataFrame]: The segments of each document, see predict_multi_label.
+        """
+        all_windows = [self.tokenize_windows(document, n, stride) for document in documents]
+        slices = [windows.window(i) for windows in all_windows for i in range(windows.count)]
+        probabilities = self.predict_token_windows(
+            slices, show_progress=show_progress, add_special_tokens=True
+        )
+
+        bounds = np.cumsum([0] + [windows.count for windows in all_windows])
+        return [
+            self._segments(windows, probabilities[bounds[i] : bounds[i + 1]], threshold)
+            for i, windows in enumerate(all_windows)
+        ]
+
+    def predict_multi_label(
+        self, document: str, threshold: float = 0.5, n: int = 13, stride: int = 5
+    ) -> pd.DataFrame:
+        """
+        Tags the segments of a document with the ATT&CK techniques the model detects in them.
+
+        The document is tokenized once and split into overlapping windows of n words every
+        stride words (see tokenize_windows). Each window is classified, and consecutive windows
+        with the same labels are merged into a segment.
+
+        Args:
+            document (str): The report text.
+            threshold (float): Probability above which a label is assigned. Default is 0.5.
+            n (int): Words per window. Default is 13.
+            stride (int): Words between the starts of consecutive windows. Default is 5.
+
+        Returns:
+            pd.DataFrame: One row per segment, with its text ("segment"), the set of
+                "Name - ID" techniques ("label(s)") and its character span in the document
+                ("start", "end").
+        """
+        return self.predict_documents([document], threshold, n, stride, show_progress=True)[0]
+
+    def predict_many(
+        self,
+        documents: Iterable[str],
+        threshold: float = 0.5,
+        n: int = 13,
+        stride: int = 5,
+        workers: int | None = None,
+        docs_per_task: int = 8,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Tags a stream of documents, yielding the segments of each document in input order.
+
+        Documents are consumed lazily in groups of docs_per_task whose windows share batches.
+        With workers set, groups are spread over that many worker processes, each holding its
+        own copy of the model and an equal share of the CPU threads. Only about two groups per
+        worker are in flight at a time, so memory stays flat on corpora of any size.
+
+        Args:
+            documents (Iterable[str]): The report texts.
+            threshold (float): Probability above which a label is assigned. Default is 0.5.
+            n (int): Words per window. Default is 13.
+            stride (int): Words between the starts of consecutive windows. Default is 5.
+            workers (int | None): Number of worker processes. If None, documents are tagged in
+                this process. Default is None.
+            docs_per_task (int): Documents per batch group. Default is 8.
+
+        Yields:
+            pd.DataFrame: The segments of each document, see predict_multi_label.
+        """
+        pending = iter(documents)
+
+        def next_group() -> list[str]:
+            return list(islice(pending, docs_per_task))
+
+        if workers is None or workers <= 1 or self.device.type != "cpu":
+            while group := next_group():
+                yield from self.predict_documents(group, threshold, n, stride)
+            return
+
+        interactor_kwargs = {
+            **self._worker_kwargs,
+            "num_threads": max(1, _available_cpus() // workers),
+        }
+        # Forking a process that already runs torch's thread pools can deadlock, so spawn
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(interactor_kwargs,),
+        ) as executor:
+            in_flight: dict[int, Future] = {}
+            done: dict[int, list[pd.DataFrame]] = {}
+            next_to_submit = 0
+            next_to_yield = 0
+            exhausted = False
+            max_in_flight = workers * 2
 
-            for text, labels in result_iter:
-                if labels != current_labels:
-                    out.append((current_text, current_labels))
-                    current_text = text
-                    current_labels = labels
-                    continue
+            while not exhausted or next_to_yield < next_to_submit:
+                while not exhausted and len(in_flight) + len(done) < max_in_flight:
+                    group = next_group()
+                    if not group:
+                        exhausted = True
+                        break
+                    in_flight[next_to_submit] = executor.submit(
+                        _predict_documents, group, threshold, n, stride
+                    )
+                    next_to_submit += 1
 
-                current_text += " " + " ".join(text.split()[overlap:])
+                if next_to_yield < next_to_submit and next_to_yield not in done:
+                    wait(in_flight.values(), return_when=FIRST_COMPLETED)
+                    for index, future in list(in_flight.items()):
+                        if future.done():
+                            done[index] = future.result()
+                            del in_flight[index]
 
-            out_df = pd.DataFrame(out)
-            out_df.columns = ["segment", "label(s)"]
-            return out_df
+                # Yield finished groups strictly in input order
+                while next_to_yield in done:
+                    yield from done.pop(next_to_yield)
+                    next_to_yield += 1
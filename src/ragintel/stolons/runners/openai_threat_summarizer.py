@@ -32,19 +32,120 @@ EXAMPLE: |
 
     structured_response = interactor.interact_structured("What is the capital of France?")
     print(structured_response)
+
+    summaries = interactor.interact_structured_many(reports, max_concurrency=16)
 """
 
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from typing import TYPE_CHECKING, Any
+
+import httpx
+from box import Box
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda, RunnablePassthrough
 from langchain_openai import ChatOpenAI
 from loguru import logger
 from pydantic import BaseModel
 
+from ragintel.stolons.runners.llm_cache import LLMResponseCache
 from ragintel.stolons.templates import RagIntelMITRE
-from ragintel.tools import opensearchdb_tools
-from ragintel.utils.base import config_loader
+from ragintel.utils.background_loop import BackgroundLoop
+
+if TYPE_CHECKING:
+    from ragintel.tools.archivers.opensearch import OpenSearchDB
+
+# Number of compiled chains (one per prompt template and output model) kept per interactor
+CHAIN_CACHE_SIZE = 16
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+SIMPLE_TEXT_TEMPLATE = """
+                Use the following pieces of context to answer the query at the end.
+                If you don't know the answer, just say that you don't know, don't try to make up an answer.
+
+                {context}
+
+                Query: {query}
+
+                Helpful answer:
+                """
+
+PROMPT_JSON_TEMPLATE = """
+                Use the following pieces of context to answer the query at the end.
+                If you don't know the answer, just say that you don't know, don't try to make up an answer.
+                Return structured JSON in your responses:
+
+                {context}
+
+                Wuery: {query}
+
+                JSON formatted helpful answer:
+                """
+
+STRUCTURED_TEMPLATE = """
+            Use the following pieces of context to answer the query at the end.
+            If you don't know the answer, just say that you don't know, don't try to make up an answer.
+
+            {context}
+
+            Query: {query}
+
+            These are the format intructions: {format_instructions}
+            """
+
+# Every ChatOpenAI model of the process shares these pooled HTTP clients, so connections to the
+# API are kept alive across interactors, chains and calls. The async client is only ever used on
+# the shared loop, as its connection pool is bound to the event loop that opened it.
+# Both are keyed by pid: a forked child inherits neither the connections nor the loop thread of
+# its parent, so it gets its own.
+_LOOPS: dict[int, BackgroundLoop] = {}
+_HTTP_CLIENTS: dict[int, tuple[httpx.Client, httpx.AsyncClient]] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def _reset_shared_lock() -> None:
+    # The lock may have been held by another thread of the parent at the time of the fork
+    global _SHARED_LOCK  # noqa: PLW0603
+    _SHARED_LOCK = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_shared_lock)
+
+
+def shared_loop() -> BackgroundLoop:
+    """
+    Returns the background event loop that batched requests run on in the current process.
+    """
+    with _SHARED_LOCK:
+        loop = _LOOPS.get(os.getpid())
+        if loop is None:
+            loop = _LOOPS[os.getpid()] = BackgroundLoop(name="ragintel-openai")
+        return loop
+
+
+def shared_http_clients() -> tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    Returns the pooled sync and async HTTP clients of the current process.
+    """
+    with _SHARED_LOCK:
+        clients = _HTTP_CLIENTS.get(os.getpid())
+        if clients is None:
+            limits = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+            timeout = httpx.Timeout(120.0, connect=10.0)
+            clients = (
+                httpx.Client(limits=limits, timeout=timeout),
+                httpx.AsyncClient(limits=limits, timeout=timeout),
+            )
+            _HTTP_CLIENTS[os.getpid()] = clients
+        return clients
 
 
 class OpenAIInteractor:
@@ -52,38 +153,89 @@ class OpenAIInteractor:
         self,
         api_key: str | None = None,
         config_file: str | None = None,
-        rag_db: opensearchdb_tools.OpenSearchDB = None,
+        rag_db: "OpenSearchDB" = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        response_cache: LLMResponseCache | None = None,
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.0,
+        max_tokens: int | None = None,
+        top_p: float = 1.0,
+        stream: bool = False,
     ):
         """
         Initialize the OpenAIInteractor.
 
         Args:
-            api_key (str): The API key for the OpenAI language model.
-            config_file (str): The path to the configuration file.
+            api_key (str): The API key for the OpenAI language model. Defaults to the
+                OPENAI_API_KEY environment variable.
+            config_file (str): The path to a YAML configuration file. The settings of its
+                llm.config section take precedence over the arguments below.
             rag_db (opensearchdb.OpenSearchDB): An instance of OpenSearchDB for retrieving documents.
+            max_concurrency (int): Default number of queries interact_many and
+                interact_structured_many send to the model at the same time.
+            response_cache (LLMResponseCache | None): If given, responses are served from this
+                cache for prompts already answered with the same model settings, as long as the
+                temperature is low enough for the cache.
+            model (str): The OpenAI model name.
+            temperature (float): The sampling temperature.
+            max_tokens (int | None): The response token limit.
+            top_p (float): The nucleus sampling parameter.
+            stream (bool): Stream the responses of the model.
 
         Raises:
             ValueError: If the API key is missing.
         """
         # Load configuration from file if provided
+        config = Box(default_box=True)
         if config_file is not None:
-            _config_loader = config_loader.ConfigLoader()
-            config = _config_loader.load_config(config_file)
-        else:
-            try:
-                self.OPENAI_API_KEY = api_key
-            except ValueError:
-                logger.error("Missing API key")
+            config = Box.from_yaml(filename=config_file, default_box=True).llm.config
+            logger.info(f"Loaded LLM configuration from {config_file}")
 
         # Set configuration values
-        self.OPENAI_API_KEY = config.llm.config.api_key
-        self.llm_model = config.llm.config.model
-        self.llm_temperature = config.llm.config.temperature
-        self.llm_max_tokens = config.llm.config.max_tokens
-        self.llm_top_p = config.llm.config.top_p
-        self.llm_stream = config.llm.config.stream
+        self.OPENAI_API_KEY = config.api_key or api_key or os.getenv("OPENAI_API_KEY")
+        if not self.OPENAI_API_KEY:
+            msg = "Missing OpenAI API key"
+            raise ValueError(msg)
+        self.llm_model = config.model or model
+        self.llm_temperature = config.get("temperature", temperature)
+        self.llm_max_tokens = config.get("max_tokens", max_tokens)
+        self.llm_top_p = config.get("top_p", top_p)
+        self.llm_stream = config.get("stream", stream)
         self.rag_db = rag_db
         self.retriever = self.rag_db.vector_store.as_retriever()
+        self.max_concurrency = max_concurrency
+        self.response_cache = response_cache
+        self._llm: ChatOpenAI | None = None
+        self._llm_pid: int | None = None
+        self._chains: OrderedDict[Hashable, Runnable] = OrderedDict()
+        self._chains_lock = threading.Lock()
+
+    def _reset_after_fork(self) -> None:
+        # The model built by a parent process holds its HTTP clients, and so do the chains
+        # built on that model, so a forked child starts over with its own
+        if self._llm_pid is not None and self._llm_pid != os.getpid():
+            self._llm = self._llm_pid = None
+            self._chains.clear()
+            self._chains_lock = threading.Lock()
+
+    @property
+    def llm(self) -> ChatOpenAI:
+        """The chat model shared by all the chains of this interactor."""
+        self._reset_after_fork()
+        if self._llm is None:
+            http_client, http_async_client = shared_http_clients()
+            self._llm = ChatOpenAI(
+                openai_api_key=self.OPENAI_API_KEY,
+                model=self.llm_model,
+                temperature=self.llm_temperature,
+                max_tokens=self.llm_max_tokens,
+                top_p=self.llm_top_p,
+                streaming=self.llm_stream,
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+            self._llm_pid = os.getpid()
+        return self._llm
 
     def format_docs(self, docs):
         """
@@ -97,85 +249,206 @@ class OpenAIInteractor:
         """
         return "\n\n".join([d.page_content for d in docs])
 
-    def interact(
-        self, query: str, template_type: str = "simple_text", template: str | None = None
-    ) -> str:
+    def _cached_chain(self, key: Hashable, build: Callable[[], Runnable]) -> Runnable:
+        # Small LRU of compiled chains, so that repeated calls only pay for the request itself
+        self._reset_after_fork()
+        with self._chains_lock:
+            chain = self._chains.get(key)
+            if chain is None:
+                chain = self._chains[key] = build()
+                if len(self._chains) > CHAIN_CACHE_SIZE:
+                    self._chains.popitem(last=False)
+            else:
+                self._chains.move_to_end(key)
+            return chain
+
+    def _generate(
+        self,
+        output: Runnable,
+        schema: str,
+        dump: Callable[[Any], str],
+        load: Callable[[str], Any],
+    ) -> Runnable:
         """
-        Interact with the language model and generate a plain text response.
+        Wraps the model and output parser of a chain with the response cache.
 
         Args:
-            query (str): The query to generate a response for.
-            template_type (str): The type of template to use for the response.
-            template (str): The custom template to use for the response.
-
-        Returns:
-            str: The generated response.
+            output (Runnable): Turns a rendered prompt into the final output, i.e. the model
+                followed by the output parser.
+            schema (str): Identifies the output in cache keys.
+            dump (Callable): Serializes an output for the cache.
+            load (Callable): Rebuilds an output from the cache.
         """
-        # RAG prompt
+        cache = self.response_cache
+        if cache is None:
+            return output
+        if not cache.cacheable(self.llm_temperature):
+            logger.info(
+                f"Not caching responses: temperature {self.llm_temperature} is above "
+                f"{cache.max_temperature}"
+            )
+            return output
+
+        def key(prompt: PromptValue) -> bytes:
+            return cache.key(
+                self.llm_model,
+                self.llm_temperature,
+                self.llm_top_p,
+                self.llm_max_tokens,
+                prompt.to_string(),
+                schema,
+            )
+
+        def generate(prompt: PromptValue, config: RunnableConfig) -> Any:
+            prompt_key = key(prompt)
+            cached = cache.get(prompt_key)
+            if cached is not None:
+                return load(cached)
+            result = output.invoke(prompt, config)
+            cache.put(prompt_key, dump(result))
+            return result
+
+        async def agenerate(prompt: PromptValue, config: RunnableConfig) -> Any:
+            # SQLite calls run in threads, so that they do not block the other requests of a batch
+            prompt_key = key(prompt)
+            cached = await asyncio.to_thread(cache.get, prompt_key)
+            if cached is not None:
+                return load(cached)
+            result = await output.ainvoke(prompt, config)
+            await asyncio.to_thread(cache.put, prompt_key, dump(result))
+            return result
+
+        return RunnableLambda(generate, afunc=agenerate, name="cached_generate")
+
+    def _text_chain(self, template_type: str, template: str | None) -> Runnable:
         if template is None:
             if template_type == "simple_text":
+                template = SIMPLE_TEXT_TEMPLATE
+            elif template_type == "prompt_json":
+                template = PROMPT_JSON_TEMPLATE
+
+        def build() -> Runnable:
+            if template is SIMPLE_TEXT_TEMPLATE:
                 logger.info(
                     "Using default template: simple_text. Answers will be provided as plain text."
                 )
-                template = """
-                Use the following pieces of context to answer the query at the end.
-                If you don't know the answer, just say that you don't know, don't try to make up an answer.
-
-                {context}
-
-                Query: {query}
-
-                Helpful answer:
-                """
-            elif template_type == "prompt_json":
+            elif template is PROMPT_JSON_TEMPLATE:
                 logger.info(
                     "Using default template: prompt_json. Answers will be provided as JSON formatted text, to the best of the AI model's capabilities"
                 )
-                template = """
-                Use the following pieces of context to answer the query at the end.
-                If you don't know the answer, just say that you don't know, don't try to make up an answer.
-                Return structured JSON in your responses:
+            else:
+                logger.info("Using custom template")
+
+            prompt = ChatPromptTemplate.from_template(template)
+            return (
+                {
+                    "context": self.retriever | self.format_docs,
+                    "query": RunnablePassthrough(),
+                }
+                | prompt
+                | self._generate(self.llm | StrOutputParser(), "text", str, str)
+            )
+
+        return self._cached_chain(("text", template), build)
+
+    def _structured_chain(
+        self, pydantic_template: type[BaseModel] | None, prompt_template: str | None
+    ) -> Runnable:
+        pydantic_template = pydantic_template or RagIntelMITRE
+        template = prompt_template or STRUCTURED_TEMPLATE
+
+        def build() -> Runnable:
+            logger.info(f"Building structured chain for {pydantic_template.__name__}")
+            # 01. Build Pydantic Parser from Pydantic Class
+            parser = PydanticOutputParser(pydantic_object=pydantic_template)
 
-                {context}
+            # 02. Build Prompt for Chain using Pydantic Parser and Prompt Template
+            prompt = ChatPromptTemplate(
+                messages=[HumanMessagePromptTemplate.from_template(template)],
+                input_variables=["query"],
+                partial_variables={"format_instructions": parser.get_format_instructions()},
+            )
+
+            # 03. Build Chain. Cached responses are stored already parsed, so a cache hit skips
+            # both the request and the output parser
+            schema = json.dumps(pydantic_template.model_json_schema(), sort_keys=True)
+            return (
+                {
+                    "context": self.retriever | self.format_docs,
+                    "query": RunnablePassthrough(),
+                }
+                | prompt
+                | self._generate(
+                    self.llm | parser,
+                    schema,
+                    lambda result: result.model_dump_json(),
+                    pydantic_template.model_validate_json,
+                )
+            )
 
-                Wuery: {query}
+        return self._cached_chain(("structured", pydantic_template, template), build)
 
-                JSON formatted helpful answer:
-                """
-        else:
-            logger.info("Using custom template")
-
-        prompt = ChatPromptTemplate.from_template(template)
-        logger.info("Loaded Prompte Template")
-
-        # RAG
-        model = ChatOpenAI(
-            openai_api_key=self.OPENAI_API_KEY,
-            model=self.llm_model,
-            temperature=self.llm_temperature,
-            max_tokens=self.llm_max_tokens,
-            top_p=self.llm_top_p,
-            stream=self.llm_stream,
+    def _batch(
+        self,
+        chain: Runnable,
+        queries: Iterable[str],
+        max_concurrency: int | None,
+        return_exceptions: bool,
+    ) -> list:
+        config = {"max_concurrency": max_concurrency or self.max_concurrency}
+        return shared_loop().run(
+            chain.abatch(list(queries), config=config, return_exceptions=return_exceptions)
         )
 
-        chain = (
-            {
-                "context": self.retriever | self.format_docs,
-                "query": RunnablePassthrough(),
-            }
-            | prompt
-            | model
-            | StrOutputParser()
-        )
+    def interact(
+        self, query: str, template_type: str = "simple_text", template: str | None = None
+    ) -> str:
+        """
+        Interact with the language model and generate a plain text response.
+
+        Args:
+            query (str): The query to generate a response for.
+            template_type (str): The type of template to use for the response.
+            template (str): The custom template to use for the response.
 
-        return chain.invoke(query)
+        Returns:
+            str: The generated response.
+        """
+        return self._text_chain(template_type, template).invoke(query)
+
+    def interact_many(
+        self,
+        queries: Iterable[str],
+        template_type: str = "simple_text",
+        template: str | None = None,
+        max_concurrency: int | None = None,
+        return_exceptions: bool = False,
+    ) -> list[str]:
+        """
+        Generate plain text responses for many queries, sending up to max_concurrency of them to
+        the model at the same time.
+
+        Args:
+            queries (Iterable[str]): The queries to generate responses for.
+            template_type (str): The type of template to use for the responses.
+            template (str): The custom template to use for the responses.
+            max_concurrency (int | None): Maximum number of concurrent requests. Defaults to the
+                max_concurrency of the interactor.
+            return_exceptions (bool): Return the exception of a failed query in its place instead
+                of raising it.
+
+        Returns:
+            list[str]: The generated responses, in the order of the queries.
+        """
+        chain = self._text_chain(template_type, template)
+        return self._batch(chain, queries, max_concurrency, return_exceptions)
 
     def interact_structured(
         self,
         query: str,
-        pydantic_template: BaseModel | None = None,
+        pydantic_template: type[BaseModel] | None = None,
         prompt_template: str | None = None,
-    ) -> str:
+    ) -> BaseModel:
         """
         Interact with the language model and generate a structured JSON response.
 
@@ -185,61 +458,33 @@ class OpenAIInteractor:
             prompt_template (str): The custom prompt template to use for the response.
 
         Returns:
-            str: The generated response.
+            BaseModel: The response parsed into the Pydantic template.
         """
-        # 01. Build Pydantic Parser from Pydantic Class
-        if pydantic_template is None:
-            logger.info("Using default template: RagIntelMITRE")
-            pyd_template = RagIntelMITRE
-            parser = PydanticOutputParser(pydantic_object=pyd_template)
-        else:
-            logger.info("Using custom template")
-            parser = PydanticOutputParser(pydantic_object=pydantic_template)
-
-        # 02. Build RAG Prompt from Template
-        if prompt_template is None:
-            logger.info("Using prompt template: default.")
-            template = """
-            Use the following pieces of context to answer the query at the end.
-            If you don't know the answer, just say that you don't know, don't try to make up an answer.
-
-            {context}
+        return self._structured_chain(pydantic_template, prompt_template).invoke(query)
 
-            Query: {query}
-
-            These are the format intructions: {format_instructions}
-            """
-        else:
-            logger.info("Using custom prompt template")
-            template = prompt_template
-
-        # 03. Build Prompt for Chain using Pydantic Parser and Prompt Template
-        prompt = ChatPromptTemplate(
-            messages=[HumanMessagePromptTemplate.from_template(template)],
-            input_variables=["query"],
-            partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-
-        # 04. Obtain handle to llm model
-        llm = ChatOpenAI(
-            openai_api_key=self.OPENAI_API_KEY,
-            model=self.llm_model,
-            temperature=self.llm_temperature,
-            max_tokens=self.llm_max_tokens,
-            top_p=self.llm_top_p,
-            stream=self.llm_stream,
-        )
+    def interact_structured_many(
+        self,
+        queries: Iterable[str],
+        pydantic_template: type[BaseModel] | None = None,
+        prompt_template: str | None = None,
+        max_concurrency: int | None = None,
+        return_exceptions: bool = False,
+    ) -> list[BaseModel]:
+        """
+        Generate structured responses for many queries, sending up to max_concurrency of them to
+        the model at the same time.
 
-        # 05. Build Chain
-        chain = (
-            {
-                "context": self.retriever | self.format_docs,
-                "query": RunnablePassthrough(),
-            }
-            | prompt
-            | llm
-            | parser
-        )
+        Args:
+            queries (Iterable[str]): The queries to generate responses for.
+            pydantic_template (BaseModel): The Pydantic template for parsing the responses.
+            prompt_template (str): The custom prompt template to use for the responses.
+            max_concurrency (int | None): Maximum number of concurrent requests. Defaults to the
+                max_concurrency of the interactor.
+            return_exceptions (bool): Return the exception of a failed query in its place instead
+                of raising it.
 
-        # Invoke Chain
-        return chain.invoke(query)
+        Returns:
+            list[BaseModel]: The parsed responses, in the order of the queries.
+        """
+        chain = self._structured_chain(pydantic_template, prompt_template)
+        return self._batch(chain, queries, max_concurrency, return_exceptions)
@@ -0,0 +1,187 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from ragintel.utils.base.file_manifest import hash_file
+
+DEFAULT_MAX_BYTES = 256 * 1024**2
+
+# Files of a saved transformers model that determine its outputs
+MODEL_FILES = ("config.json", "model.safetensors", "pytorch_model.bin")
+
+# Maximum number of host parameters in a single SQLite statement
+SQLITE_MAX_VARIABLES = 900
+
+
+def model_fingerprint(model_path: str, runtime: str) -> str:
+    """
+    Returns a hash identifying a model: the content of its weights and config for a local
+    directory, or its name for a hub model.
+
+    Args:
+        model_path (str): Path or hub name of the model.
+        runtime (str): The runtime and library versions the model runs with, since they change
+            its outputs too, e.g. "torch:2.4.0".
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(runtime.encode())
+    model_dir = Path(model_path)
+    if model_dir.is_dir():
+        for name in MODEL_FILES:
+            if (model_dir / name).is_file():
+                digest.update(f"{name}:{hash_file(model_dir / name)}".encode())
+    else:
+        digest.update(model_path.encode())
+    return digest.hexdigest()
+
+
+class WindowPredictionCache:
+    """SQLite store of the label probabilities of already classified TRAM windows.
+
+    Threat reports repeat a lot of text (vendor disclaimers, IoC tables, re-published articles),
+    so the same windows come back across documents. Entries are keyed by the model version and
+    the hash of a window's token ids, and hold its probabilities as float16. Lookups refresh the
+    entry's last use, and once the store grows past max_bytes the least recently used entries
+    are evicted.
+    """
+
+    def __init__(self, db_path: str | Path | None = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize the WindowPredictionCache.
+
+        Args:
+            db_path (str | Path | None): Path to the SQLite database. Defaults to the
+                RAGINTEL_TRAM_CACHE_PATH environment variable or "./data/tram_cache.sqlite".
+            max_bytes (int): Size of the stored probabilities the cache is trimmed to, in bytes.
+                Default is 256 MiB.
+        """
+        if db_path is None:
+            db_path = os.getenv("RAGINTEL_TRAM_CACHE_PATH", "./data/tram_cache.sqlite")
+
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                key BLOB PRIMARY KEY,
+                probabilities BLOB NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS predictions_used_at ON predictions(used_at)")
+        self.conn.commit()
+        (self._size,) = self.conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(probabilities)), 0) FROM predictions"
+        ).fetchone()
+        logger.debug(f"Initialized WindowPredictionCache at {self.db_path} ({self._size} bytes)")
+
+    def __reduce__(self):
+        # Worker processes reopen the same database rather than sharing the connection
+        return type(self), (self.db_path, self.max_bytes)
+
+    @staticmethod
+    def key(model_version: str, input_ids: np.ndarray) -> bytes:
+        """
+        Builds the cache key of a window.
+
+        Args:
+            model_version (str): Identifies the model and backend, see model_fingerprint.
+            input_ids (np.ndarray): The token ids fed to the model, special tokens included.
+        """
+        digest = hashlib.blake2b(model_version.encode(), digest_size=16)
+        digest.update(b"\0" + np.ascontiguousarray(input_ids, dtype=np.int32).tobytes())
+        return digest.digest()
+
+    def get_many(self, keys: Iterable[bytes]) -> dict[bytes, np.ndarray]:
+        """
+        Looks up windows by key.
+
+        Returns:
+            dict[bytes, np.ndarray]: The float32 probabilities of the keys found.
+        """
+        keys = list(keys)
+        unique_keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for i in range(0, len(unique_keys), SQLITE_MAX_VARIABLES):
+                chunk = unique_keys[i : i + SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT key, probabilities FROM predictions WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                found.update(
+                    (key, np.frombuffer(blob, dtype=np.float16).astype(np.float32))
+                    for key, blob in rows
+                )
+
+            if found:
+                # Mark the entries as recently used for eviction
+                now = time.time()
+                with self.conn:
+                    self.conn.executemany(
+                        "UPDATE predictions SET used_at = ? WHERE key = ?",
+                        [(now, key) for key in found],
+                    )
+
+        hits = sum(key in found for key in keys)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, probabilities: Mapping[bytes, np.ndarray]) -> None:
+        now = time.time()
+        rows = [
+            (key, np.asarray(row, dtype=np.float16).tobytes(), now)
+            for key, row in probabilities.items()
+        ]
+        with self._lock:
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)", rows)
+            self._size += sum(len(blob) for _, blob, _ in rows)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Trim to 90% of the limit so that we do not evict again on every following put
+        target = int(self.max_bytes * 0.9)
+        with self.conn:
+            count, self._size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(probabilities)), 0) FROM predictions"
+            ).fetchone()
+            if self._size <= target or not count:
+                return
+
+            # Every entry holds one row of probabilities, so entries have the same size
+            evicted = -(-(self._size - target) * count // self._size)
+            self.conn.execute(
+                "DELETE FROM predictions WHERE key IN "
+                "(SELECT key FROM predictions ORDER BY used_at LIMIT ?)",
+                (evicted,),
+            )
+            (self._size,) = self.conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(probabilities)), 0) FROM predictions"
+            ).fetchone()
+
+        logger.debug(f"Evicted {evicted} TRAM predictions, {self._size} bytes remain")
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self) -> None:
+        self.conn.close()
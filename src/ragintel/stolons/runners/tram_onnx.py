@@ -0,0 +1,183 @@
+import json
+import os
+import queue
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+import torch
+from loguru import logger
+from onnxruntime.quantization import QuantType, quantize_dynamic
+
+from ragintel.stolons.runners import tram_cache
+
+ONNX_OPSET = 17
+
+
+def model_fingerprint(model_path: str) -> str:
+    """
+    Returns a hash identifying the ONNX export of a model. Library versions are included
+    because they change the exported graph.
+    """
+    return tram_cache.model_fingerprint(
+        model_path, f"{torch.__version__}:{ort.__version__}:{ONNX_OPSET}"
+    )
+
+
+def label_agreement(
+    reference: np.ndarray, candidate: np.ndarray, threshold: float, margin: float = 0.01
+) -> float:
+    """
+    Returns the fraction of windows whose predicted label sets are identical.
+
+    Labels whose reference probability lies within margin of the threshold are ignored, as
+    quantization noise alone can flip them.
+    """
+    if not len(reference):
+        return 1.0
+    same = (reference > threshold) == (candidate > threshold)
+    borderline = np.abs(reference - threshold) <= margin
+    return float(np.mean(np.all(same | borderline, axis=1)))
+
+
+class OnnxTRAMBackend:
+    """Dynamically quantized (int8) ONNX export of the TRAM classifier, served by ONNX Runtime.
+
+    The export is built once per model fingerprint and cached on disk together with a small
+    metadata file that records whether its agreement with PyTorch was verified. Inference runs
+    on a pool of sessions so that concurrent callers do not queue behind a single one.
+    """
+
+    def __init__(self, model_file: Path, sessions: int = 1, num_threads: int | None = None):
+        """
+        Initialize the OnnxTRAMBackend from an exported model.
+
+        Args:
+            model_file (Path): The ONNX model.
+            sessions (int): Number of pooled inference sessions.
+            num_threads (int | None): CPU threads shared by the sessions. Defaults to the CPU
+                count.
+        """
+        self.model_file = Path(model_file)
+        self.metadata_file = self.model_file.with_suffix(".json")
+        num_threads = num_threads or os.cpu_count() or 1
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = max(1, num_threads // sessions)
+        options.inter_op_num_threads = 1
+
+        self._sessions: queue.LifoQueue[ort.InferenceSession] = queue.LifoQueue()
+        for _ in range(sessions):
+            self._sessions.put(
+                ort.InferenceSession(
+                    str(self.model_file), options, providers=["CPUExecutionProvider"]
+                )
+            )
+        logger.info(f"Loaded ONNX model {self.model_file} in {sessions} session(s)")
+
+    @classmethod
+    def from_pretrained(
+        cls,
+        model_path: str,
+        load_model: Callable[[], torch.nn.Module],
+        cache_dir: str | Path | None = None,
+        sessions: int = 1,
+        num_threads: int | None = None,
+    ) -> "OnnxTRAMBackend":
+        """
+        Loads the cached int8 export of a model, exporting and quantizing it first if needed.
+
+        Args:
+            model_path (str): The transformers model the export is built from.
+            load_model (Callable): Returns the PyTorch model. Only called when exporting.
+            cache_dir (str | Path | None): Where exports are cached. Defaults to the
+                RAGINTEL_TRAM_ONNX_DIR environment variable or "./data/tram_onnx".
+            sessions (int): Number of pooled inference sessions.
+            num_threads (int | None): CPU threads shared by the sessions.
+        """
+        if cache_dir is None:
+            cache_dir = os.getenv("RAGINTEL_TRAM_ONNX_DIR", "./data/tram_onnx")
+
+        export_dir = Path(cache_dir) / model_fingerprint(model_path)
+        model_file = export_dir / "model.int8.onnx"
+        if not model_file.is_file():
+            cls.export(load_model(), export_dir)
+
+        return cls(model_file, sessions=sessions, num_threads=num_threads)
+
+    @staticmethod
+    def export(model: torch.nn.Module, export_dir: Path) -> Path:
+        """
+        Exports a sequence classification model to ONNX and quantizes its weights to int8.
+
+        Returns:
+            Path: The quantized model file.
+        """
+        export_dir.mkdir(parents=True, exist_ok=True)
+        fp32_file = export_dir / "model.onnx"
+        int8_file = export_dir / "model.int8.onnx"
+        started = time.perf_counter()
+
+        dummy = torch.ones((1, 8), dtype=torch.long)
+        with torch.inference_mode():
+            torch.onnx.export(
+                model,
+                (dummy, dummy),
+                str(fp32_file),
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch"},
+                },
+                opset_version=ONNX_OPSET,
+            )
+
+        # Write under a temporary name first, so an interrupted run never leaves a partial
+        # artifact that later runs would pick up
+        tmp_file = int8_file.with_suffix(".tmp")
+        quantize_dynamic(str(fp32_file), str(tmp_file), weight_type=QuantType.QInt8)
+        tmp_file.replace(int8_file)
+        fp32_file.unlink()
+
+        logger.info(
+            f"Exported int8 ONNX model to {int8_file} in {time.perf_counter() - started:.1f}s"
+        )
+        return int8_file
+
+    @property
+    def metadata(self) -> dict:
+        if not self.metadata_file.is_file():
+            return {}
+        return json.loads(self.metadata_file.read_text())
+
+    def record_agreement(self, agreement: float, max_abs_diff: float) -> None:
+        self.metadata_file.write_text(
+            json.dumps(
+                {"agreement": agreement, "max_abs_diff": max_abs_diff, "verified_at": time.time()}
+            )
+        )
+
+    @contextmanager
+    def _session(self) -> Iterator[ort.InferenceSession]:
+        session = self._sessions.get()
+        try:
+            yield session
+        finally:
+            self._sessions.put(session)
+
+    def predict_logits(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        with self._session() as session:
+            (logits,) = session.run(
+                ["logits"],
+                {
+                    "input_ids": input_ids.astype(np.int64, copy=False),
+                    "attention_mask": attention_mask.astype(np.int64, copy=False),
+                },
+            )
+        return logits
@@ -1,5 +1,5 @@
 from loguru import logger
 
-from ragintel.tools.archivers.kuzudb.base import KuzuDB
+from ragintel.tools.archivers.kuzudb.base import KuzuOps
 
-__all__ = ["KuzuDB"]
+__all__ = ["KuzuOps"]
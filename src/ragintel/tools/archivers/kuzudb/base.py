@@ -1,9 +1,640 @@
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager, nullcontext, suppress
+from pathlib import Path
+from typing import Literal
+
+import kuzu
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from loguru import logger
+from pydantic import BaseModel
+
+from ragintel.utils.adaptors.pydantic import PydanticAdaptor
+
+# One kuzu.Database per resolved path for the whole process. Opening a Kuzu database is expensive
+# (it replays the WAL and allocates the buffer pool) and two Database objects over the same path
+# would fight over the same files, so every KuzuOps instance shares them through this registry.
+_DATABASES: dict[str, tuple[kuzu.Database, bool]] = {}
+_DATABASES_LOCK = threading.Lock()
+
+_ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+
+# Clauses that make a statement write to the database. A match inside a string literal only
+# makes execute() take the write lock when it did not need to
+_WRITE_CLAUSE = re.compile(
+    r"\b(CREATE|MERGE|SET|DELETE|REMOVE|COPY|DROP|ALTER|INSTALL|LOAD|IMPORT|CHECKPOINT)\b",
+    re.IGNORECASE,
+)
+
+# Joins the two endpoint keys of a relationship into one key for deduplication
+_PAIR_SEPARATOR = "\x1f"
+
+
+def _get_database(db_path: Path, read_only: bool = False) -> kuzu.Database:
+    key = str(db_path.resolve())
+    with _DATABASES_LOCK:
+        if key not in _DATABASES:
+            logger.info(f"Opening KuzuDB database at {key}")
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            _DATABASES[key] = (kuzu.Database(key, read_only=read_only), read_only)
+
+        db, opened_read_only = _DATABASES[key]
+        if opened_read_only != read_only:
+            msg = (
+                f"KuzuDB database at {key} is already open with read_only={opened_read_only}, "
+                f"cannot open it with read_only={read_only}"
+            )
+            raise ValueError(msg)
+        return db
+
+
+class _PooledConnection:
+    """A kuzu.Connection together with the prepared statements compiled on it.
+
+    Kuzu prepared statements are bound to the connection that created them, so the statement cache
+    lives alongside each pooled connection rather than on KuzuOps itself.
+    """
+
+    def __init__(self, db: kuzu.Database, statement_cache_size: int):
+        self.conn = kuzu.Connection(db)
+        self.statement_cache_size = statement_cache_size
+        self.statements: OrderedDict[str, kuzu.PreparedStatement] = OrderedDict()
+
+    def prepare(self, query: str) -> kuzu.PreparedStatement:
+        statement = self.statements.get(query)
+        if statement is not None:
+            self.statements.move_to_end(query)
+            return statement
+
+        statement = self.conn.prepare(query)
+        self.statements[query] = statement
+        if len(self.statements) > self.statement_cache_size:
+            self.statements.popitem(last=False)
+        return statement
+
+    def execute(self, query: str, parameters: dict | None = None) -> kuzu.QueryResult:
+        if parameters:
+            return self.conn.execute(self.prepare(query), parameters)
+        return self.conn.execute(query)
 
 
 class KuzuOps:
-    def __init__(self):
-        # Create an empty on-disk database and connect to it
-        # db = kuzu.Database("./data/ragintel.db")
-        msg = "This class is not implemented yet"
-        raise NotImplementedError(msg)
+    def __init__(
+        self,
+        db_path: str | Path | None = None,
+        pool_size: int | None = None,
+        statement_cache_size: int = 128,
+        read_only: bool = False,
+    ):
+        """
+        Shared access point to the Kuzu graph database used by all loaders.
+
+        Args:
+            db_path (str | Path | None): Path to the on-disk database. Defaults to the
+                KUZU_DB_PERSIST_DIRECTORY environment variable or "./data/raginteldb".
+            pool_size (int | None): Number of connections kept for concurrent readers. Defaults to
+                the number of CPUs (capped at 8).
+            statement_cache_size (int): Maximum number of prepared statements kept per connection.
+            read_only (bool): Open the database in read-only mode. Default is False.
+        """
+        if db_path is None:
+            db_path = os.getenv("KUZU_DB_PERSIST_DIRECTORY", "./data/raginteldb")
+
+        self.db_path = Path(db_path)
+        self.db = _get_database(self.db_path, read_only=read_only)
+        self.pool_size = pool_size or min(os.cpu_count() or 1, 8)
+        self.statement_cache_size = statement_cache_size
+
+        # Connections are created lazily and handed out through a queue, the counter tracks how
+        # many exist so that we never open more than pool_size of them
+        self._pool: queue.LifoQueue[_PooledConnection] = queue.LifoQueue()
+        self._created = 0
+        self._pool_lock = threading.Lock()
+
+        # Kuzu allows a single write transaction at a time, serialize writers on our side so that
+        # concurrent loaders wait for each other instead of failing on commit. Reentrant, so that
+        # a writer holding it can still call execute()
+        self._write_lock = threading.RLock()
+
+        logger.debug(f"Initialized KuzuOps on {self.db_path} with pool size {self.pool_size}")
+
+    @contextmanager
+    def connection(self) -> Iterator[_PooledConnection]:
+        """
+        Borrow a connection from the pool, blocking until one becomes available.
+
+        Yields:
+            _PooledConnection: The borrowed connection, returned to the pool on exit.
+        """
+        pooled = None
+        try:
+            pooled = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                if self._created < self.pool_size:
+                    self._created += 1
+                    pooled = _PooledConnection(self.db, self.statement_cache_size)
+
+        if pooled is None:
+            pooled = self._pool.get()
+
+        try:
+            yield pooled
+        finally:
+            self._pool.put(pooled)
+
+    def execute(self, query: str, parameters: dict | None = None) -> list[list]:
+        """
+        Execute a single Cypher statement in auto-commit mode.
+
+        Statements that write take the same write lock as transaction(), write_batch() and
+        bulk_load(), so they never interleave with a write running in another thread. Reads do
+        not wait for writers.
+
+        The result is read in full before the connection goes back to the pool, so that no other
+        thread can reuse the connection while the result is still open. Use query() or paginate()
+        for large reads.
+
+        Args:
+            query (str): The Cypher statement. Use $name placeholders for values.
+            parameters (dict | None): Values for the placeholders. When provided the statement is
+                prepared once per connection and reused on subsequent calls.
+
+        Returns:
+            list[list]: The rows returned by the statement, empty for most writes.
+        """
+        rows = []
+        write_lock = self._write_lock if _WRITE_CLAUSE.search(query) else nullcontext()
+        with write_lock, self.connection() as pooled:
+            result = pooled.execute(query, parameters)
+            try:
+                while result.has_next():
+                    rows.append(result.get_next())
+            finally:
+                result.close()
+        return rows
+
+    def query(
+        self,
+        query: str,
+        parameters: dict | None = None,
+        page_size: int = 10_000,
+        output: Literal["arrow", "pandas"] = "arrow",
+    ) -> Iterator[pa.RecordBatch | pd.DataFrame]:
+        """
+        Run a read query and return its result as columnar pages.
+
+        The whole result is converted to one Arrow table inside Kuzu, so no Python object is built
+        per row, but it is held in memory before the first page is yielded. Pages are yielded once
+        the connection has been returned to the pool, which means slow consumers do not hold on to
+        a pooled connection. Use paginate() for results that do not fit in memory.
+
+        Args:
+            query (str): The Cypher query. Use $name placeholders for values, never string
+                interpolation, and keep the original casing of labels, properties and literals.
+            parameters (dict | None): Values for the placeholders.
+            page_size (int): Maximum number of rows per page. Default is 10000.
+            output (str): "arrow" to yield pyarrow.RecordBatch pages, "pandas" for DataFrames.
+
+        Yields:
+            pa.RecordBatch | pd.DataFrame: The result pages, in order.
+        """
+        with self.connection() as pooled:
+            result = pooled.execute(query, parameters)
+            try:
+                table = result.get_as_arrow(chunk_size=page_size)
+            finally:
+                result.close()
+
+        for batch in table.to_batches(max_chunksize=page_size):
+            yield batch.to_pandas() if output == "pandas" else batch
+
+    def paginate(
+        self,
+        query: str,
+        parameters: dict | None = None,
+        page_size: int = 10_000,
+        output: Literal["arrow", "pandas"] = "arrow",
+    ) -> Iterator[pa.Table | pd.DataFrame]:
+        """
+        Stream a read query page by page with SKIP/LIMIT, so only one page is materialized at once.
+
+        The query must end with its RETURN and ORDER BY clauses; SKIP and LIMIT are appended to
+        it. Without a total order, Kuzu may return rows in a different order for every page, so
+        rows would be skipped or repeated. Use this over query() for result sets that do not fit
+        in memory.
+
+        Args:
+            query (str): The Cypher query with an ORDER BY on unique keys and without SKIP/LIMIT.
+            parameters (dict | None): Values for the placeholders.
+            page_size (int): Number of rows per page. Default is 10000.
+            output (str): "arrow" to yield pyarrow.Table pages, "pandas" for DataFrames.
+
+        Yields:
+            pa.Table | pd.DataFrame: The result pages, in order. Iteration stops at the first
+            page with fewer than page_size rows.
+
+        Raises:
+            ValueError: If the query has no ORDER BY clause.
+        """
+        if not _ORDER_BY.search(query):
+            msg = "paginate() needs a query with an ORDER BY clause to page through it reliably"
+            raise ValueError(msg)
+
+        base_query = query.rstrip().rstrip(";")
+        skip = 0
+
+        while True:
+            # SKIP and LIMIT are integers we control, so formatting them in is safe
+            paged_query = f"{base_query} SKIP {skip} LIMIT {page_size}"
+            with self.connection() as pooled:
+                result = pooled.execute(paged_query, parameters)
+                try:
+                    page = result.get_as_arrow(chunk_size=page_size)
+                finally:
+                    result.close()
+
+            if page.num_rows > 0:
+                yield page.to_pandas() if output == "pandas" else page
+            if page.num_rows < page_size:
+                return
+            skip += page_size
+
+    def explain(self, query: str, parameters: dict | None = None, profile: bool = False) -> dict:
+        """
+        Report the query plan and timings for a query.
+
+        Args:
+            query (str): The Cypher query.
+            parameters (dict | None): Values for the placeholders.
+            profile (bool): If True, run the query with PROFILE so the plan includes the runtime
+                metrics of every operator. Otherwise EXPLAIN is used and the query is not run.
+
+        Returns:
+            dict: The plan text, Kuzu's compiling and execution times in milliseconds and the
+            wall-clock time measured on the client side.
+        """
+        prefix = "PROFILE" if profile else "EXPLAIN"
+        start = time.perf_counter()
+
+        with self.connection() as pooled:
+            result = pooled.execute(f"{prefix} {query}", parameters)
+            try:
+                plan_lines = []
+                while result.has_next():
+                    plan_lines.append(str(result.get_next()[0]))
+                plan = "\n".join(plan_lines)
+                stats = {
+                    "plan": plan,
+                    "compiling_time_ms": result.get_compiling_time(),
+                    "execution_time_ms": result.get_execution_time(),
+                }
+            finally:
+                result.close()
+
+        stats["wall_time_ms"] = (time.perf_counter() - start) * 1000
+        return stats
+
+    @contextmanager
+    def transaction(self) -> Iterator[_PooledConnection]:
+        """
+        Run a group of statements inside one explicit write transaction.
+
+        The transaction is committed when the block exits normally and rolled back if it raises.
+
+        Yields:
+            _PooledConnection: The connection the transaction is bound to.
+        """
+        with self._write_lock, self.connection() as pooled:
+            pooled.conn.execute("BEGIN TRANSACTION")
+            try:
+                yield pooled
+            except Exception:
+                # Kuzu already rolls back a transaction whose statement failed, in which case
+                # there is nothing left to roll back here
+                with suppress(RuntimeError):
+                    pooled.conn.execute("ROLLBACK")
+                raise
+            pooled.conn.execute("COMMIT")
+
+    def write_batch(self, query: str, rows: Iterable[dict], batch_size: int = 1000) -> int:
+        """
+        Execute a parameterized write statement once per row, committing every batch_size rows.
+
+        If a batch fails, it is rolled back and replayed row by row in auto-commit mode so that a
+        single bad row does not discard the rest of the batch.
+
+        Args:
+            query (str): The parameterized Cypher statement, e.g. "CREATE (n:Node {id: $id})".
+            rows (Iterable[dict]): The parameter dictionaries, one per execution.
+            batch_size (int): Number of rows per transaction. Default is 1000.
+
+        Returns:
+            int: The number of rows that were written successfully.
+        """
+        written = 0
+        batch: list[dict] = []
+
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                written += self._write_one_batch(query, batch)
+                batch = []
+
+        if batch:
+            written += self._write_one_batch(query, batch)
+
+        return written
+
+    def _write_one_batch(self, query: str, batch: list[dict]) -> int:
+        try:
+            with self.transaction() as pooled:
+                for row in batch:
+                    pooled.execute(query, row)
+            return len(batch)
+        except Exception as e:
+            logger.warning(f"Batch of {len(batch)} rows failed ({e}). Retrying row by row.")
+
+        written = 0
+        with self._write_lock, self.connection() as pooled:
+            for row in batch:
+                try:
+                    pooled.execute(query, row)
+                    written += 1
+                except Exception as e:
+                    logger.error(f"Error writing row {row.get('id', 'NA')}: {e}. Continuing.")
+        return written
+
+    def create_node_table(self, table_name: str, model_class: type[BaseModel]) -> None:
+        """
+        Create a node table whose schema is derived from a Pydantic node model, if missing.
+
+        Args:
+            table_name (str): The node table label, e.g. "SigmaRule".
+            model_class (type[BaseModel]): The node model, e.g. SigmaNode or KQLNode.
+        """
+        schema = PydanticAdaptor().pydantic_to_schema_string(model_class)
+        logger.info(f"Creating or Getting {table_name} Schema in KuzuDB")
+        self.execute(f"""
+            CREATE NODE TABLE IF NOT EXISTS {table_name}(
+            {schema}
+            )
+        """)
+
+    def bulk_load(
+        self,
+        table_name: str,
+        model_class: type[BaseModel],
+        records: Iterable[BaseModel | dict] | pa.Table,
+        primary_key: str = "id",
+    ) -> int:
+        """
+        Bulk-load node records into a table through Kuzu's COPY FROM.
+
+        Records are converted into one Arrow table with the column layout of the model, rows whose
+        primary key repeats within the batch are dropped with vectorized compute, and new keys are
+        staged as Parquet and copied in a single statement. Rows whose key is already stored are
+        compared with the stored node and, if they changed, updated in place so that the node
+        keeps its relationships. The table is created from the model if it does not exist yet.
+
+        Args:
+            table_name (str): The node table label, e.g. "SigmaRule".
+            model_class (type[BaseModel]): The node model describing a row.
+            records (Iterable[BaseModel | dict] | pa.Table): Model instances, plain dicts or an
+                Arrow table already laid out with PydanticAdaptor.pydantic_to_arrow_schema.
+            primary_key (str): The primary key property. Default is "id".
+
+        Returns:
+            int: The number of rows copied into the table or updated.
+        """
+        self.create_node_table(table_name, model_class)
+
+        if isinstance(records, pa.Table):
+            table = records
+        else:
+            table = PydanticAdaptor().pydantic_to_arrow_table(model_class, records)
+
+        if table.num_rows == 0:
+            logger.info(f"No {table_name} rows to load")
+            return 0
+
+        # COPY fails on duplicate primary keys, so keep the first occurrence of each key within
+        # the batch and handle keys that are already stored separately
+        first_index = (
+            pa.table({"key": table.column(primary_key), "index": pa.array(range(table.num_rows))})
+            .group_by("key")
+            .aggregate([("index", "min")])
+            .column("index_min")
+        )
+        table = table.take(pc.take(first_index, pc.sort_indices(first_index)))
+
+        existing = self.query(f"MATCH (n:{table_name}) RETURN n.{primary_key} AS key")
+        key_type = table.schema.field(primary_key).type
+        existing_keys = [batch.column(0).cast(key_type) for batch in existing]
+        updated = 0
+        if existing_keys:
+            stored = pa.chunked_array(existing_keys, type=key_type)
+            is_stored = pc.is_in(table.column(primary_key), stored)
+            updated = self._update_changed_nodes(table_name, table.filter(is_stored), primary_key)
+            table = table.filter(pc.invert(is_stored))
+
+        if table.num_rows == 0:
+            logger.info(f"No new {table_name} rows to copy into KuzuDB")
+            return updated
+
+        with tempfile.TemporaryDirectory(prefix="ragintel-kuzu-") as staging_dir:
+            staging_file = Path(staging_dir) / f"{table_name}.parquet"
+            pq.write_table(table, staging_file)
+            with self._write_lock, self.connection() as pooled:
+                pooled.conn.execute(f"COPY {table_name} FROM '{staging_file.as_posix()}'")
+
+        logger.info(f"Bulk loaded {table.num_rows} {table_name} rows into KuzuDB")
+        return table.num_rows + updated
+
+    def _update_changed_nodes(self, table_name: str, table: pa.Table, primary_key: str) -> int:
+        # Compare the incoming rows with the stored nodes and SET the properties of the changed
+        # ones. COPY cannot overwrite a node, and deleting it first would drop its relationships
+        if table.num_rows == 0:
+            return 0
+
+        columns = table.column_names
+        returned = ", ".join(f"n.{column} AS {column}" for column in columns)
+        stored_rows = {
+            row[primary_key]: row
+            for batch in self.query(
+                f"MATCH (n:{table_name}) WHERE n.{primary_key} IN $keys RETURN {returned}",
+                {"keys": table.column(primary_key).to_pylist()},
+            )
+            for row in batch.to_pylist()
+        }
+        changed = [row for row in table.to_pylist() if stored_rows.get(row[primary_key]) != row]
+        skipped = table.num_rows - len(changed)
+        if skipped:
+            logger.info(f"Skipped {skipped} {table_name} rows that are stored unchanged")
+        if not changed:
+            return 0
+
+        assignments = ", ".join(
+            f"n.{column} = ${column}" for column in columns if column != primary_key
+        )
+        updated = self.write_batch(
+            f"MATCH (n:{table_name}) WHERE n.{primary_key} = ${primary_key} SET {assignments}",
+            changed,
+        )
+        logger.info(f"Updated {updated} changed {table_name} rows in KuzuDB")
+        return updated
+
+    def create_rel_table(
+        self, table_name: str, from_table: str, to_table: str, properties: str = ""
+    ) -> None:
+        """
+        Create a relationship table between two node tables, if missing.
+
+        Args:
+            table_name (str): The relationship label, e.g. "GroupUsesTechnique".
+            from_table (str): The source node table.
+            to_table (str): The destination node table.
+            properties (str): Property definitions, e.g. "description STRING".
+        """
+        properties = f", {properties}" if properties else ""
+        logger.info(f"Creating or Getting {table_name} Schema in KuzuDB")
+        self.execute(
+            f"CREATE REL TABLE IF NOT EXISTS {table_name}"
+            f"(FROM {from_table} TO {to_table}{properties})"
+        )
+
+    def bulk_load_rels(
+        self,
+        table_name: str,
+        from_table: str,
+        to_table: str,
+        table: pa.Table,
+        primary_key: str = "id",
+    ) -> int:
+        """
+        Bulk-load relationships through Kuzu's COPY FROM.
+
+        The first two columns of table hold the primary keys of the source and destination
+        nodes, the remaining ones the relationship properties in schema order. Pairs that repeat
+        within the batch or are already stored are dropped, so reloading a source does not
+        duplicate its relationships. Both endpoints of every pair must exist.
+
+        Args:
+            table_name (str): The relationship label, e.g. "GroupUsesTechnique".
+            from_table (str): The source node table.
+            to_table (str): The destination node table.
+            table (pa.Table): The relationships.
+            primary_key (str): The primary key property of both node tables. Default is "id".
+
+        Returns:
+            int: The number of relationships copied into the table.
+        """
+        if table.num_rows == 0:
+            logger.info(f"No {table_name} relationships to load")
+            return 0
+
+        from_keys, to_keys = table.column(0), table.column(1)
+        pair_keys = pc.binary_join_element_wise(
+            from_keys.cast(pa.string()), to_keys.cast(pa.string()), _PAIR_SEPARATOR
+        )
+        first_index = (
+            pa.table({"key": pair_keys, "index": pa.array(range(table.num_rows))})
+            .group_by("key")
+            .aggregate([("index", "min")])
+            .column("index_min")
+        )
+        keep = pc.sort_indices(first_index)
+        table = table.take(pc.take(first_index, keep))
+        pair_keys = pc.take(pair_keys, pc.take(first_index, keep))
+
+        existing = [
+            batch.column(0)
+            for batch in self.query(
+                f"MATCH (a:{from_table})-[:{table_name}]->(b:{to_table}) "
+                f"RETURN concat(concat(CAST(a.{primary_key}, 'STRING'), $separator), "
+                f"CAST(b.{primary_key}, 'STRING')) AS key",
+                {"separator": _PAIR_SEPARATOR},
+            )
+        ]
+        if existing:
+            stored = pa.chunked_array(existing, type=pa.string())
+            table = table.filter(pc.invert(pc.is_in(pair_keys, stored)))
+
+        if table.num_rows == 0:
+            logger.info(f"All {table_name} relationships are already stored in KuzuDB")
+            return 0
+
+        with tempfile.TemporaryDirectory(prefix="ragintel-kuzu-") as staging_dir:
+            staging_file = Path(staging_dir) / f"{table_name}.parquet"
+            pq.write_table(table, staging_file)
+            with self._write_lock, self.connection() as pooled:
+                pooled.conn.execute(f"COPY {table_name} FROM '{staging_file.as_posix()}'")
+
+        logger.info(f"Bulk loaded {table.num_rows} {table_name} relationships into KuzuDB")
+        return table.num_rows
+
+    def stored_keys(self, table_name: str, keys: Iterable, primary_key: str = "id") -> set:
+        """
+        Return which of the given primary keys are stored in a node table, e.g. to confirm what
+        a bulk load actually wrote.
+
+        Args:
+            table_name (str): The node table label, e.g. "SigmaRule".
+            keys (Iterable): The primary keys to look up.
+            primary_key (str): The primary key property. Default is "id".
+        """
+        keys = list(keys)
+        if not keys:
+            return set()
+
+        return {
+            key
+            for batch in self.query(
+                f"MATCH (n:{table_name}) WHERE n.{primary_key} IN $keys RETURN n.{primary_key}",
+                {"keys": keys},
+            )
+            for key in batch.column(0).to_pylist()
+        }
+
+    def delete_nodes(self, table_name: str, ids: list[str], primary_key: str = "id") -> None:
+        """
+        Delete the nodes of a table whose primary key is in ids, along with their relationships.
+
+        Args:
+            table_name (str): The node table label, e.g. "SigmaRule".
+            ids (list[str]): The primary keys of the nodes to delete.
+            primary_key (str): The primary key property. Default is "id".
+        """
+        if not ids:
+            return
+
+        with self.transaction() as pooled:
+            pooled.execute(
+                f"MATCH (n:{table_name}) WHERE n.{primary_key} IN $ids DETACH DELETE n",
+                {"ids": list(ids)},
+            )
+        logger.info(f"Deleted up to {len(ids)} {table_name} nodes from KuzuDB")
+
+    def close(self) -> None:
+        """
+        Drop the pooled connections. The shared database stays open for other KuzuOps instances.
+        """
+        while True:
+            try:
+                pooled = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            pooled.statements.clear()
+            pooled.conn.close()
+
+        with self._pool_lock:
+            self._created = 0
@@ -1,5 +1,6 @@
 from loguru import logger
 
 from ragintel.tools.interactors.mitre.base import CAPECAttackPatterns, CAPECCoursesOfAction
+from ragintel.tools.interactors.mitre.stix_store import StixRecord, StixStore
 
-__all__ = ["CAPECAttackPatterns", "CAPECCoursesOfAction"]
+__all__ = ["CAPECAttackPatterns", "CAPECCoursesOfAction", "StixRecord", "StixStore"]
@@ -1,80 +1,69 @@
-from box import Box
 from langchain.tools import tool
 from loguru import logger
-from stix2 import FileSystemSource, Filter
+
+from ragintel.tools.interactors.mitre.stix_store import StixRecord, StixStore
 
 
 class CAPECAttackPatterns:
-    def __init__(self, capec_src_folder: str):
-        self.src = FileSystemSource(capec_src_folder)
+    def __init__(self, capec_src_folder: str, store: StixStore | None = None):
+        # The folder is parsed and indexed once per process and shared by every interactor
+        self.store = store or StixStore.shared(capec_src_folder)
         logger.debug(f"Initialized CAPEC Attack Pattern processor with folder: {capec_src_folder}")
 
     @tool
     def get_attack_pattern_by_capec_id(self, capec_id):
         """Search for CAPEC Attack Patterns by CAPEC ID"""
 
-        filters = [
-            Filter("type", "=", "attack-pattern"),
-            Filter("external_references.external_id", "=", "CAPEC-" + capec_id),
-            Filter("external_references.source_name", "=", "capec"),
-        ]
-
-        list_of_boxes = [Box(d) for d in self.src.query(filters)]
-        logger.debug(f"CAPEC Objects loaded: {len(list_of_boxes)}")
+        records = self.store.lookup_external_id(
+            "CAPEC-" + capec_id, source_name="capec", stix_type="attack-pattern"
+        )
+        logger.debug(f"CAPEC Objects loaded: {len(records)}")
 
-        return list_of_boxes
+        return records
 
     @tool
     def get_attack_pattern_by_capec_ref_id(self, capec_ref_id):
         """Search for CAPEC Attack Patterns by CAPEC Reference ID"""
 
-        filters = [Filter("type", "=", "attack-pattern"), Filter("id", "=", capec_ref_id)]
-
-        list_of_boxes = [Box(d) for d in self.src.query(filters)]
-        logger.debug(f"CAPEC Objects loaded: {len(list_of_boxes)}")
+        record = self.store.get(capec_ref_id, stix_type="attack-pattern")
+        records = [record] if record is not None else []
+        logger.debug(f"CAPEC Objects loaded: {len(records)}")
 
-        return list_of_boxes
+        return records
 
     @tool
     def get_attack_pattern_by_name(self, name):
         """Search for CAPEC Attack Patterns by Name"""
 
-        filters = [Filter("type", "=", "attack-pattern"), Filter("name", "contains", name)]
+        records = self.store.search("name", name, stix_type="attack-pattern")
+        logger.debug(f"CAPEC Objects loaded: {len(records)}")
 
-        list_of_boxes = [Box(d) for d in self.src.query(filters)]
-        logger.debug(f"CAPEC Objects loaded: {len(list_of_boxes)}")
-
-        return list_of_boxes
+        return records
 
     @tool
     def get_attack_pattern_by_description(self, description):
         """Search for CAPEC Attack Patterns by Description"""
 
-        filters = [
-            Filter("type", "=", "attack-pattern"),
-            Filter("description", "contains", description),
-        ]
-
-        list_of_boxes = [Box(d) for d in self.src.query(filters)]
-        logger.debug(f"CAPEC Objects loaded: {len(list_of_boxes)}")
+        records = self.store.search("description", description, stix_type="attack-pattern")
+        logger.debug(f"CAPEC Objects loaded: {len(records)}")
 
-        return list_of_boxes
+        return records
 
     @tool
     def get_attack_pattern_id(self, attack_pattern_id):
         """Get CAPEC Attack Pattern ID"""
 
-        filters = [Filter("type", "=", "attack-pattern"), Filter("id", "=", attack_pattern_id)]
-
-        list_of_boxes = [Box(d) for d in self.src.query(filters)]
-        logger.debug(f"CAPEC Objects loaded: {len(list_of_boxes)}")
+        record = self.store.get(attack_pattern_id, stix_type="attack-pattern")
+        if record is None:
+            msg = f"No CAPEC Attack Pattern with ID {attack_pattern_id}"
+            raise ValueError(msg)
 
-        return list_of_boxes[0].id
+        return record.id
 
 
 class CAPECCoursesOfAction:
-    def __init__(self, capec_src_folder: str):
-        self.src = FileSystemSource(capec_src_folder)
+    def __init__(self, capec_src_folder: str, store: StixStore | None = None):
+        self.store = store or StixStore.shared(capec_src_folder)
         logger.debug(
             f"Initialized CAPEC Course of Action processor with folder: {capec_src_folder}"
         )
@@ -83,41 +72,77 @@ class CAPECCoursesOfAction:
     def get_course_of_action_by_name(self, name):
         """Search for CAPEC Courses of Action by Name"""
 
-        filters = [Filter("type", "=", "course-of-action"), Filter("name", "contains", name)]
+        records = self.store.search("name", name, stix_type="course-of-action")
+        logger.debug(f"CAPEC Objects loaded: {len(records)}")
 
-        list_of_boxes = [Box(d) for d in self.src.query(filters)]
-        logger.debug(f"CAPEC Objects loaded: {len(list_of_boxes)}")
-
-        return list_of_boxes
+        return records
 
     @tool
     def get_course_of_action_by_id(self, capec_ref_id):
         """Search for CAPEC Courses of Action by ID"""
 
-        filters = [
-            Filter("type", "=", "course-of-action"),
-            Filter("id", "=", capec_ref_id),
-        ]
-
-        list_of_boxes = [Box(d) for d in self.src.query(filters)]
-        logger.debug(f"CAPEC Objects loaded: {len(list_of_boxes)}")
+        record = self.store.get(capec_ref_id, stix_type="course-of-action")
+        records = [record] if record is not None else []
+        logger.debug(f"CAPEC Objects loaded: {len(records)}")
 
-        return list_of_boxes
+        return records
 
     @tool
-    def get_relationship_by_attack_pattern_id(self, capec_ref_id: list[Box]):
+    def get_relationship_by_attack_pattern_id(self, capec_ref_id: list[StixRecord]):
         """Get Courses of Action for CAPEC Attack Patterns"""
 
+        # One batch lookup in the adjacency index for every pattern
+        relationships = self.store.relationships_of(
+            [_capec_ref.id for _capec_ref in capec_ref_id], relationship_type="mitigates"
+        )
         for _capec_ref in capec_ref_id:
-            filters = [
-                Filter("type", "=", "relationship"),
-                Filter("target_ref", "=", _capec_ref.id),
-                Filter("relationship_type", "=", "mitigates"),
-            ]
-
-            list_of_boxes = [Box(d) for d in self.src.query(filters)]
+            records = relationships[_capec_ref.id]
             logger.debug(
-                f"Loaded {len(list_of_boxes)} Courses of Action for Attack Pattern with Name {_capec_ref.name} (Ref: {_capec_ref.id})"
+                f"Loaded {len(records)} Courses of Action for Attack Pattern with Name {_capec_ref.name} (Ref: {_capec_ref.id})"
             )
 
-            yield list_of_boxes
+            yield records
+
+    @tool
+    def get_courses_of_action_by_attack_pattern_ids(self, capec_ref_ids: list[str]):
+        """Get the Courses of Action that mitigate each of several CAPEC Attack Patterns"""
+
+        courses_of_action = self.store.neighbors(
+            capec_ref_ids, relationship_type="mitigates", stix_type="course-of-action"
+        )
+        logger.debug(f"Loaded Courses of Action for {len(courses_of_action)} Attack Patterns")
+
+        return courses_of_action
+
+    @tool
+    def get_courses_of_action_by_weakness(self, capec_ref_ids: list[str]):
+        """Get Courses of Action for CAPEC Attack Patterns through the CWE weaknesses they
+        exploit: the mitigations of every Attack Pattern that shares a CWE with them"""
+
+        courses_of_action = {}
+        for capec_ref_id in dict.fromkeys(capec_ref_ids):
+            attack_pattern = self.store.get(capec_ref_id, stix_type="attack-pattern")
+            if attack_pattern is None:
+                courses_of_action[capec_ref_id] = []
+                continue
+
+            # Attack Pattern -> CWE -> Attack Patterns exploiting the same CWE
+            related_ids = [
+                related.id
+                for cwe_id in self.store.external_ids(attack_pattern, "cwe")
+                for related in self.store.lookup_external_id(
+                    cwe_id, source_name="cwe", stix_type="attack-pattern"
+                )
+            ]
+            # -> their Courses of Action
+            mitigations = self.store.neighbors(
+                related_ids, relationship_type="mitigates", stix_type="course-of-action"
+            )
+            unique = {record.id: record for records in mitigations.values() for record in records}
+            courses_of_action[capec_ref_id] = list(unique.values())
+
+        logger.debug(
+            f"Loaded Courses of Action by weakness for {len(courses_of_action)} Attack Patterns"
+        )
+
+        return courses_of_action
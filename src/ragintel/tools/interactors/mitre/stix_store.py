@@ -0,0 +1,677 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+
+import pyarrow as pa
+from loguru import logger
+
+from ragintel.tools.loaders.mitre.base import iter_stix_objects
+from ragintel.utils.base.file_manifest import hash_file
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Text properties covered by the inverted index
+SEARCH_FIELDS = ("name", "description")
+
+# Which end of a relationship a lookup starts from: "outgoing" follows source_ref -> target_ref,
+# "incoming" follows target_ref -> source_ref (e.g. from an attack pattern to what mitigates it)
+DIRECTIONS = ("outgoing", "incoming")
+
+# Bumped whenever the snapshot layout or the indexes change, so that older snapshots are rebuilt
+SNAPSHOT_VERSION = "2"
+
+# One store per resolved source path for the whole process, so that every interactor over the
+# same STIX folder shares a single loaded copy
+_STORES: dict[str, "StixStore"] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def source_hash(src_path: str | Path) -> str:
+    """
+    Returns the content hash of a STIX bundle file, or of every JSON file in a STIX folder.
+    """
+    src_path = Path(src_path)
+    if src_path.is_file():
+        return hash_file(src_path)
+
+    digest = hashlib.blake2b(digest_size=20)
+    for file_path in sorted(src_path.rglob("*.json")):
+        relative_path = file_path.relative_to(src_path).as_posix()
+        digest.update(f"{relative_path}:{hash_file(file_path)}\n".encode())
+    return digest.hexdigest()
+
+
+def source_stats(src_path: str | Path) -> list[list]:
+    """
+    Returns [relative path, size, mtime_ns] of a STIX bundle file, or of every JSON file in a
+    STIX folder. Only file metadata is read, so this is cheap next to source_hash.
+    """
+    src_path = Path(src_path)
+    if src_path.is_file():
+        stat = src_path.stat()
+        return [[src_path.name, stat.st_size, stat.st_mtime_ns]]
+
+    stats = []
+    for file_path in sorted(src_path.rglob("*.json")):
+        stat = file_path.stat()
+        relative_path = file_path.relative_to(src_path).as_posix()
+        stats.append([relative_path, stat.st_size, stat.st_mtime_ns])
+    return stats
+
+
+def cached_source_hash(src_path: str | Path, snapshot_dir: str | Path) -> str:
+    """
+    Returns source_hash(src_path), only hashing the source again when the size or modification
+    time of one of its files changed. The stats and the hash of the last call are kept in a small
+    JSON manifest in snapshot_dir, one per source.
+    """
+    src_path = Path(src_path)
+    source_key = hashlib.blake2b(str(src_path.resolve()).encode(), digest_size=8).hexdigest()
+    manifest_path = Path(snapshot_dir) / f"{src_path.stem}.{source_key}.stats.json"
+
+    stats = source_stats(src_path)
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest["stats"] == stats:
+            return manifest["hash"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    digest = source_hash(src_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps({"stats": stats, "hash": digest}), encoding="utf-8")
+    tmp_path.replace(manifest_path)
+    return digest
+
+
+class StixRecord(dict):
+    """A STIX object: a plain dict whose top-level properties can also be read as attributes,
+    e.g. record.name, without the conversion cost of a Box."""
+
+    __slots__ = ()
+
+    def __getattr__(self, name: str):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class _SnapshotRecords(Sequence):
+    """The records of a snapshot, decoded from its memory-mapped JSON column on first access."""
+
+    def __init__(self, column: pa.Array):
+        self._column = column
+        self._decoded: dict[int, StixRecord] = {}
+
+    def __len__(self) -> int:
+        return len(self._column)
+
+    def __getitem__(self, position: int) -> StixRecord:
+        record = self._decoded.get(position)
+        if record is None:
+            record = StixRecord(json.loads(self._column[position].as_py()))
+            self._decoded[position] = record
+        return record
+
+    def __iter__(self) -> Iterator[StixRecord]:
+        return (self[position] for position in range(len(self)))
+
+
+class _SnapshotKeys(Sequence):
+    """The sorted keys of a snapshot index, read from their memory-mapped column as str so that
+    they can be bisected."""
+
+    def __init__(self, column: pa.Array):
+        self._column = column
+
+    def __len__(self) -> int:
+        return len(self._column)
+
+    def __getitem__(self, index: int) -> str:
+        return self._column[index].as_py()
+
+
+class _SnapshotIndex(Mapping):
+    """A snapshot index: sorted keys and the value of every key, looked up by bisecting the
+    memory-mapped keys instead of loading them into a dict."""
+
+    def __init__(self, keys: pa.Array, values: pa.Array):
+        self._key_column = keys
+        self._keys = _SnapshotKeys(keys)
+        self._values = values
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __getitem__(self, key: str):
+        index = bisect_left(self._keys, key)
+        if index == len(self._keys) or self._keys[index] != key:
+            raise KeyError(key)
+        return self._values[index].as_py()
+
+    def range(self, start: str, stop: str) -> list[tuple[str, list[int]]]:
+        """Returns the keys from start (included) to stop (excluded) with their values."""
+        low = bisect_left(self._keys, start)
+        high = bisect_left(self._keys, stop, low)
+        # One conversion per slice rather than one per key
+        return list(
+            zip(
+                self._key_column[low:high].to_pylist(),
+                self._values[low:high].to_pylist(),
+                strict=True,
+            )
+        )
+
+
+class _SnapshotAdjacency(Mapping):
+    """The adjacency of one direction in a snapshot, flattened to "<ref>\\x00<relationship type>"
+    keys. Looking up a ref returns the positions of its relationships by type."""
+
+    def __init__(self, index: _SnapshotIndex):
+        self._index = index
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(dict.fromkeys(key.split("\x00", 1)[0] for key in self._index))
+
+    def __getitem__(self, ref: str) -> dict[str, list[int]]:
+        by_relationship = {
+            key.split("\x00", 1)[1]: positions
+            for key, positions in self._index.range(f"{ref}\x00", f"{ref}\x01")
+        }
+        if not by_relationship:
+            raise KeyError(ref)
+        return by_relationship
+
+
+def _index_columns(name: str, index: dict, value_type: pa.DataType) -> dict[str, pa.Array]:
+    # Each column holds a single list, so that indexes and records of different lengths fit in
+    # one table. None keys cannot be looked up and are left out
+    keys = sorted(key for key in index if key is not None)
+    return {
+        f"{name}.keys": pa.array([keys], pa.list_(pa.string())),
+        f"{name}.values": pa.array([[index[key] for key in keys]], pa.list_(value_type)),
+    }
+
+
+class StixStore:
+    """In-memory STIX objects with hash indexes and a token inverted index.
+
+    Objects are loaded once. Lookups by id, type and external_references.external_id are dict
+    hits, and name / description searches intersect the postings of the query tokens instead of
+    scanning every object. When an id appears more than once, the latest modified version wins,
+    as with stix2's FileSystemSource.
+
+    A store can be compiled into a versioned snapshot: an Arrow IPC file holding every object
+    as JSON plus every index as sorted key and position columns, named after the hash of its
+    source. Opening a snapshot memory-maps it, so it takes milliseconds and the pages are shared
+    by every process reading it. Lookups bisect the mapped key columns, and objects are only
+    decoded when a lookup returns them.
+    """
+
+    def __init__(self, objects: Iterable[dict]):
+        """
+        Initialize the StixStore and build its indexes.
+
+        Args:
+            objects (Iterable[dict]): The STIX objects.
+        """
+        latest: dict[str, dict] = {}
+        for obj in objects:
+            stored = latest.get(obj["id"])
+            if stored is None or obj.get("modified", "") >= stored.get("modified", ""):
+                latest[obj["id"]] = obj
+
+        self.records = [StixRecord(obj) for obj in latest.values()]
+        self._build_indexes()
+
+    @classmethod
+    def from_path(cls, src_path: str | Path) -> "StixStore":
+        """
+        Loads a STIX bundle file, or a folder of STIX files laid out like a stix2
+        FileSystemSource (one object or bundle per file, e.g. "attack-pattern/<id>.json").
+        """
+        src_path = Path(src_path)
+        started = time.perf_counter()
+        if src_path.is_file():
+            store = cls(iter_stix_objects(src_path))
+        else:
+            store = cls(cls._iter_folder(src_path))
+        logger.info(
+            f"Loaded {len(store.records)} STIX objects from {src_path} "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return store
+
+    @staticmethod
+    def _iter_folder(src_folder: Path) -> Iterable[dict]:
+        for file_path in sorted(src_folder.rglob("*.json")):
+            with open(file_path, encoding="utf-8") as f:
+                obj = json.load(f)
+            if obj.get("type") == "bundle":
+                yield from obj.get("objects", [])
+            else:
+                yield obj
+
+    @classmethod
+    def shared(cls, src_path: str | Path, snapshot_dir: str | Path | None = None) -> "StixStore":
+        """
+        Returns the process-wide store of a STIX source, opening its snapshot on first use.
+        """
+        key = str(Path(src_path).resolve())
+        with _STORES_LOCK:
+            if key not in _STORES:
+                _STORES[key] = cls.open(src_path, snapshot_dir)
+            return _STORES[key]
+
+    @staticmethod
+    def snapshot_path(src_path: str | Path, snapshot_dir: str | Path | None = None) -> Path:
+        """
+        Returns where the snapshot of the current content of a STIX source is stored. The
+        source is only hashed again when its file sizes or modification times changed, see
+        cached_source_hash.
+
+        Args:
+            src_path (str | Path): The STIX bundle or folder.
+            snapshot_dir (str | Path | None): The snapshot folder. Defaults to the
+                RAGINTEL_STIX_SNAPSHOT_DIR environment variable or "./data/stix_snapshots".
+        """
+        if snapshot_dir is None:
+            snapshot_dir = os.getenv("RAGINTEL_STIX_SNAPSHOT_DIR", "./data/stix_snapshots")
+        src_path = Path(src_path)
+        digest = cached_source_hash(src_path, snapshot_dir)
+        return Path(snapshot_dir) / f"{src_path.stem}-{digest}.v{SNAPSHOT_VERSION}.arrow"
+
+    @classmethod
+    def compile(cls, src_path: str | Path, snapshot_dir: str | Path | None = None) -> Path:
+        """
+        Parses and indexes a STIX source and writes its snapshot, replacing the snapshots of
+        older versions of the source.
+
+        Returns:
+            Path: The snapshot file.
+        """
+        snapshot_path = cls.snapshot_path(src_path, snapshot_dir)
+        cls.from_path(src_path).write_snapshot(snapshot_path)
+        return snapshot_path
+
+    @classmethod
+    def open(cls, src_path: str | Path, snapshot_dir: str | Path | None = None) -> "StixStore":
+        """
+        Opens the snapshot of a STIX source, compiling it first if the source changed since
+        the last snapshot (or there is none).
+
+        Args:
+            src_path (str | Path): The STIX bundle or folder.
+            snapshot_dir (str | Path | None): The snapshot folder, see snapshot_path.
+        """
+        snapshot_path = cls.snapshot_path(src_path, snapshot_dir)
+        if snapshot_path.is_file():
+            try:
+                return cls.load_snapshot(snapshot_path)
+            except (pa.ArrowInvalid, OSError, KeyError, ValueError) as e:
+                logger.warning(f"Rebuilding unreadable STIX snapshot {snapshot_path}: {e}")
+
+        store = cls.from_path(src_path)
+        store.write_snapshot(snapshot_path)
+        return store
+
+    def write_snapshot(self, snapshot_path: str | Path) -> None:
+        snapshot_path = Path(snapshot_path)
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+
+        positions = pa.list_(pa.int32())
+        columns = {
+            "record": pa.array(
+                [[json.dumps(record) for record in self.records]], pa.list_(pa.string())
+            ),
+            **_index_columns("by_id", self._by_id, pa.int32()),
+            **_index_columns("by_type", self._by_type, positions),
+            **_index_columns("by_external_id", self._by_external_id, positions),
+        }
+        for field, postings in self._postings.items():
+            columns.update(_index_columns(f"postings.{field}", postings, positions))
+        for direction, index in self._adjacency.items():
+            flat = {
+                f"{ref}\x00{relationship_type}": relationship_positions
+                for ref, by_relationship in index.items()
+                if ref is not None
+                for relationship_type, relationship_positions in by_relationship.items()
+                if relationship_type is not None
+            }
+            columns.update(_index_columns(f"adjacency.{direction}", flat, positions))
+        table = pa.table(columns).replace_schema_metadata(
+            {"ragintel.snapshot_version": SNAPSHOT_VERSION}
+        )
+
+        # Write under a temporary name first, so readers never open a partial snapshot
+        tmp_path = snapshot_path.with_suffix(f".{os.getpid()}.tmp")
+        with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        tmp_path.replace(snapshot_path)
+
+        # Snapshots of older versions of the source are not used anymore
+        source_name = snapshot_path.name.rsplit("-", 1)[0]
+        hash_pattern = "[0-9a-f]" * 40
+        for stale_path in snapshot_path.parent.glob(f"{source_name}-{hash_pattern}.v*.arrow"):
+            if stale_path != snapshot_path:
+                stale_path.unlink(missing_ok=True)
+
+        logger.info(
+            f"Wrote STIX snapshot {snapshot_path} with {len(self.records)} objects "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+    @classmethod
+    def load_snapshot(cls, snapshot_path: str | Path) -> "StixStore":
+        """
+        Opens a snapshot written by write_snapshot, memory-mapped.
+
+        Raises:
+            ValueError: If the snapshot was written by another snapshot version.
+        """
+        started = time.perf_counter()
+        reader = pa.ipc.open_file(pa.memory_map(str(snapshot_path), "r"))
+        metadata = reader.schema.metadata or {}
+        version = metadata.get(b"ragintel.snapshot_version", b"").decode()
+        if version != SNAPSHOT_VERSION:
+            msg = f"Snapshot version {version or 'unknown'} is not {SNAPSHOT_VERSION}"
+            raise ValueError(msg)
+
+        # Zero-copy: the columns point into the memory-mapped file, and nothing is decoded
+        # until a lookup reads it
+        table = reader.read_all()
+
+        def column(name: str) -> pa.Array:
+            return table.column(name).chunk(0).flatten()
+
+        def index(name: str) -> _SnapshotIndex:
+            return _SnapshotIndex(column(f"{name}.keys"), column(f"{name}.values"))
+
+        store = cls.__new__(cls)
+        store.records = _SnapshotRecords(column("record"))
+        store._by_id = index("by_id")
+        store._by_type = index("by_type")
+        store._by_external_id = index("by_external_id")
+        store._postings = {field: index(f"postings.{field}") for field in SEARCH_FIELDS}
+        store._adjacency = {
+            direction: _SnapshotAdjacency(index(f"adjacency.{direction}"))
+            for direction in DIRECTIONS
+        }
+        logger.debug(
+            f"Opened STIX snapshot {snapshot_path} with {len(store.records)} objects "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+        return store
+
+    def _build_indexes(self) -> None:
+        by_id = {}
+        by_type = defaultdict(list)
+        by_external_id = defaultdict(list)
+        # token -> ascending positions of the objects containing it
+        postings = {field: defaultdict(list) for field in SEARCH_FIELDS}
+        # ref -> relationship type -> positions of the relationships, per direction
+        adjacency = {direction: defaultdict(lambda: defaultdict(list)) for direction in DIRECTIONS}
+
+        for position, record in enumerate(self.records):
+            by_id[record["id"]] = position
+            by_type[record.get("type")].append(position)
+            if record.get("type") == "relationship":
+                relationship_type = record.get("relationship_type")
+                adjacency["outgoing"][record.get("source_ref")][relationship_type].append(position)
+                adjacency["incoming"][record.get("target_ref")][relationship_type].append(position)
+            for reference in record.get("external_references", []):
+                if "external_id" in reference:
+                    by_external_id[reference["external_id"]].append(position)
+            for field in SEARCH_FIELDS:
+                for token in set(tokenize(record.get(field, ""))):
+                    postings[field][token].append(position)
+
+        self._by_id = by_id
+        self._by_type = dict(by_type)
+        self._by_external_id = dict(by_external_id)
+        self._postings = {field: dict(index) for field, index in postings.items()}
+        self._adjacency = {
+            direction: {ref: dict(by_relationship) for ref, by_relationship in index.items()}
+            for direction, index in adjacency.items()
+        }
+        # Sorted tokens of every field, for prefix lookups
+        self._vocabulary = {field: sorted(index) for field, index in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, stix_id: str, stix_type: str | None = None) -> StixRecord | None:
+        position = self._by_id.get(stix_id)
+        if position is None:
+            return None
+        record = self.records[position]
+        if stix_type is not None and record.get("type") != stix_type:
+            return None
+        return record
+
+    def of_type(self, stix_type: str) -> list[StixRecord]:
+        return [self.records[position] for position in self._by_type.get(stix_type, [])]
+
+    def lookup_external_id(
+        self, external_id: str, source_name: str | None = None, stix_type: str | None = None
+    ) -> list[StixRecord]:
+        """
+        Returns the objects with an external reference to external_id, e.g. "CAPEC-66".
+
+        Args:
+            external_id (str): The external id.
+            source_name (str | None): Only match references from this source, e.g. "capec".
+            stix_type (str | None): Only return objects of this type.
+        """
+        matches = []
+        for position in self._by_external_id.get(external_id, []):
+            record = self.records[position]
+            if stix_type is not None and record.get("type") != stix_type:
+                continue
+            if source_name is not None and not any(
+                reference.get("external_id") == external_id
+                and reference.get("source_name") == source_name
+                for reference in record.get("external_references", [])
+            ):
+                continue
+            matches.append(record)
+        return matches
+
+    def _prefix_postings(self, field: str, token: str) -> set[int]:
+        # Objects with a word starting with token, found by bisecting the sorted vocabulary
+        postings = self._postings[field]
+        if isinstance(postings, _SnapshotIndex):
+            # Every word starting with token sorts before token with its last character bumped
+            stop = token[:-1] + chr(ord(token[-1]) + 1)
+            return {
+                position for _, positions in postings.range(token, stop) for position in positions
+            }
+
+        vocabulary = self._vocabulary[field]
+        matches = set()
+        index = bisect_left(vocabulary, token)
+        while index < len(vocabulary) and vocabulary[index].startswith(token):
+            matches.update(postings[vocabulary[index]])
+            index += 1
+        return matches
+
+    def search(self, field: str, text: str, stix_type: str | None = None) -> list[StixRecord]:
+        """
+        Returns the objects whose field contains text, case-insensitively.
+
+        Every word of text has to start a word of the field, so "sql inj" matches "SQL
+        Injection" but "njection" does not match it.
+
+        Args:
+            field (str): "name" or "description".
+            text (str): The text to look for.
+            stix_type (str | None): Only return objects of this type.
+
+        Raises:
+            ValueError: If field is not indexed.
+        """
+        if field not in self._postings:
+            msg = f"Field {field} is not indexed, use one of {SEARCH_FIELDS}"
+            raise ValueError(msg)
+
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+
+        # Rarest postings first, so the intersection shrinks as early as possible
+        postings = sorted((self._prefix_postings(field, token) for token in tokens), key=len)
+        candidates = postings[0]
+        for matches in postings[1:]:
+            candidates &= matches
+            if not candidates:
+                return []
+
+        phrase = " ".join(tokens)
+        results = []
+        for position in sorted(candidates):
+            record = self.records[position]
+            if stix_type is not None and record.get("type") != stix_type:
+                continue
+            # The tokens have to appear in the query's order, as a phrase
+            if len(tokens) > 1 and phrase not in " ".join(tokenize(record.get(field, ""))):
+                continue
+            results.append(record)
+        return results
+
+    def _relationship_positions(
+        self, stix_id: str, relationship_type: str | None, direction: str
+    ) -> list[int]:
+        by_relationship = self._adjacency[direction].get(stix_id)
+        if not by_relationship:
+            return []
+        if relationship_type is not None:
+            return by_relationship.get(relationship_type, [])
+        return [position for positions in by_relationship.values() for position in positions]
+
+    def relationships_of(
+        self,
+        stix_ids: Iterable[str],
+        relationship_type: str | None = None,
+        direction: str = "incoming",
+    ) -> dict[str, list[StixRecord]]:
+        """
+        Returns the relationship objects of several objects at once.
+
+        Args:
+            stix_ids (Iterable[str]): The objects.
+            relationship_type (str | None): Only return relationships of this type, e.g.
+                "mitigates". Default is every type.
+            direction (str): "incoming" for relationships whose target_ref is the object,
+                "outgoing" for those whose source_ref is. Default is "incoming".
+
+        Returns:
+            dict[str, list[StixRecord]]: The relationships of every object, by object id.
+
+        Raises:
+            ValueError: If direction is not one of DIRECTIONS.
+        """
+        if direction not in DIRECTIONS:
+            msg = f"Unknown direction {direction}, use one of {DIRECTIONS}"
+            raise ValueError(msg)
+        return {
+            stix_id: [
+                self.records[position]
+                for position in self._relationship_positions(stix_id, relationship_type, direction)
+            ]
+            for stix_id in dict.fromkeys(stix_ids)
+        }
+
+    def neighbors(
+        self,
+        stix_ids: Iterable[str],
+        relationship_type: str | None = None,
+        direction: str = "incoming",
+        stix_type: str | None = None,
+    ) -> dict[str, list[StixRecord]]:
+        """
+        Returns the objects at the other end of the relationships of several objects at once,
+        e.g. the courses of action that mitigate each attack pattern.
+
+        Args:
+            stix_ids (Iterable[str]): The objects.
+            relationship_type (str | None): Only follow relationships of this type.
+            direction (str): "incoming" or "outgoing", see relationships_of.
+            stix_type (str | None): Only return objects of this type.
+
+        Returns:
+            dict[str, list[StixRecord]]: The distinct neighbors of every object, by object id.
+        """
+        end = "source_ref" if direction == "incoming" else "target_ref"
+        neighbors = {}
+        for stix_id, relationships in self.relationships_of(
+            stix_ids, relationship_type, direction
+        ).items():
+            records = (self.get(relationship[end], stix_type) for relationship in relationships)
+            unique = {record["id"]: record for record in records if record is not None}
+            neighbors[stix_id] = list(unique.values())
+        return neighbors
+
+    def traverse(
+        self,
+        stix_ids: Iterable[str],
+        steps: Sequence[tuple[str | None, str]],
+        stix_type: str | None = None,
+    ) -> dict[str, list[StixRecord]]:
+        """
+        Follows a path of relationships from several objects at once.
+
+        Args:
+            stix_ids (Iterable[str]): The objects the path starts from.
+            steps (Sequence[tuple[str | None, str]]): (relationship type, direction) of every
+                hop, e.g. [("mitigates", "incoming")].
+            stix_type (str | None): Only return objects of this type at the end of the path.
+
+        Returns:
+            dict[str, list[StixRecord]]: The distinct objects reached from every start object.
+        """
+        reached = {}
+        for stix_id in dict.fromkeys(stix_ids):
+            frontier = [stix_id]
+            for index, (relationship_type, direction) in enumerate(steps):
+                last_hop = index == len(steps) - 1
+                hop = self.neighbors(
+                    frontier, relationship_type, direction, stix_type if last_hop else None
+                )
+                frontier = list(
+                    dict.fromkeys(record["id"] for records in hop.values() for record in records)
+                )
+            reached[stix_id] = [
+                self.records[self._by_id[ref]] for ref in frontier if ref in self._by_id
+            ]
+        return reached
+
+    @staticmethod
+    def external_ids(record: dict, source_name: str) -> list[str]:
+        """
+        Returns the ids a record references in an external source, e.g. its CWE ids.
+        """
+        return [
+            reference["external_id"]
+            for reference in record.get("external_references", [])
+            if reference.get("source_name") == source_name and "external_id" in reference
+        ]
@@ -1,14 +1,182 @@
+import os
 import uuid
+from collections.abc import AsyncIterator, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING
 
 import html2text
 from langchain.docstore.document import Document
 from loguru import logger
 
+from ragintel.utils.background_loop import BackgroundLoop
+from ragintel.utils.base.extraction_cache import ExtractionCache
+
+if TYPE_CHECKING:
+    from ragintel.tools.loaders.html.browser_pool import BrowserPool
+    from ragintel.tools.loaders.html.fetch_archive import FetchArchive
+    from ragintel.tools.loaders.html.fetcher import AsyncHTMLFetcher
+
+HTML2TEXT_VERSION = ".".join(str(part) for part in html2text.__version__)
+
+# Below this many pages, starting worker processes costs more than the conversion itself
+MIN_POOL_BATCH = 8
+
 
 class HTMLLoader:
-    def __init__(self):
+    def __init__(
+        self,
+        cache: ExtractionCache | None = None,
+        fetcher: "AsyncHTMLFetcher | None" = None,
+        browser_pool: "BrowserPool | None" = None,
+        archive: "FetchArchive | None" = None,
+    ):
+        """
+        Initialize the HTMLLoader.
+
+        Args:
+            cache (ExtractionCache | None): If given, convert_html_to_text caches the text of each
+                page by content hash and skips pages it has already converted.
+            fetcher (AsyncHTMLFetcher | None): The fetcher used by the ragintel.simple_html
+                loader. Created with its defaults on first use if not given.
+            browser_pool (BrowserPool | None): The headless browser used by the
+                langchain.async_html loader. Created with its defaults on first use if not given.
+            archive (FetchArchive | None): If given, fetched and rendered pages are written to
+                this archive and served from it according to its TTL and replay mode.
+        """
         self.clean_html_docs = []
         self.documents = []
+        self.cache = cache
+        self._fetcher = fetcher
+        self._browser_pool = browser_pool
+        self.archive = archive
+        if fetcher is not None and archive is not None and fetcher.archive is None:
+            fetcher.archive = archive
+        self._loop = BackgroundLoop(name="ragintel-html")
+
+    @property
+    def fetcher(self) -> "AsyncHTMLFetcher":
+        if self._fetcher is None:
+            try:
+                from ragintel.tools.loaders.html.fetcher import AsyncHTMLFetcher
+            except ImportError:
+                logger.error("Missing httpx library")
+                raise
+
+            self._fetcher = AsyncHTMLFetcher(archive=self.archive)
+        return self._fetcher
+
+    @property
+    def browser_pool(self) -> "BrowserPool":
+        if self._browser_pool is None:
+            try:
+                from ragintel.tools.loaders.html.browser_pool import BrowserPool
+            except ImportError:
+                logger.error("Missing playwright library")
+                raise
+
+            self._browser_pool = BrowserPool()
+        return self._browser_pool
+
+    async def aiter_html(self, urls: Iterable[str] | str) -> AsyncIterator[Document]:
+        """
+        Fetches URLs concurrently with the fetcher and yields a document per page as soon as it
+        arrives. Pages that could not be fetched are logged and skipped.
+
+        Args:
+            urls (Iterable[str] | str): The URLs to fetch. Duplicates are fetched once.
+
+        Yields:
+            Document: The raw HTML of each page, in completion order.
+        """
+        if isinstance(urls, str):
+            urls = [urls]
+
+        async for result in self.fetcher.iter_fetch(urls):
+            if not result.ok:
+                logger.warning(f"Skipping {result.url}: {result.error or f'HTTP {result.status}'}")
+                continue
+            yield Document(
+                page_content=result.text,
+                metadata={
+                    "source": "ragintel.simple_html",
+                    "url": result.url,
+                    "status": result.status,
+                    "not_modified": result.not_modified,
+                    "from_archive": result.from_archive,
+                },
+            )
+
+    def iter_html(self, urls: Iterable[str] | str) -> Iterator[Document]:
+        """
+        Synchronous counterpart of aiter_html. The fetches run on a background event loop that
+        is kept between calls, so connections are reused across batches.
+        """
+        return self._loop.iterate(self.aiter_html(urls))
+
+    async def aiter_rendered_html(
+        self, urls: Iterable[str] | str, wait_for_selector: str | None = None
+    ) -> AsyncIterator[Document]:
+        """
+        Renders URLs in the browser pool and yields a document per page as soon as it is ready.
+        Pages that could not be rendered are logged and skipped. With an archive, archived
+        renders within its TTL are served first and the browser is only used for the rest (and
+        never in replay mode).
+
+        Args:
+            urls (Iterable[str] | str): The URLs to render. Duplicates are rendered once.
+            wait_for_selector (str | None): CSS selector to wait for before reading each page.
+
+        Yields:
+            Document: The rendered HTML of each page, in completion order.
+        """
+        if isinstance(urls, str):
+            urls = [urls]
+
+        if self.archive is not None:
+            to_render = []
+            for url in dict.fromkeys(urls):
+                record = self.archive.get(url, kind="rendered")
+                if record is not None and self.archive.is_fresh(record):
+                    yield Document(
+                        page_content=record.text, metadata={"source": url, "from_archive": True}
+                    )
+                elif self.archive.replay:
+                    logger.warning(f"Skipping {url}: not in the fetch archive (replay mode)")
+                else:
+                    to_render.append(url)
+            urls = to_render
+            if not urls:
+                return
+
+        async for result in self.browser_pool.iter_render(urls, wait_for_selector):
+            if not result.ok:
+                logger.warning(f"Skipping {result.url}: {result.error or f'HTTP {result.status}'}")
+                continue
+            if self.archive is not None:
+                self.archive.put(
+                    result.url, result.status, result.headers or {}, result.text, kind="rendered"
+                )
+            yield Document(page_content=result.text, metadata={"source": result.url})
+
+    def iter_rendered_html(
+        self, urls: Iterable[str] | str, wait_for_selector: str | None = None
+    ) -> Iterator[Document]:
+        """
+        Synchronous counterpart of aiter_rendered_html. The browser stays open between calls.
+        """
+        return self._loop.iterate(self.aiter_rendered_html(urls, wait_for_selector))
+
+    def close(self) -> None:
+        """
+        Closes the fetcher's connections and the browser, and stops the background event loop.
+        """
+        if self._loop.started:
+            if self._fetcher is not None:
+                self._loop.run(self._fetcher.aclose())
+            if self._browser_pool is not None:
+                self._loop.run(self._browser_pool.aclose())
+        self._loop.close()
 
     def convert_html_to_text(
         self, docs: list[Document], parser: str = "langchain.html_parser"
@@ -22,7 +190,14 @@ class HTMLLoader:
             logger.info("Converting HTML to plain text using ragintel.html2text")
             for doc in self.docs:
                 raw_html = doc.page_content
-                clean_html_text = html2text.html2text(raw_html)
+                if self.cache is None:
+                    clean_html_text = html2text.html2text(raw_html)
+                else:
+                    clean_html_text = self.cache.get_or_extract(
+                        raw_html.encode("utf-8"),
+                        f"ragintel.html2text:{HTML2TEXT_VERSION}",
+                        lambda raw_html=raw_html: html2text.html2text(raw_html),
+                    )
                 html_document = Document(
                     page_content=clean_html_text,
                     metadata={"parser": "ragintel.html2text", "id": str(uuid.uuid4())},
@@ -37,9 +212,27 @@ class HTMLLoader:
             except ImportError:
                 logger.error("Missing langchain's Html2TextTransformer library")
 
-            # Transform
-            _html2text = Html2TextTransformer()
-            docs_transformed = _html2text.transform_documents(self.docs)
+            # Only transform the pages that are not cached yet
+            extractor = f"langchain.html_parser:{HTML2TEXT_VERSION}"
+            cache_keys = []
+            docs_transformed = []
+            for doc in self.docs:
+                key = None
+                cached = None
+                if self.cache is not None:
+                    key = self.cache.key(doc.page_content.encode("utf-8"), extractor)
+                    cached = self.cache.get(key)
+                cache_keys.append(key)
+                docs_transformed.append(None if cached is None else Document(page_content=cached))
+
+            missing = [index for index, doc in enumerate(docs_transformed) if doc is None]
+            if missing:
+                _html2text = Html2TextTransformer()
+                transformed = _html2text.transform_documents([self.docs[i] for i in missing])
+                for index, doc in zip(missing, transformed, strict=True):
+                    docs_transformed[index] = doc
+                    if self.cache is not None:
+                        self.cache.put(cache_keys[index], doc.page_content)
 
             for doc in docs_transformed:
                 doc.metadata = {"parser": "langchain.html_parser", "id": str(uuid.uuid4())}
@@ -51,10 +244,21 @@ class HTMLLoader:
         return self.clean_html_docs
 
     def load_html(
-        self, url: list | str = ..., loader_type: str = "ragintel.simple_html"
+        self,
+        url: list | str = ...,
+        loader_type: str = "ragintel.simple_html",
+        wait_for_selector: str | None = None,
     ) -> list[Document]:
         """
         Load HTML content from the specified URL and convert it to plain text.
+
+        Args:
+            url (list | str): The URL or URLs to load.
+            loader_type (str): "ragintel.simple_html" fetches the raw HTML over HTTP,
+                "langchain.async_html" renders pages with JavaScript in the shared browser pool
+                and "langchain.web_based_loader" uses langchain's WebBaseLoader.
+            wait_for_selector (str | None): For langchain.async_html, a CSS selector that has to
+                be present before a page is read.
         """
         self.url = url
         self.loader_type = loader_type
@@ -64,36 +268,17 @@ class HTMLLoader:
             self.url = [self.url]
 
         if self.loader_type == "ragintel.simple_html":
-            try:
-                import requests
-            except ImportError:
-                logger.error("Missing requests library")
-
-            # Use requests to fetch the HTML content
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 6.1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/41.0.2228.0 Safari/537.36",
-            }
-
-            for url in self.url:
-                response = requests.get(url, headers=headers)
-                html_documents = Document(
-                    page_content=response.text,
-                    metadata={"source": "ragintel.simple_html"},
-                )
-                self.documents.append(html_documents)
+            # Documents are returned per call, use iter_html to stream them instead
+            self.documents = list(self.iter_html(self.url))
 
         elif self.loader_type == "langchain.async_html":
+            # Same output as langchain's AsyncChromiumLoader, but the browser is reused across
+            # calls and pages render concurrently instead of one Chromium launch per call
             try:
-                from langchain_community.document_loaders import AsyncChromiumLoader
-            except ImportError:
-                logger.error("Missing langchain AsyncChromiumLoader library")
-
-            try:
-                loader = AsyncChromiumLoader(self.url)
-                html_documents = loader.load()
-                self.documents = html_documents
+                self.documents = list(self.iter_rendered_html(self.url, wait_for_selector))
             except Exception as e:
-                logger.error(f"Error loading HTML content with AsyncChromiumLoader: {e}")
+                logger.error(f"Error loading HTML content with the browser pool: {e}")
+                self.documents = []
 
         elif self.loader_type == "langchain.web_based_loader":
             try:
@@ -112,8 +297,84 @@ class HTMLLoader:
         logger.info(f"Loaded {len(self.documents)} HTML documents")
         return self.documents
 
-    def load_html_with_filter(self, html_tag_filters: list) -> str:
+    def load_html_with_filter(
+        self,
+        html_tag_filters: list[str] | None = None,
+        docs: list[Document] | None = None,
+        url: list | str | None = None,
+        loader_type: str = "ragintel.simple_html",
+        workers: int | None = None,
+    ) -> list[Document]:
         """
         Load HTML content, apply a custom filter function, and convert it to plain text.
+
+        Comments, scripts and page chrome (navigation, share bars, comment threads...) are
+        stripped with lxml, then only the elements matching html_tag_filters, or the detected
+        article body if no filters are given, are converted to text. Pages are converted in a
+        process pool.
+
+        Args:
+            html_tag_filters (list[str] | None): Tag names (e.g. "article"), CSS selectors (e.g.
+                "div.post-content") or XPath expressions of the elements to keep.
+            docs (list[Document] | None): HTML documents to convert. If None, url is loaded with
+                load_html, and if url is None as well the documents of the last load are used.
+            url (list | str | None): URLs to load first when docs is None.
+            loader_type (str): The load_html loader used for url.
+            workers (int | None): Number of worker processes. Defaults to the CPU count. Small
+                batches are converted in-process.
+
+        Returns:
+            List[Document]: One plain-text document per page.
         """
-        return "todo"
+        try:
+            from ragintel.tools.loaders.html.content_filter import FILTER_VERSION, filter_html
+        except ImportError:
+            logger.error("Missing lxml library")
+            raise
+
+        if docs is None:
+            docs = (
+                self.load_html(url, loader_type=loader_type) if url is not None else self.documents
+            )
+
+        filters = tuple(html_tag_filters or ())
+        extractor = f"ragintel.html_filter:{FILTER_VERSION}:{HTML2TEXT_VERSION}:{'|'.join(filters)}"
+
+        texts: list[str | None] = [None] * len(docs)
+        cache_keys: list[str | None] = [None] * len(docs)
+        if self.cache is not None:
+            for index, doc in enumerate(docs):
+                cache_keys[index] = self.cache.key(doc.page_content.encode("utf-8"), extractor)
+                texts[index] = self.cache.get(cache_keys[index])
+
+        missing = [index for index, text in enumerate(texts) if text is None]
+        raw_htmls = [docs[index].page_content for index in missing]
+        convert = partial(filter_html, html_tag_filters=filters)
+        workers = workers or os.cpu_count() or 1
+
+        if workers == 1 or len(missing) < MIN_POOL_BATCH:
+            converted = map(convert, raw_htmls)
+        else:
+            logger.info(f"Converting {len(missing)} HTML documents in {workers} processes")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunksize = max(1, len(missing) // (workers * 4))
+                converted = list(executor.map(convert, raw_htmls, chunksize=chunksize))
+
+        for index, text in zip(missing, converted, strict=True):
+            texts[index] = text
+            if self.cache is not None:
+                self.cache.put(cache_keys[index], text)
+
+        self.clean_html_docs = [
+            Document(
+                page_content=text,
+                metadata={
+                    **{k: v for k, v in doc.metadata.items() if k in ("source", "url")},
+                    "parser": "ragintel.html_filter",
+                    "id": str(uuid.uuid4()),
+                },
+            )
+            for doc, text in zip(docs, texts, strict=True)
+        ]
+        logger.info(f"Converted {len(self.clean_html_docs)} filtered HTML documents to plain text")
+        return self.clean_html_docs
@@ -0,0 +1,201 @@
+import asyncio
+import itertools
+from collections.abc import AsyncIterator, Iterable
+from contextlib import suppress
+
+from loguru import logger
+from playwright.async_api import Browser, BrowserContext, Playwright, Route, async_playwright
+from playwright.async_api import Error as PlaywrightError
+
+from ragintel.tools.loaders.html.fetcher import DEFAULT_USER_AGENT, FetchResult
+
+# Resource types that do not change the rendered text but dominate page load time
+BLOCKED_RESOURCE_TYPES = ("image", "font", "media")
+
+
+class _PooledContext:
+    def __init__(self, context: BrowserContext):
+        self.context = context
+        self.pages_served = 0
+
+
+class BrowserPool:
+    """A long-lived headless Chromium shared by every render.
+
+    The browser is started once and keeps a few browser contexts open. Each render opens a page in
+    one of them, and at most max_pages pages are open at a time. Images, fonts and media are
+    blocked at the network level. A page counts as loaded once its DOM is ready, or once
+    wait_for_selector is attached, rather than after a fixed sleep. Contexts are recycled after
+    pages_per_context renders, so a long run does not pile up cookies, caches and leaked memory.
+    """
+
+    def __init__(
+        self,
+        max_pages: int = 4,
+        num_contexts: int = 2,
+        pages_per_context: int = 100,
+        headless: bool = True,
+        timeout: float = 30.0,
+        wait_until: str = "domcontentloaded",
+        blocked_resource_types: Iterable[str] = BLOCKED_RESOURCE_TYPES,
+        user_agent: str = DEFAULT_USER_AGENT,
+    ):
+        """
+        Initialize the BrowserPool. The browser itself is only launched on first use.
+
+        Args:
+            max_pages (int): Maximum number of pages rendering concurrently.
+            num_contexts (int): Number of browser contexts pages are spread over.
+            pages_per_context (int): Renders after which a context is replaced by a fresh one.
+            headless (bool): Run Chromium without a window. Default is True.
+            timeout (float): Navigation and selector timeout in seconds.
+            wait_until (str): Playwright load state that ends navigation, e.g. "load" or
+                "networkidle". Default is "domcontentloaded".
+            blocked_resource_types (Iterable[str]): Playwright resource types that are aborted.
+            user_agent (str): User agent of every context.
+        """
+        self.max_pages = max_pages
+        self.num_contexts = num_contexts
+        self.pages_per_context = pages_per_context
+        self.headless = headless
+        self.timeout = timeout
+        self.wait_until = wait_until
+        self.blocked_resource_types = frozenset(blocked_resource_types)
+        self.user_agent = user_agent
+        self._playwright: Playwright | None = None
+        self._browser: Browser | None = None
+        self._contexts: list[_PooledContext] = []
+        self._next_context = itertools.count()
+        self._pages: asyncio.Semaphore | None = None
+        self._start_lock: asyncio.Lock | None = None
+        self._closing: set[asyncio.Task] = set()
+
+    async def _block_resources(self, route: Route) -> None:
+        if route.request.resource_type in self.blocked_resource_types:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _new_context(self) -> _PooledContext:
+        context = await self._browser.new_context(user_agent=self.user_agent)
+        context.set_default_timeout(self.timeout * 1000)
+        if self.blocked_resource_types:
+            await context.route("**/*", self._block_resources)
+        return _PooledContext(context)
+
+    async def start(self) -> None:
+        """
+        Launches the browser and its contexts. Called automatically by render, and again if the
+        browser was disconnected (e.g. it crashed).
+        """
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+            self._pages = asyncio.Semaphore(self.max_pages)
+
+        async with self._start_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if self._browser is not None:
+                logger.warning("Browser disconnected, restarting it")
+                await self.aclose()
+
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self._contexts = [await self._new_context() for _ in range(self.num_contexts)]
+            logger.info(f"Started Chromium with {self.num_contexts} contexts")
+
+    async def _acquire_context(self) -> _PooledContext:
+        index = next(self._next_context) % len(self._contexts)
+        pooled = self._contexts[index]
+        if pooled.pages_served >= self.pages_per_context:
+            stale = pooled
+            pooled = await self._new_context()
+            self._contexts[index] = pooled
+            # Pages still rendering in the stale context keep their own reference to it
+            task = asyncio.get_running_loop().create_task(self._close_when_idle(stale.context))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+        pooled.pages_served += 1
+        return pooled
+
+    async def _close_when_idle(self, context: BrowserContext) -> None:
+        while context.pages:
+            await asyncio.sleep(0.5)
+        with suppress(PlaywrightError):
+            await context.close()
+
+    async def render(self, url: str, wait_for_selector: str | None = None) -> FetchResult:
+        """
+        Renders a URL and returns the resulting DOM as HTML.
+
+        Args:
+            url (str): The page to render.
+            wait_for_selector (str | None): CSS selector that has to be attached to the DOM
+                before the content is read, e.g. "article". If None, the content is read as soon
+                as the wait_until load state is reached.
+
+        Returns:
+            FetchResult: The rendered HTML and response status, or the error.
+        """
+        await self.start()
+        async with self._pages:
+            pooled = await self._acquire_context()
+            page = await pooled.context.new_page()
+            try:
+                response = await page.goto(url, wait_until=self.wait_until)
+                if wait_for_selector:
+                    await page.wait_for_selector(wait_for_selector, state="attached")
+                html = await page.content()
+                status = response.status if response is not None else None
+                headers = await response.all_headers() if response is not None else None
+                return FetchResult(url, status, html, headers)
+            except PlaywrightError as e:
+                logger.error(f"Failed to render {url}: {e}")
+                return FetchResult(url, error=f"{type(e).__name__}: {e}")
+            finally:
+                await page.close()
+
+    async def iter_render(
+        self, urls: Iterable[str], wait_for_selector: str | None = None
+    ) -> AsyncIterator[FetchResult]:
+        """
+        Renders URLs concurrently (up to max_pages at a time) and yields each result as soon as
+        it is ready, in completion order.
+        """
+        tasks = [
+            asyncio.ensure_future(self.render(url, wait_for_selector))
+            for url in dict.fromkeys(urls)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def aclose(self) -> None:
+        """
+        Closes every context, the browser and the Playwright driver.
+        """
+        for task in self._closing:
+            task.cancel()
+        for pooled in self._contexts:
+            with suppress(PlaywrightError):
+                await pooled.context.close()
+        self._contexts = []
+
+        if self._browser is not None:
+            with suppress(PlaywrightError):
+                await self._browser.close()
+            self._browser = None
+
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def __aenter__(self) -> "BrowserPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
@@ -0,0 +1,211 @@
+import re
+from functools import lru_cache
+
+import html2text
+import lxml.html
+from loguru import logger
+from lxml import etree
+
+try:
+    from cssselect import GenericTranslator
+
+    HAS_CSSSELECT = True
+except ImportError:
+    HAS_CSSSELECT = False
+
+FILTER_VERSION = "1"
+
+# Elements that never hold article text
+BOILERPLATE_TAGS = (
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "iframe",
+    "svg",
+    "canvas",
+    "form",
+    "button",
+    "nav",
+    "header",
+    "footer",
+    "aside",
+)
+
+# class / id fragments of page chrome around the article: menus, share bars, comment threads...
+BOILERPLATE_HINTS = re.compile(
+    r"(^|[\s_-])(nav|navbar|menu|breadcrumbs?|sidebar|footer|masthead|comments?|share|sharing|"
+    r"social|related|recommended|advert|ads?|promo|banner|cookies?|consent|newsletter|"
+    r"subscribe|popup|modal)($|[\s_-])",
+    re.IGNORECASE,
+)
+
+# Containers that usually wrap the main article, tried in this order
+MAIN_CONTENT_XPATHS = ("//article", "//main", "//*[@role='main']")
+
+CANDIDATE_TAGS = ("div", "section", "article", "main", "td")
+
+_SIMPLE_SELECTOR = re.compile(
+    r"(?P<tag>[a-zA-Z][\w-]*|\*)?(?P<qualifiers>(?:[#.][\w-]+|\[[^\]]+\])*)"
+)
+_QUALIFIER = re.compile(r"([#.])([\w-]+)|\[([\w-]+)(?:=[\"']?([^\]\"']*)[\"']?)?\]")
+
+
+@lru_cache(maxsize=256)
+def selector_to_xpath(selector: str) -> str:
+    """
+    Translates a filter into an XPath expression.
+
+    Filters starting with "/" or "(" are taken as XPath. CSS selectors are translated with
+    cssselect when it is installed. Otherwise a subset of CSS is supported: tag names, #id,
+    .class, [attr] and [attr=value], optionally combined (e.g. "div.post-body") and chained with
+    descendant combinators (e.g. "main article p").
+
+    Raises:
+        ValueError: If the selector is not supported.
+    """
+    selector = selector.strip()
+    if selector.startswith(("/", "(")):
+        return selector
+    if HAS_CSSSELECT:
+        return GenericTranslator().css_to_xpath(selector)
+
+    steps = []
+    for part in selector.split():
+        match = _SIMPLE_SELECTOR.fullmatch(part)
+        if match is None:
+            msg = f"Unsupported CSS selector (install cssselect for full support): {selector}"
+            raise ValueError(msg)
+
+        conditions = []
+        for prefix, name, attr, value in _QUALIFIER.findall(match["qualifiers"]):
+            if prefix == "#":
+                conditions.append(f"@id='{name}'")
+            elif prefix == ".":
+                conditions.append(
+                    f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+                )
+            elif value:
+                conditions.append(f"@{attr}='{value}'")
+            else:
+                conditions.append(f"@{attr}")
+
+        step = match["tag"] or "*"
+        if conditions:
+            step += f"[{' and '.join(conditions)}]"
+        steps.append(step)
+
+    return "descendant-or-self::" + "//".join(steps)
+
+
+def strip_boilerplate(root: lxml.html.HtmlElement) -> None:
+    """
+    Removes comments, non-content elements and page chrome (navigation, share bars, comment
+    threads...) from a parsed document, in place.
+    """
+    # Comments outside the root element, such as a saved page's "<!-- saved from url=... -->"
+    # before <html>, have no parent to be dropped from and are not part of root's text anyway
+    etree.strip_tags(root, etree.Comment)
+
+    for element in list(root.iter(*BOILERPLATE_TAGS)):
+        # An <article> may have its own <header> with the title, keep those
+        if element.tag == "header" and any(a.tag == "article" for a in element.iterancestors()):
+            continue
+        element.drop_tree()
+
+    # Class and id hints are fuzzy ("no-sidebar" on a page wrapper), so never drop an element
+    # that wraps the article or most of the page text
+    page_length = _text_length(root)
+    for element in root.xpath("//*[@class or @id]"):
+        if element.tag in ("html", "body", "article", "main"):
+            continue
+        hints = f"{element.get('class', '')} {element.get('id', '')}"
+        if not BOILERPLATE_HINTS.search(hints):
+            continue
+        if element.find(".//article") is not None or element.find(".//main") is not None:
+            continue
+        if _text_length(element) > page_length / 2:
+            continue
+        element.drop_tree()
+
+
+def _text_length(element: lxml.html.HtmlElement) -> int:
+    return len(" ".join(element.text_content().split()))
+
+
+def find_main_content(root: lxml.html.HtmlElement) -> lxml.html.HtmlElement:
+    """
+    Returns the element most likely to hold the article: the largest <article>, <main> or
+    role="main" element, or else the container with the most text that is not link text.
+    """
+    for xpath in MAIN_CONTENT_XPATHS:
+        candidates = root.xpath(xpath)
+        if candidates:
+            return max(candidates, key=_text_length)
+
+    best, best_score = root, 0.0
+    for element in root.iter(*CANDIDATE_TAGS):
+        text_length = _text_length(element)
+        if text_length < 200:
+            continue
+        link_length = sum(_text_length(link) for link in element.iter("a"))
+        # Prefer dense text blocks over wrappers holding the whole page
+        score = (text_length - link_length) * (1 - link_length / text_length)
+        paragraphs = len(element.findall("p"))
+        score *= 1 + min(paragraphs, 20) / 10
+        if score > best_score:
+            best, best_score = element, score
+    return best
+
+
+def filter_html(
+    raw_html: str,
+    html_tag_filters: tuple[str, ...] | list[str] | None = None,
+    strip: bool = True,
+) -> str:
+    """
+    Isolates the article body of a page and converts it to text.
+
+    Args:
+        raw_html (str): The page HTML.
+        html_tag_filters (list[str] | None): Tag names, CSS selectors or XPath expressions of the
+            elements to keep. If empty, the main content is detected automatically.
+        strip (bool): Remove comments, scripts and page chrome first. Default is True.
+
+    Returns:
+        str: The text of the kept elements, formatted as Markdown by html2text.
+    """
+    if not raw_html or not raw_html.strip():
+        return ""
+
+    try:
+        root = lxml.html.document_fromstring(raw_html)
+    except (etree.ParserError, ValueError) as e:
+        logger.warning(f"Could not parse HTML: {e}")
+        return ""
+
+    if strip:
+        strip_boilerplate(root)
+
+    if html_tag_filters:
+        elements = []
+        for selector in html_tag_filters:
+            elements.extend(root.xpath(selector_to_xpath(selector)))
+        # Skip elements nested in another match so their text is not repeated
+        kept = set(elements)
+        elements = [
+            element
+            for element in dict.fromkeys(elements)
+            if not any(ancestor in kept for ancestor in element.iterancestors())
+        ]
+    else:
+        elements = [find_main_content(root)]
+
+    if not elements:
+        return ""
+
+    converter = html2text.HTML2Text()
+    converter.ignore_images = True
+    converter.body_width = 0
+    fragment = "".join(lxml.html.tostring(element, encoding="unicode") for element in elements)
+    return converter.handle(fragment).strip()
@@ -0,0 +1,150 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+from loguru import logger
+
+DEFAULT_TTL = 24 * 60 * 60
+
+
+class ArchiveRecord(NamedTuple):
+    url: str
+    kind: str
+    status: int
+    headers: dict[str, str]
+    text: str
+    fetched_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class FetchArchive:
+    """On-disk archive of fetched pages, in the spirit of a WARC file.
+
+    Every record holds the URL, the response status and headers, the zlib-compressed body and
+    the fetch time. A record is keyed by URL and kind: "http" for raw fetches and "rendered" for
+    pages rendered in the browser. Only the latest capture of each URL is kept.
+
+    In replay mode nothing is fetched: pages are served from the archive, and pages missing
+    from it fail. Otherwise an archived page younger than ttl is served as is. An older page is
+    revalidated with the archived ETag / Last-Modified, or fetched again.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path | None = None,
+        ttl: float | None = DEFAULT_TTL,
+        replay: bool | None = None,
+    ):
+        """
+        Initialize the FetchArchive.
+
+        Args:
+            db_path (str | Path | None): Path to the archive. Defaults to the
+                RAGINTEL_FETCH_ARCHIVE_PATH environment variable or "./data/fetch_archive.sqlite".
+            ttl (float | None): Age in seconds up to which archived pages are served without
+                touching the network. 0 revalidates every page, None never refreshes them.
+                Default is one day.
+            replay (bool | None): Serve every fetch from the archive, with no network access.
+                Defaults to the RAGINTEL_FETCH_REPLAY environment variable ("1" or "true").
+        """
+        if db_path is None:
+            db_path = os.getenv("RAGINTEL_FETCH_ARCHIVE_PATH", "./data/fetch_archive.sqlite")
+        if replay is None:
+            replay = os.getenv("RAGINTEL_FETCH_REPLAY", "").lower() in ("1", "true", "yes")
+
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.replay = replay
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                url TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (url, kind)
+            )
+        """)
+        self.conn.commit()
+        logger.debug(f"Initialized FetchArchive at {self.db_path} (replay={self.replay})")
+
+    def get(self, url: str, kind: str = "http") -> ArchiveRecord | None:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT status, headers, body, fetched_at FROM records WHERE url = ? AND kind = ?",
+                (url, kind),
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, body, fetched_at = row
+        text = zlib.decompress(body).decode("utf-8")
+        return ArchiveRecord(url, kind, status, json.loads(headers), text, fetched_at)
+
+    def put(
+        self, url: str, status: int, headers: dict[str, str], text: str, kind: str = "http"
+    ) -> None:
+        body = zlib.compress(text.encode("utf-8"), 6)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)",
+                (url, kind, status, json.dumps(headers), body, time.time()),
+            )
+
+    def touch(self, url: str, kind: str = "http") -> None:
+        """
+        Marks an archived page as fetched now, e.g. after the server answered 304 Not Modified.
+        """
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE records SET fetched_at = ? WHERE url = ? AND kind = ?",
+                (time.time(), url, kind),
+            )
+
+    def is_fresh(self, record: ArchiveRecord) -> bool:
+        """
+        Whether a record can be served without going to the network under the TTL policy.
+        """
+        return self.replay or self.ttl is None or record.age < self.ttl
+
+    def urls(self, kind: str = "http") -> list[str]:
+        with self._lock:
+            rows = self.conn.execute("SELECT url FROM records WHERE kind = ?", (kind,)).fetchall()
+        return [url for (url,) in rows]
+
+    def forget(self, urls: Iterable[str], kind: str = "http") -> None:
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "DELETE FROM records WHERE url = ? AND kind = ?", [(url, kind) for url in urls]
+            )
+
+    def prune(self, older_than: float) -> int:
+        """
+        Deletes records fetched more than older_than seconds ago.
+
+        Returns:
+            int: The number of deleted records.
+        """
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM records WHERE fetched_at < ?", (time.time() - older_than,)
+            )
+        logger.info(f"Pruned {cursor.rowcount} records from the fetch archive")
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self.conn.close()
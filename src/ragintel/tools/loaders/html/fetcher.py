@@ -0,0 +1,232 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterable
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+import httpx
+from loguru import logger
+
+from ragintel.tools.loaders.html.fetch_archive import FetchArchive
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 6.1) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/41.0.2228.0 Safari/537.36"
+)
+
+# Responses worth retrying, everything else is returned as is
+RETRY_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Upper bound for a server-provided Retry-After, so one slow vendor cannot stall a batch
+MAX_RETRY_AFTER = 30.0
+
+
+class FetchResult(NamedTuple):
+    url: str
+    status: int | None = None
+    text: str | None = None
+    headers: dict[str, str] | None = None
+    not_modified: bool = False
+    from_archive: bool = False
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None and self.status < 400
+
+
+class AsyncHTMLFetcher:
+    """Concurrent HTTP fetcher with a shared connection pool.
+
+    Requests are limited both globally (max_connections) and per host (per_host_limit), failed
+    requests are retried with exponential backoff, and pages that were fetched before are
+    revalidated with If-None-Match / If-Modified-Since so unchanged pages cost a 304 instead of a
+    full download. With a FetchArchive, every page is archived on disk, pages within the archive's
+    TTL are served without a request, and replay mode never touches the network.
+
+    The underlying httpx client is bound to the event loop it is first used on.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        per_host_limit: int = 8,
+        timeout: float = 30.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        headers: dict[str, str] | None = None,
+        validator_cache_size: int = 1024,
+        transport: httpx.AsyncBaseTransport | None = None,
+        archive: FetchArchive | None = None,
+    ):
+        """
+        Initialize the AsyncHTMLFetcher.
+
+        Args:
+            max_connections (int): Maximum number of concurrent connections overall.
+            per_host_limit (int): Maximum number of concurrent requests to a single host.
+            timeout (float): Timeout in seconds for connecting and for each read.
+            retries (int): Number of retries after a transport error or a retryable status.
+            backoff (float): Base delay in seconds, doubled after every retry.
+            headers (dict[str, str] | None): Extra request headers.
+            validator_cache_size (int): Number of pages whose ETag / Last-Modified and body are
+                kept for revalidation. 0 disables revalidation.
+            transport (httpx.AsyncBaseTransport | None): Custom transport, e.g. for tests.
+            archive (FetchArchive | None): Archive that fetched pages are written to and served
+                from.
+        """
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.headers = {"User-Agent": DEFAULT_USER_AGENT, **(headers or {})}
+        self.validator_cache_size = validator_cache_size
+        self.transport = transport
+        self.archive = archive
+        self._client: httpx.AsyncClient | None = None
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
+        self._validators: OrderedDict[str, tuple[str | None, str | None, str]] = OrderedDict()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                follow_redirects=True,
+                transport=self.transport,
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_limits.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_limit)
+            self._host_limits[host] = semaphore
+        return semaphore
+
+    def _validators_for(self, url: str) -> tuple[str | None, str | None, str] | None:
+        validators = self._validators.get(url)
+        if validators is None and self.archive is not None:
+            record = self.archive.get(url)
+            if record is not None:
+                validators = (
+                    record.headers.get("etag"),
+                    record.headers.get("last-modified"),
+                    record.text,
+                )
+        return validators
+
+    def _conditional_headers(self, validators: tuple | None) -> dict[str, str]:
+        if validators is None:
+            return {}
+        etag, last_modified, _ = validators
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def _remember(self, url: str, response: httpx.Response) -> None:
+        if self.archive is not None:
+            self.archive.put(url, response.status_code, dict(response.headers), response.text)
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not self.validator_cache_size or not (etag or last_modified):
+            return
+        self._validators[url] = (etag, last_modified, response.text)
+        self._validators.move_to_end(url)
+        while len(self._validators) > self.validator_cache_size:
+            self._validators.popitem(last=False)
+
+    def _retry_delay(self, attempt: int, response: httpx.Response | None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER)
+        return self.backoff * 2**attempt
+
+    async def fetch(self, url: str) -> FetchResult:
+        """
+        Fetches a single URL, retrying transient failures.
+
+        Returns:
+            FetchResult: The response, or the last error once every attempt failed. A 304 is
+            answered with the previously fetched body and not_modified set to True.
+        """
+        if self.archive is not None:
+            record = self.archive.get(url)
+            if record is not None and self.archive.is_fresh(record):
+                return FetchResult(
+                    url, record.status, record.text, record.headers, from_archive=True
+                )
+            if self.archive.replay:
+                return FetchResult(url, error="Not in the fetch archive (replay mode)")
+
+        async with self._host_limit(url):
+            validators = self._validators_for(url)
+            for attempt in range(self.retries + 1):
+                response = None
+                try:
+                    response = await self.client.get(
+                        url, headers=self._conditional_headers(validators)
+                    )
+                except httpx.TransportError as e:
+                    error = f"{type(e).__name__}: {e}"
+                else:
+                    if response.status_code == 304 and validators is not None:
+                        if url in self._validators:
+                            self._validators.move_to_end(url)
+                        if self.archive is not None:
+                            self.archive.touch(url)
+                        return FetchResult(
+                            url, 304, validators[2], dict(response.headers), not_modified=True
+                        )
+                    if response.status_code not in RETRY_STATUS_CODES:
+                        if response.status_code < 400:
+                            self._remember(url, response)
+                        return FetchResult(
+                            url, response.status_code, response.text, dict(response.headers)
+                        )
+                    error = f"HTTP {response.status_code}"
+
+                if attempt < self.retries:
+                    delay = self._retry_delay(attempt, response)
+                    logger.debug(f"Retrying {url} in {delay:.1f}s after {error}")
+                    await asyncio.sleep(delay)
+
+        logger.error(f"Failed to fetch {url} after {self.retries + 1} attempts: {error}")
+        status = response.status_code if response is not None else None
+        return FetchResult(url, status, error=error)
+
+    async def iter_fetch(self, urls: Iterable[str]) -> AsyncIterator[FetchResult]:
+        """
+        Fetches URLs concurrently and yields each result as soon as it arrives, in completion
+        order. Requests still in flight are cancelled if the consumer stops early.
+        """
+        tasks = [asyncio.ensure_future(self.fetch(url)) for url in dict.fromkeys(urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_limits.clear()
+
+    async def __aenter__(self) -> "AsyncHTMLFetcher":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
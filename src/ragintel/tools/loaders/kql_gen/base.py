@@ -1,17 +1,19 @@
 # Description: This file contains the SigmaLoader class, which is responsible for loading Sigma rules into the database.
-import json
 import os
-import re
+from collections.abc import Iterator
 from pathlib import Path
+from typing import Literal
 
-import kuzu
+import pandas as pd
+import pyarrow as pa
 from box import Box
 from llama_index.core import Document, SimpleDirectoryReader
 from loguru import logger
 
 from ragintel.tools.archivers.chroma import ChromaOps
+from ragintel.tools.archivers.kuzudb import KuzuOps
 from ragintel.tools.loaders.github import GitHubLoader
-from ragintel.utils.adaptors.pydantic import PydanticAdaptor
+from ragintel.utils.base import FileManifest
 from ragintel.utils.base.llamaindex_doc_dedup import LlamaIndexDocDedup
 from ragintel.utils.directory_manager import DirectoryManager
 from ragintel.utils.enums import EmbedderType
@@ -19,11 +21,20 @@ from ragintel.utils.file_loader import FileLoader
 
 
 class KQLLoader:
-    def __init__(self, source_config: Box) -> None:
+    def __init__(
+        self,
+        source_config: Box,
+        kuzu_ops: KuzuOps | None = None,
+        manifest: FileManifest | None = None,
+    ) -> None:
         logger.info(f"Initializing KQLLoader with config: {source_config}")
 
         self.directory_manager = DirectoryManager()
 
+        # Share the process-wide KuzuDB database instead of opening it on every load
+        self.kuzu_ops = kuzu_ops or KuzuOps()
+        self._manifest = manifest
+
         # Initialize GitHub Loader for handy use of some functions
         self.ghloader = GitHubLoader()
 
@@ -39,6 +50,16 @@ class KQLLoader:
         dest_directory = f"data/{self.repo_name}"
         self.dest_clone_directory = Path(dest_directory)
 
+        # Files are recorded per source repository so that repos never see each other's files
+        self.manifest_name = f"kql:{self.repo_name}"
+
+    @property
+    def manifest(self) -> FileManifest:
+        # Only open the manifest database when an incremental load asks for it
+        if self._manifest is None:
+            self._manifest = FileManifest()
+        return self._manifest
+
     def clone_repo(
         self,
         repo_url: str | None = None,
@@ -78,6 +99,7 @@ class KQLLoader:
         load_to_chroma: bool = False,
         chroma_embedder: str = "chroma",
         sample_only: bool = False,
+        incremental: bool = False,
     ) -> list[Document] | None:
         """
         Loads rules into Kuzu Graph Database.
@@ -86,6 +108,7 @@ class KQLLoader:
             file_paths (list[str] | None): A list of file paths to rules files. If None, the function will clone a repository and use the cloned files. Default is None.
             load_to_chroma (bool): Whether to load the rules into ChromaDB for embedding and querying. Default is False.
             chroma_embedder (str): The type of embedder to use for ChromaDB. Default is "chroma".
+            incremental (bool): Consult the file manifest and only load rules added or modified since the last run, deleting the nodes of modified and removed rules first. Default is False.
 
         Returns:
             None
@@ -126,20 +149,6 @@ class KQLLoader:
                 logger.error("No list of rules files provided. Exiting.")
                 return None
 
-        # Create an empty KuzuDB on-disk database and connect to it
-        db = kuzu.Database(os.getenv("KUZU_DB_PERSIST_DIRECTORY", "./data/raginteldb"))
-        self.conn = kuzu.Connection(db)
-
-        # Create KuzuDB Schema
-        # Start by retrieving from Pydantic the schema for SigmaNode
-        KQLNodeSchema = PydanticAdaptor()
-        logger.info("Creating or Getting KQLRule Schema in KuzuDB")
-        self.conn.execute(f"""
-            CREATE NODE TABLE IF NOT EXISTS KQLRule(
-            {KQLNodeSchema.pydantic_to_schema_string(self.node_schema)}
-            )
-        """)
-
         # Check if we only want to do a sample run
         if sample_only:
             logger.info("Sampling only 5 rules for testing purposes")
@@ -147,30 +156,49 @@ class KQLLoader:
         else:
             load_file_limit = None
 
+        if incremental:
+            # Only read what changed since the last run, and drop the nodes of rules that were
+            # modified or removed so that the modified ones can be loaded again. Deletions can
+            # only be inferred when we hold the full listing of the cloned repository
+            full_listing = file_paths == self.rules_file_list and not sample_only
+            diff = self.manifest.diff(
+                self.manifest_name,
+                file_paths,
+                root=self.dest_clone_directory if full_listing else None,
+            )
+            stale_files = diff.modified + diff.deleted
+            self.kuzu_ops.delete_nodes(
+                "KQLRule", self.manifest.target_ids(self.manifest_name, stale_files)
+            )
+            self.manifest.forget(self.manifest_name, diff.deleted)
+            file_paths = diff.changed
+
+            if not file_paths:
+                logger.info("No new or modified Rules files since the last run. Nothing to load.")
+                return None
+
         # Load documents from the rules files using LlamaIndex, append file name and relative path of the file to the metadata
         def filename_fn(file_name):
             return {"file_name": Path(file_name).name, "relative_path": str(Path(file_name))}
 
         documents = SimpleDirectoryReader(
-            input_files=self.rules_file_list,
+            input_files=file_paths,
             file_metadata=filename_fn,
             num_files_limit=load_file_limit,
         ).load_data()
 
         # LlamaIndex might chunk documents loaded via SimpleDirectoryReader, we need to create a deduplicated list that we can use to load into KuzuDB because we want to load the raw content of the file only once. The original list of Documents from LlamaIndex remains the same, because we will later use that to load into a Vector Database where the chunks are going to be useful.
         dedup_doc_list = LlamaIndexDocDedup().deduplicate_documents(documents)
-        dedup_doc_relative_paths = [doc["relative_path"] for doc in dedup_doc_list]
-        dedup_doc_hashes = [doc["doc_hash"] for doc in dedup_doc_list]
-        processed_docs = []
+        dedup_doc_hashes = {doc["relative_path"]: doc["doc_hash"] for doc in dedup_doc_list}
+        processed_docs = set()
+        rows = []
+        loaded_files = {}
 
         # Process documents using LlamaIndex
         for doc in documents:
             try:
                 if doc.metadata.get("relative_path") not in processed_docs:
-                    processed_docs.append(doc.metadata.get("relative_path"))
-                    doc_relative_path_index = dedup_doc_relative_paths.index(
-                        doc.metadata.get("relative_path")
-                    )
+                    processed_docs.add(doc.metadata.get("relative_path"))
 
                     with open(doc.metadata.get("relative_path")) as f:
                         doc_content = f.read()
@@ -182,27 +210,36 @@ class KQLLoader:
 
                     logger.debug(f"Loading Rule: {doc.metadata['relative_path']}")
 
-                    title = json.dumps(doc.metadata["relative_path"].rsplit("\\", 1)[-1])
-                    raw_document = json.dumps(
-                        re.sub(r"[\n\r]", lambda match: "\\\\" + match.group(0), doc_content)
+                    rows.append(
+                        {
+                            "node_type": "detection",
+                            "node_subtype": "kql",
+                            "source_url": doc.metadata["doc_url"],
+                            "title": doc.metadata["relative_path"].rsplit("\\", 1)[-1],
+                            "id": dedup_doc_hashes[doc.metadata["relative_path"]],
+                            "raw_document": doc_content,
+                        }
                     )
-
-                    self.conn.execute(f"""
-                        CREATE (s:KQLRule {{
-                            node_type: "detection",
-                            node_subtype: "kql",
-                            source_url: "{doc.metadata["doc_url"]}",
-                            title: {title},
-                            id: "{dedup_doc_hashes[doc_relative_path_index]}",
-                            raw_document: {raw_document}
-                        }})
-                    """)
+                    loaded_files[doc.metadata["relative_path"]] = [rows[-1]["id"]]
 
             except Exception as e:
                 logger.error(f"Error loading Rule: {e}. Continuing to next rule.")
                 continue
 
-        self.conn.close()
+        # Bulk load all rules in one columnar COPY. The KQLRule table is derived from the node
+        # schema in the source config, so the raw document needs no escaping
+        written = self.kuzu_ops.bulk_load("KQLRule", self.node_schema, rows)
+        logger.info(f"Wrote {written} Rules to KuzuDB")
+
+        if incremental:
+            # Only record the rules that made it into the graph, so that rules dropped by
+            # validation are read again on the next run
+            stored = self.kuzu_ops.stored_keys("KQLRule", [row["id"] for row in rows])
+            self.manifest.record(
+                self.manifest_name,
+                {path: ids for path, ids in loaded_files.items() if ids[0] in stored},
+            )
+
         logger.info("Finished loading Rules to KuzuDB")
 
         if load_to_chroma:
@@ -232,8 +269,27 @@ class KQLLoader:
         )
         chroma_conn.embed_documents(documents)
 
-    def query_graph(self, cypher_query: str) -> list:
-        """ """
+    def query_graph(
+        self,
+        cypher_query: str,
+        parameters: dict | None = None,
+        page_size: int = 10_000,
+        output: Literal["arrow", "pandas"] = "arrow",
+    ) -> Iterator[pa.RecordBatch | pd.DataFrame]:
+        """
+        Queries the graph for rules.
+
+        Args:
+            cypher_query (str): The Cypher query, e.g.
+                "MATCH (k:KQLRule) WHERE k.title CONTAINS $needle RETURN k.title, k.source_url".
+            parameters (dict | None): Values for the $placeholders in the query.
+            page_size (int): Maximum number of rows per page. Default is 10000.
+            output (str): "arrow" for pyarrow.RecordBatch pages or "pandas" for DataFrames.
+
+        Returns:
+            Iterator[pa.RecordBatch | pd.DataFrame]: The pages of rows matching the query.
+        """
 
-        cypher_query = cypher_query.lower()
-        return self.conn.execute(cypher_query)
+        return self.kuzu_ops.query(
+            cypher_query, parameters=parameters, page_size=page_size, output=output
+        )
@@ -1,25 +1,440 @@
-from langchain.docstore.document import Document
+import json
+import os
+import re
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import pyarrow as pa
 from loguru import logger
 
+from ragintel.nodes.mitre import (
+    AttackGroupNode,
+    AttackMitigationNode,
+    AttackSoftwareNode,
+    AttackTacticNode,
+    AttackTechniqueNode,
+)
+from ragintel.tools.archivers.kuzudb import KuzuOps
+
+try:
+    import ijson
+
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+# A decode error further than this from the end of the buffer cannot be caused by an object
+# that continues in the next chunk, so the bundle is malformed
+TRUNCATION_MARGIN = 64
+
+# external_references source names that hold ATT&CK IDs, one per domain
+ATTACK_SOURCES = ("mitre-attack", "mitre-mobile-attack", "mitre-ics-attack")
+
+# Kill chain that the techniques of each domain reference their tactics with
+KILL_CHAINS = {
+    "enterprise-attack": "mitre-attack",
+    "mobile-attack": "mitre-mobile-attack",
+    "ics-attack": "mitre-ics-attack",
+}
+
+STIX_KINDS = {
+    "attack-pattern": "technique",
+    "x-mitre-tactic": "tactic",
+    "intrusion-set": "group",
+    "malware": "software",
+    "tool": "software",
+    "course-of-action": "mitigation",
+}
+
+NODE_TABLES = {
+    "technique": ("AttackTechnique", AttackTechniqueNode),
+    "tactic": ("AttackTactic", AttackTacticNode),
+    "group": ("AttackGroup", AttackGroupNode),
+    "software": ("AttackSoftware", AttackSoftwareNode),
+    "mitigation": ("AttackMitigation", AttackMitigationNode),
+}
+
+# (source kind, STIX relationship type, target kind) -> relationship table
+REL_TABLES = {
+    ("group", "uses", "technique"): "GroupUsesTechnique",
+    ("group", "uses", "software"): "GroupUsesSoftware",
+    ("software", "uses", "technique"): "SoftwareUsesTechnique",
+    ("mitigation", "mitigates", "technique"): "MitigatesTechnique",
+    ("technique", "subtechnique-of", "technique"): "SubtechniqueOf",
+}
+TACTIC_REL_TABLE = "TechniqueInTactic"
+DETECTION_REL_TABLE = "DetectsTechnique"
+
+# Sigma tags of ATT&CK techniques, e.g. "attack.t1059.001"
+ATTACK_TAG = re.compile(r"attack\.(t\d{4}(?:\.\d{3})?)", re.IGNORECASE)
+
+
+def iter_stix_objects(bundle_path: str | Path, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Streams the objects of a STIX bundle one at a time, so the bundle is never held in memory
+    as a whole. Uses ijson when it is installed and an incremental json decoder otherwise.
+
+    Args:
+        bundle_path (str | Path): The bundle, e.g. "enterprise-attack.json".
+        chunk_size (int): Characters read at a time by the fallback decoder.
+
+    Yields:
+        dict: The STIX objects, in file order.
+
+    Raises:
+        ValueError: If the file has no "objects" array, ends in the middle of it, or holds
+            malformed JSON.
+    """
+    if HAS_IJSON:
+        with open(bundle_path, "rb") as f:
+            yield from ijson.items(f, "objects.item", use_float=True)
+        return
+
+    decoder = json.JSONDecoder()
+    marker = '"objects"'
+    with open(bundle_path, encoding="utf-8") as f:
+        # Find the opening bracket of the objects array. offset is the file position of the
+        # start of the buffer, for error messages
+        buffer = ""
+        offset = 0
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                msg = f"No objects array in STIX bundle {bundle_path}"
+                raise ValueError(msg)
+            buffer += chunk
+            index = buffer.find(marker)
+            bracket = buffer.find("[", index + len(marker)) if index >= 0 else -1
+            if bracket >= 0:
+                position = bracket + 1
+                break
+            if index < 0:
+                offset += max(len(buffer) - len(marker), 0)
+                buffer = buffer[-len(marker) :]
+
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) and buffer[position] == "]":
+                return
+
+            if position < len(buffer):
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError as e:
+                    # Only an object cut off by the end of the buffer is worth another chunk.
+                    # An unterminated string reports where it starts, which can be far back
+                    truncated = e.pos >= len(buffer) - TRUNCATION_MARGIN or e.msg.startswith(
+                        "Unterminated string"
+                    )
+                    if not truncated:
+                        msg = (
+                            f"Malformed JSON in STIX bundle {bundle_path} at character "
+                            f"{offset + e.pos}: {e.msg}"
+                        )
+                        raise ValueError(msg) from e
+                else:
+                    yield item
+                    position = end
+                    continue
+
+            # The next object continues in the following chunk
+            chunk = f.read(chunk_size)
+            if not chunk:
+                msg = f"STIX bundle {bundle_path} ends inside its objects array"
+                raise ValueError(msg)
+            offset += position
+            buffer = buffer[position:] + chunk
+            position = 0
+
+
+class _AttackGraph:
+    """The ATT&CK objects and relationships collected from one or more bundles."""
 
-class MitreLoader:
     def __init__(self):
-        self.clean_html_docs = []
-        self.docs = []
-        # TBD
+        self.nodes: dict[str, dict[str, dict]] = {kind: {} for kind in NODE_TABLES}
+        # STIX id -> (kind, ATT&CK ID), relationships reference objects by STIX id
+        self.stix_ids: dict[str, tuple[str, str]] = {}
+        self.relationships: list[tuple[str, str, str, str]] = []
+        # (kill chain, tactic shortname) -> tactic ATT&CK ID
+        self.tactics: dict[tuple[str, str], str] = {}
+
+    def add(self, obj: dict) -> None:
+        if obj.get("revoked") or obj.get("x_mitre_deprecated"):
+            return
 
-    def load_mitre_attack(self, url: str = "https://attack.mitre.org/"):
+        if obj.get("type") == "relationship":
+            self.relationships.append(
+                (
+                    obj["source_ref"],
+                    obj["relationship_type"],
+                    obj["target_ref"],
+                    obj.get("description", ""),
+                )
+            )
+            return
+
+        kind = STIX_KINDS.get(obj.get("type"))
+        if kind is None:
+            return
+        row = self._node_row(kind, obj)
+        if row is None:
+            return
+
+        self.stix_ids[obj["id"]] = (kind, row["id"])
+        if kind == "tactic":
+            for domain in row["domains"]:
+                self.tactics[(KILL_CHAINS.get(domain, domain), row["shortname"])] = row["id"]
+
+        # Groups and software appear in several domains under the same ATT&CK ID
+        stored = self.nodes[kind].get(row["id"])
+        if stored is None:
+            self.nodes[kind][row["id"]] = row
+        else:
+            stored["domains"] = sorted({*stored["domains"], *row["domains"]})
+
+    def _node_row(self, kind: str, obj: dict) -> dict | None:
+        reference = next(
+            (
+                ref
+                for ref in obj.get("external_references", [])
+                if ref.get("source_name") in ATTACK_SOURCES and ref.get("external_id")
+            ),
+            None,
+        )
+        if reference is None:
+            return None
+
+        row = {
+            "id": reference["external_id"],
+            "stix_id": obj["id"],
+            "name": obj.get("name", "NA"),
+            "description": obj.get("description", ""),
+            "url": reference.get("url", "NA"),
+            "domains": list(obj.get("x_mitre_domains", [])),
+            "version": str(obj.get("x_mitre_version", "NA")),
+            "modified": str(obj.get("modified", "NA")),
+        }
+
+        if kind == "technique":
+            is_subtechnique = bool(obj.get("x_mitre_is_subtechnique", False))
+            row.update(
+                {
+                    # Kept as (kill chain, phase) until every tactic of the bundles is known
+                    "tactics": [
+                        (phase.get("kill_chain_name", ""), phase.get("phase_name", ""))
+                        for phase in obj.get("kill_chain_phases", [])
+                    ],
+                    "platforms": list(obj.get("x_mitre_platforms", [])),
+                    "data_sources": list(obj.get("x_mitre_data_sources", [])),
+                    "detection": obj.get("x_mitre_detection", ""),
+                    "is_subtechnique": is_subtechnique,
+                    "parent_id": row["id"].split(".")[0] if is_subtechnique else "",
+                }
+            )
+        elif kind == "tactic":
+            row["shortname"] = obj.get("x_mitre_shortname", "")
+        elif kind == "group":
+            row["aliases"] = list(obj.get("aliases", []))
+        elif kind == "software":
+            row.update(
+                {
+                    "software_type": obj["type"],
+                    "aliases": list(obj.get("x_mitre_aliases", [])),
+                    "platforms": list(obj.get("x_mitre_platforms", [])),
+                }
+            )
+        return row
+
+    def technique_rows(self) -> Iterator[dict]:
+        for row in self.nodes["technique"].values():
+            yield {**row, "tactics": [phase for _, phase in row["tactics"]]}
+
+    def tactic_relationships(self) -> pa.Table:
+        pairs = [
+            (technique_id, self.tactics[phase])
+            for technique_id, row in self.nodes["technique"].items()
+            for phase in row["tactics"]
+            if phase in self.tactics
+        ]
+        return pa.table(
+            {
+                "from": pa.array([source for source, _ in pairs], pa.string()),
+                "to": pa.array([target for _, target in pairs], pa.string()),
+            }
+        )
+
+    def relationships_by_table(self) -> dict[str, pa.Table]:
+        columns = {table: ([], [], []) for table in REL_TABLES.values()}
+        for source_ref, relationship_type, target_ref, description in self.relationships:
+            source = self.stix_ids.get(source_ref)
+            target = self.stix_ids.get(target_ref)
+            if source is None or target is None:
+                # Relationships to deprecated, revoked or unsupported objects
+                continue
+            table = REL_TABLES.get((source[0], relationship_type, target[0]))
+            if table is None:
+                continue
+            sources, targets, descriptions = columns[table]
+            sources.append(source[1])
+            targets.append(target[1])
+            descriptions.append(description)
+
+        return {
+            table: pa.table(
+                {
+                    "from": pa.array(sources, pa.string()),
+                    "to": pa.array(targets, pa.string()),
+                    "description": pa.array(descriptions, pa.string()),
+                }
+            )
+            for table, (sources, targets, descriptions) in columns.items()
+        }
+
+
+class MitreLoader:
+    """Loads the MITRE ATT&CK matrices from their STIX bundles into the Kuzu graph.
+
+    Techniques, tactics, groups, software and mitigations become nodes keyed by ATT&CK ID
+    (e.g. "T1059.001", "TA0002", "G0007"), and the STIX relationships between them become
+    relationship tables. Sigma rules already in the graph are linked to the techniques they tag.
+    """
+
+    def __init__(self, kuzu_ops: KuzuOps | None = None):
+        # Share the process-wide KuzuDB database instead of opening a private one
+        self.kuzu_ops = kuzu_ops or KuzuOps()
+        self.attack_directory = Path(os.getenv("RAGINTEL_ATTACK_DIR", "./data/mitre"))
+
+    def load_mitre_attack(
+        self,
+        bundle_paths: str | Path | Iterable[str | Path] | None = None,
+        replace: bool = False,
+        link_detections: bool = True,
+    ) -> dict[str, int]:
         """
-        Load MITRE ATT&CK content from the specified URL and convert it to plain text.
+        Loads ATT&CK STIX bundles (enterprise-attack.json, mobile-attack.json, ics-attack.json)
+        into KuzuDB.
+
+        Bundles are streamed object by object, and every table is written with a single COPY.
+        Deprecated and revoked objects are skipped.
+
+        Args:
+            bundle_paths (str | Path | Iterable[str | Path] | None): The bundles to load.
+                Defaults to every "*-attack.json" file in the RAGINTEL_ATTACK_DIR environment
+                variable or "./data/mitre".
+            replace (bool): Delete the ATT&CK nodes and relationships already in the graph
+                first, e.g. when loading a newer ATT&CK release. Otherwise stored objects that
+                did not change are skipped, changed ones are updated in place (keeping their
+                relationships), and relationships already stored are not copied again.
+                Default is False.
+            link_detections (bool): Link Sigma rules to the techniques they are tagged with.
+                Default is True.
+
+        Returns:
+            dict[str, int]: The number of rows written to each node and relationship table.
         """
-        self.url = url
+        if bundle_paths is None:
+            bundle_paths = sorted(self.attack_directory.glob("*-attack.json"))
+        elif isinstance(bundle_paths, str | Path):
+            bundle_paths = [bundle_paths]
+        bundle_paths = [Path(path) for path in bundle_paths]
+        if not bundle_paths:
+            logger.error(f"No ATT&CK STIX bundles found in {self.attack_directory}")
+            return {}
 
-        if self.url == "https://attack.mitre.org/":
-            logger.info("Loading MITRE ATT&CK content from attack.mitre.org")
-            self.docs = []
-            self.docs.append(
-                Document(page_content="MITRE ATT&CK content", metadata={"source": "MITRE ATT&CK"})
+        graph = _AttackGraph()
+        for bundle_path in bundle_paths:
+            started = time.perf_counter()
+            count = 0
+            for obj in iter_stix_objects(bundle_path):
+                graph.add(obj)
+                count += 1
+            logger.info(
+                f"Parsed {count} STIX objects from {bundle_path.name} "
+                f"in {time.perf_counter() - started:.1f}s"
             )
-            self.clean_html_docs = self.convert_html_to_text(self.docs, parser="ragintel.html2text")
 
-        return self.clean_html_docs
+        if replace:
+            self.delete_attack_graph()
+
+        counts = {}
+        for kind, (table_name, model_class) in NODE_TABLES.items():
+            rows = graph.technique_rows() if kind == "technique" else graph.nodes[kind].values()
+            counts[table_name] = self.kuzu_ops.bulk_load(table_name, model_class, rows)
+
+        relationships = graph.relationships_by_table()
+        for (source, _, target), rel_table in REL_TABLES.items():
+            from_table, to_table = NODE_TABLES[source][0], NODE_TABLES[target][0]
+            self.kuzu_ops.create_rel_table(rel_table, from_table, to_table, "description STRING")
+            counts[rel_table] = self.kuzu_ops.bulk_load_rels(
+                rel_table, from_table, to_table, relationships[rel_table]
+            )
+
+        self.kuzu_ops.create_rel_table(TACTIC_REL_TABLE, "AttackTechnique", "AttackTactic")
+        counts[TACTIC_REL_TABLE] = self.kuzu_ops.bulk_load_rels(
+            TACTIC_REL_TABLE, "AttackTechnique", "AttackTactic", graph.tactic_relationships()
+        )
+
+        if link_detections:
+            counts[DETECTION_REL_TABLE] = self.link_detections()
+
+        logger.info(f"Finished loading MITRE ATT&CK to KuzuDB: {counts}")
+        return counts
+
+    def link_detections(self, detection_table: str = "SigmaRule") -> int:
+        """
+        Links detection rules to the ATT&CK techniques in their tags (e.g. "attack.t1059.001")
+        through DetectsTechnique relationships.
+
+        Args:
+            detection_table (str): The node table of the rules. Default is "SigmaRule".
+
+        Returns:
+            int: The number of relationships written.
+        """
+        try:
+            rules = list(self.kuzu_ops.query(f"MATCH (r:{detection_table}) RETURN r.id, r.tags"))
+            techniques = list(self.kuzu_ops.query("MATCH (t:AttackTechnique) RETURN t.id"))
+        except RuntimeError as e:
+            logger.warning(f"Not linking {detection_table} to ATT&CK: {e}")
+            return 0
+
+        known = {
+            technique_id for batch in techniques for technique_id in batch.column(0).to_pylist()
+        }
+        pairs = []
+        for batch in rules:
+            for rule_id, tags in zip(
+                *(column.to_pylist() for column in batch.columns), strict=True
+            ):
+                for tag in tags or []:
+                    match = ATTACK_TAG.fullmatch(tag)
+                    if match and match.group(1).upper() in known:
+                        pairs.append((rule_id, match.group(1).upper()))
+
+        self.kuzu_ops.create_rel_table(DETECTION_REL_TABLE, detection_table, "AttackTechnique")
+        return self.kuzu_ops.bulk_load_rels(
+            DETECTION_REL_TABLE,
+            detection_table,
+            "AttackTechnique",
+            pa.table(
+                {
+                    "from": pa.array([rule_id for rule_id, _ in pairs], pa.string()),
+                    "to": pa.array([technique_id for _, technique_id in pairs], pa.string()),
+                }
+            ),
+        )
+
+    def delete_attack_graph(self) -> None:
+        """
+        Deletes every ATT&CK node along with its relationships.
+        """
+        for table_name, _ in NODE_TABLES.values():
+            try:
+                self.kuzu_ops.execute(f"MATCH (n:{table_name}) DETACH DELETE n")
+            except RuntimeError as e:
+                logger.debug(f"Skipping {table_name}: {e}")
+        logger.info("Deleted the MITRE ATT&CK nodes from KuzuDB")
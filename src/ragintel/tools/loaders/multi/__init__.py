@@ -1,5 +1,6 @@
 from loguru import logger
 
-from ragintel.tools.loaders.multi import MultiLoader
+from ragintel.tools.loaders.multi.base import MultiLoader
+from ragintel.tools.loaders.multi.registry import ExtractorRegistry
 
-__all__ = ["MultiLoader"]
+__all__ = ["ExtractorRegistry", "MultiLoader"]
@@ -1,22 +1,72 @@
 import io
-import re
+from collections.abc import Iterator
+from pathlib import Path
 
-import docx
-import pdfplumber
-from bs4 import BeautifulSoup
 from loguru import logger
 
+from ragintel.tools.loaders.multi.registry import Extractor, ExtractorRegistry
+from ragintel.utils.base.extraction_cache import ExtractionCache
+
+# Shared by every MultiLoader that is not given its own registry, so extractor modules are
+# imported at most once per process
+default_registry = ExtractorRegistry()
+
 
 class MultiLoader:
-    def parse_text_from_file(file_name: str, content: io.BytesIO) -> str:
-        if file_name.endswith(".pdf"):
-            with pdfplumber.open(content) as pdf:
-                text = " ".join(page.extract_text() for page in pdf.pages)
-        elif file_name.endswith(".html"):
-            text = BeautifulSoup(content.read().decode("utf-8"), features="html.parser").get_text()
-        elif file_name.endswith(".txt"):
-            text = content.read().decode("utf-8")
-        elif file_name.endswith(".docx"):
-            text = " ".join(paragraph.text for paragraph in docx.Document(content).paragraphs)
-
-        return re.sub(r"\s+", " ", text).strip()
+    def __init__(
+        self, registry: ExtractorRegistry | None = None, cache: ExtractionCache | None = None
+    ):
+        self.registry = registry or default_registry
+        self.cache = cache
+
+    def register_extractor(self, mime_type: str, extractor: str | Extractor) -> None:
+        """
+        Registers an extractor for a MIME type, see ExtractorRegistry.register.
+        """
+        self.registry.register(mime_type, extractor)
+
+    @staticmethod
+    def iter_pdf_pages(
+        source: str | Path | io.BytesIO,
+        workers: int | None = None,
+        pages_per_task: int = 16,
+    ) -> Iterator[tuple[int, str]]:
+        """
+        Extracts the text of a PDF page by page, in page order.
+
+        See ragintel.tools.loaders.multi.pdf_extractor.iter_pdf_pages.
+        """
+        from ragintel.tools.loaders.multi import pdf_extractor
+
+        return pdf_extractor.iter_pdf_pages(source, workers=workers, pages_per_task=pages_per_task)
+
+    def parse_text_from_file(self, file_name: str, content: io.BytesIO) -> str:
+        """
+        Extracts the text of a file, choosing the extractor from its sniffed content type. With a
+        cache, text already extracted from identical bytes by the same extractor version is
+        returned without extracting again.
+
+        Args:
+            file_name (str): The file name, only used when the content type is ambiguous.
+            content (io.BytesIO): The file content.
+
+        Returns:
+            str: The extracted text with whitespace collapsed.
+
+        Raises:
+            ValueError: If no extractor is registered for the detected content type.
+        """
+        if self.cache is None:
+            return self.registry.extract(content, file_name)
+
+        mime_type = self.registry.sniff(content, file_name)
+        extractor = self.registry.get(mime_type)
+
+        def extract() -> str:
+            logger.debug(f"Extracting {file_name} as {mime_type}")
+            content.seek(0)
+            return extractor(content)
+
+        return self.cache.get_or_extract(
+            content.getvalue(), self.registry.extractor_id(mime_type), extract
+        )
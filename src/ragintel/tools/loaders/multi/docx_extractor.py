@@ -0,0 +1,34 @@
+import io
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+from loguru import logger
+
+EXTRACTOR_VERSION = "1"
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+TEXT_TAG = f"{WORD_NAMESPACE}t"
+PARAGRAPH_TAG = f"{WORD_NAMESPACE}p"
+
+
+def extract(content: io.BytesIO) -> str:
+    """
+    Extractor registry entry point for DOCX documents.
+
+    Streams word/document.xml straight out of the archive instead of building python-docx's
+    object model, and keeps only the text runs.
+    """
+    paragraphs = []
+    runs = []
+
+    with zipfile.ZipFile(content) as archive, archive.open("word/document.xml") as document:
+        for _, element in iterparse(document, events=("end",)):
+            if element.tag == TEXT_TAG and element.text:
+                runs.append(element.text)
+            elif element.tag == PARAGRAPH_TAG:
+                if runs:
+                    paragraphs.append("".join(runs))
+                    runs = []
+                element.clear()
+
+    return " ".join(" ".join(paragraphs).split())
@@ -0,0 +1,38 @@
+import io
+
+from loguru import logger
+
+try:
+    import lxml.html
+
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+EXTRACTOR_VERSION = "1"
+
+# Elements whose text is never part of the readable page
+NON_CONTENT_TAGS = ("script", "style", "noscript", "template")
+
+
+def extract(content: io.BytesIO) -> str:
+    """Extractor registry entry point for text/html and application/xhtml+xml."""
+    raw = content.read()
+    if not raw.strip():
+        return ""
+
+    if HAS_LXML:
+        root = lxml.html.fromstring(raw)
+        for element in root.iter(*NON_CONTENT_TAGS):
+            element.drop_tree()
+        text = root.text_content()
+    else:
+        from bs4 import BeautifulSoup
+
+        logger.debug("lxml is not installed, falling back to BeautifulSoup's html.parser")
+        soup = BeautifulSoup(raw.decode("utf-8", errors="replace"), features="html.parser")
+        for element in soup(NON_CONTENT_TAGS):
+            element.decompose()
+        text = soup.get_text(" ")
+
+    return " ".join(text.split())
@@ -0,0 +1,129 @@
+import io
+import re
+import tempfile
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import pdfplumber
+from loguru import logger
+from pdfminer.pdftypes import resolve1
+from pdfminer.psparser import LIT
+
+EXTRACTOR_VERSION = "1"
+
+WHITESPACE_RE = re.compile(r"\s+")
+LITERAL_FORM = LIT("Form")
+
+
+def _page_has_text_layer(page: pdfplumber.page.Page) -> bool:
+    """
+    Checks whether a page can contain text by looking for fonts in its resources, which is much
+    cheaper than parsing its content stream. Scanned pages only reference image XObjects.
+    """
+    resources = resolve1(page.page_obj.resources) or {}
+    if resolve1(resources.get("Font")):
+        return True
+
+    # Text can also live in form XObjects, which carry their own resources. Treat any form as a
+    # possible text layer and only skip pages that reference nothing but images
+    for xobject in (resolve1(resources.get("XObject")) or {}).values():
+        attrs = getattr(resolve1(xobject), "attrs", {})
+        if resolve1(attrs.get("Subtype")) is LITERAL_FORM:
+            return True
+    return False
+
+
+def _extract_pages(pdf: pdfplumber.PDF, start: int, end: int) -> Iterator[tuple[int, str]]:
+    # Every page is released as soon as its text is extracted, so memory stays bounded by the
+    # size of one page
+    for index in range(start, min(end, len(pdf.pages))):
+        page = pdf.pages[index]
+        if _page_has_text_layer(page):
+            text = WHITESPACE_RE.sub(" ", page.extract_text() or "").strip()
+            if text:
+                yield index + 1, text
+        page.close()
+
+
+def _extract_pdf_page_range(pdf_path: str, start: int, end: int) -> list[tuple[int, str]]:
+    # Module-level so that it can be pickled into worker processes, each worker opens the file
+    # itself
+    with pdfplumber.open(pdf_path) as pdf:
+        return list(_extract_pages(pdf, start, end))
+
+
+def _iter_page_ranges(
+    pdf_path: str, page_count: int, workers: int, pages_per_task: int
+) -> Iterator[tuple[int, str]]:
+    ranges = [(start, start + pages_per_task) for start in range(0, page_count, pages_per_task)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+        in_flight: dict[int, Future] = {}
+        done: dict[int, list[tuple[int, str]]] = {}
+        next_to_submit = 0
+        next_to_yield = 0
+        max_in_flight = workers * 2
+
+        while next_to_yield < len(ranges):
+            while next_to_submit < len(ranges) and len(in_flight) + len(done) < max_in_flight:
+                start, end = ranges[next_to_submit]
+                in_flight[next_to_submit] = executor.submit(
+                    _extract_pdf_page_range, pdf_path, start, end
+                )
+                next_to_submit += 1
+
+            if next_to_yield not in done:
+                wait(in_flight.values(), return_when=FIRST_COMPLETED)
+                for index, future in list(in_flight.items()):
+                    if future.done():
+                        done[index] = future.result()
+                        del in_flight[index]
+
+            # Yield finished ranges strictly in page order
+            while next_to_yield in done:
+                yield from done.pop(next_to_yield)
+                next_to_yield += 1
+
+
+def iter_pdf_pages(
+    source: str | Path | io.BytesIO,
+    workers: int | None = None,
+    pages_per_task: int = 16,
+) -> Iterator[tuple[int, str]]:
+    """
+    Extracts the text of a PDF page by page, in page order.
+
+    Pages without a text layer (e.g. scanned images) are skipped without parsing their
+    content stream. With workers set, ranges of pages_per_task pages are extracted in
+    parallel worker processes and only about two ranges per worker are in flight at a time,
+    so peak memory does not grow with the length of the document.
+
+    Args:
+        source (str | Path | io.BytesIO): The PDF file path or its content.
+        workers (int | None): Number of worker processes. If None, pages are extracted in this
+            process. Default is None.
+        pages_per_task (int): Number of pages per worker task. Default is 16.
+
+    Yields:
+        tuple[int, str]: The 1-based page number and the page text with whitespace collapsed.
+    """
+    in_memory = isinstance(source, io.BytesIO)
+    with pdfplumber.open(source if in_memory else str(source)) as pdf:
+        page_count = len(pdf.pages)
+        if workers is None or workers <= 1 or page_count <= pages_per_task:
+            yield from _extract_pages(pdf, 0, page_count)
+            return
+
+    if in_memory:
+        # Workers need something they can open on their own, so spill the bytes to disk once
+        with tempfile.TemporaryDirectory(prefix="ragintel-pdf-") as tmp_dir:
+            pdf_path = Path(tmp_dir) / "document.pdf"
+            pdf_path.write_bytes(source.getbuffer())
+            yield from _iter_page_ranges(str(pdf_path), page_count, workers, pages_per_task)
+    else:
+        yield from _iter_page_ranges(str(source), page_count, workers, pages_per_task)
+
+
+def extract(content: io.BytesIO) -> str:
+    """Extractor registry entry point for application/pdf."""
+    return " ".join(page_text for _, page_text in iter_pdf_pages(content))
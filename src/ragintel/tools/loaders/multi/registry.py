@@ -0,0 +1,136 @@
+import importlib
+import io
+import mimetypes
+import sys
+from collections.abc import Callable
+
+from loguru import logger
+
+Extractor = Callable[[io.BytesIO], str]
+
+# Number of leading bytes handed to libmagic, enough for every signature we care about
+SNIFF_BYTES = 4096
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Extractors are referenced as "module:function" so that their modules (and the heavy libraries
+# they import, such as pdfplumber) are only imported the first time that format is seen
+DEFAULT_EXTRACTORS: dict[str, str | Extractor] = {
+    "application/pdf": "ragintel.tools.loaders.multi.pdf_extractor:extract",
+    "text/html": "ragintel.tools.loaders.multi.html_extractor:extract",
+    "application/xhtml+xml": "ragintel.tools.loaders.multi.html_extractor:extract",
+    DOCX_MIME: "ragintel.tools.loaders.multi.docx_extractor:extract",
+    "text/plain": "ragintel.tools.loaders.multi.text_extractor:extract",
+    "text/markdown": "ragintel.tools.loaders.multi.text_extractor:extract",
+    "text/csv": "ragintel.tools.loaders.multi.text_extractor:extract",
+}
+
+# libmagic answers that are too generic to pick an extractor from, the file name decides instead
+AMBIGUOUS_MIME_TYPES = {"application/zip", "application/octet-stream", "text/plain"}
+
+
+class ExtractorRegistry:
+    """Maps sniffed MIME types to text extractors, importing each extractor on first use."""
+
+    def __init__(self, extractors: dict[str, str | Extractor] | None = None):
+        self._targets: dict[str, str | Extractor] = dict(extractors or DEFAULT_EXTRACTORS)
+        self._resolved: dict[str, Extractor] = {}
+        self._magic = None
+
+    def register(self, mime_type: str, extractor: str | Extractor) -> None:
+        """
+        Registers an extractor for a MIME type, replacing any existing one.
+
+        Args:
+            mime_type (str): The MIME type, e.g. "application/rtf".
+            extractor (str | Callable): A function taking an io.BytesIO and returning text, or a
+                "module:function" reference to one that is imported on first use.
+        """
+        self._targets[mime_type] = extractor
+        self._resolved.pop(mime_type, None)
+
+    def get(self, mime_type: str) -> Extractor:
+        """
+        Returns the extractor for a MIME type, importing its module if needed.
+
+        Raises:
+            ValueError: If no extractor is registered for the MIME type.
+        """
+        extractor = self._resolved.get(mime_type)
+        if extractor is not None:
+            return extractor
+
+        target = self._targets.get(mime_type)
+        if target is None:
+            msg = f"Unsupported file type: {mime_type}"
+            raise ValueError(msg)
+
+        if isinstance(target, str):
+            module_path, function_name = target.split(":")
+            logger.debug(f"Importing extractor {target} for {mime_type}")
+            extractor = getattr(importlib.import_module(module_path), function_name)
+        else:
+            extractor = target
+
+        self._resolved[mime_type] = extractor
+        return extractor
+
+    def extractor_id(self, mime_type: str) -> str:
+        """
+        Returns a name identifying the extractor of a MIME type and its version, used to key
+        cached extractions. Extractor modules declare their version as EXTRACTOR_VERSION and bump
+        it whenever their output changes.
+        """
+        extractor = self.get(mime_type)
+        module = getattr(extractor, "__module__", None) or ""
+        name = getattr(extractor, "__qualname__", type(extractor).__name__)
+        version = getattr(sys.modules.get(module), "EXTRACTOR_VERSION", "0")
+        return f"{module}.{name}:{version}"
+
+    def extract(self, content: io.BytesIO, file_name: str | None = None) -> str:
+        """
+        Extracts the text of some content with the extractor of its sniffed MIME type.
+
+        Args:
+            content (io.BytesIO): The file content.
+            file_name (str | None): The file name, only used when the content type is ambiguous.
+
+        Raises:
+            ValueError: If no extractor is registered for the detected content type.
+        """
+        mime_type = self.sniff(content, file_name)
+        extractor = self.get(mime_type)
+        logger.debug(f"Extracting {file_name or 'content'} as {mime_type}")
+        return extractor(content)
+
+    def sniff(self, content: io.BytesIO, file_name: str | None = None) -> str:
+        """
+        Detects the MIME type of some content with libmagic, falling back to the file name when
+        libmagic is unavailable or only gives a generic answer.
+
+        The read position of content is left unchanged.
+        """
+        mime_type = None
+        if self._magic is None:
+            try:
+                import magic
+
+                self._magic = magic.Magic(mime=True)
+            except (ImportError, OSError) as e:
+                logger.warning(f"python-magic unavailable ({e}), using file names only")
+                self._magic = False
+
+        if self._magic:
+            position = content.tell()
+            head = content.read(SNIFF_BYTES)
+            content.seek(position)
+            mime_type = self._magic.from_buffer(head)
+
+        if mime_type is None or mime_type in AMBIGUOUS_MIME_TYPES:
+            guessed, _ = mimetypes.guess_type(file_name or "")
+            if guessed in self._targets:
+                return guessed
+            if mime_type == "application/zip" and (file_name or "").endswith(".docx"):
+                return DOCX_MIME
+
+        return mime_type or "application/octet-stream"
@@ -0,0 +1,11 @@
+import io
+
+from loguru import logger
+
+EXTRACTOR_VERSION = "1"
+
+
+def extract(content: io.BytesIO) -> str:
+    """Extractor registry entry point for text/plain and other plain-text formats."""
+    # str.split() with no separator collapses every whitespace run in C, faster than re.sub
+    return " ".join(content.read().decode("utf-8", errors="replace").split())
@@ -1,10 +1,12 @@
 # Description: This file contains the SigmaLoader class, which is responsible for loading Sigma rules into the database.
-import json
 import os
 import uuid
+from collections.abc import Iterator
 from pathlib import Path, PurePosixPath
+from typing import Literal
 
-import kuzu
+import pandas as pd
+import pyarrow as pa
 import yaml
 from langchain.docstore.document import Document
 from langchain_community.document_loaders import DirectoryLoader
@@ -12,22 +14,30 @@ from loguru import logger
 
 from ragintel.nodes.detections import SigmaNode
 from ragintel.tools.archivers.chroma import ChromaOps
+from ragintel.tools.archivers.kuzudb import KuzuOps
 from ragintel.tools.loaders.github import GitHubLoader
-from ragintel.utils.adaptors.pydantic import PydanticAdaptor
+from ragintel.utils.base import FileManifest
 from ragintel.utils.directory_manager import DirectoryManager
 from ragintel.utils.enums import EmbedderType
 from ragintel.utils.file_loader import FileLoader
 
 
 class SigmaLoader:
-    def __init__(self):
-        # Create an empty on-disk database and connect to it
-        db = kuzu.Database("./data/ragintel.db")
-        self.conn = kuzu.Connection(db)
+    def __init__(self, kuzu_ops: KuzuOps | None = None, manifest: FileManifest | None = None):
+        # Share the process-wide KuzuDB database instead of opening a private one
+        self.kuzu_ops = kuzu_ops or KuzuOps()
+        self._manifest = manifest
         self.sigma_file_list = []
         self.directory_manager = DirectoryManager()
         self.sigma_dest_directory = Path("./data/sigma")
 
+    @property
+    def manifest(self) -> FileManifest:
+        # Only open the manifest database when an incremental load asks for it
+        if self._manifest is None:
+            self._manifest = FileManifest()
+        return self._manifest
+
     def clone_sigma_repo(
         self, repo_path: str = "SigmaHQ/sigma", dest_directory: str = "./data/sigma"
     ) -> None:
@@ -75,6 +85,7 @@ class SigmaLoader:
         load_to_chroma: bool = False,
         chroma_embedder: str = "chroma",
         sample_only: bool = False,
+        incremental: bool = False,
     ) -> list[Document] | None:
         """
         Loads Sigma rules into Kuzu Graph Database.
@@ -83,6 +94,7 @@ class SigmaLoader:
             file_paths (list[str] | None): A list of file paths to Sigma rules YAML files. If None, the function will clone a Sigma repository and use the cloned files. Default is None.
             load_to_chroma (bool): Whether to load the Sigma rules into ChromaDB for embedding and querying. Default is False.
             chroma_embedder (str): The type of embedder to use for ChromaDB. Default is "chroma".
+            incremental (bool): Consult the file manifest and only load rules added or modified since the last run, deleting the nodes of modified and removed rules first. Default is False.
 
         Returns:
             None
@@ -123,105 +135,36 @@ class SigmaLoader:
             logger.info("Sampling only 5 Sigma rules for testing purposes")
             file_paths = file_paths[:5]
 
-        # Create KuzuDB Schema
-        # Start by retrieving from Pydantic the schema for SigmaNode
-        SigmaNodeSchema = PydanticAdaptor()
-        self.conn.execute(f"""
-            CREATE NODE TABLE IF NOT EXISTS SigmaRule(
-            {SigmaNodeSchema.pydantic_to_schema_string(SigmaNode)}
+        if incremental:
+            # Only parse what changed since the last run, and drop the nodes of rules that were
+            # modified or removed so that the modified ones can be loaded again. Deletions can
+            # only be inferred when we hold the full listing of the cloned repository
+            full_listing = file_paths == self.sigma_file_list and not sample_only
+            diff = self.manifest.diff(
+                "sigma", file_paths, root=self.sigma_dest_directory if full_listing else None
+            )
+            stale_files = diff.modified + diff.deleted
+            self.kuzu_ops.delete_nodes("SigmaRule", self.manifest.target_ids("sigma", stale_files))
+            self.manifest.forget("sigma", diff.deleted)
+            file_paths = diff.changed
+
+        # Parse the rules and bulk load them in one columnar COPY. The SigmaRule table is derived
+        # from the SigmaNode model, so the schema and the loaded columns always line up
+        parsed_rules = {file_path: self.parse_sigma_rule(file_path) for file_path in file_paths}
+        parsed_rules = {path: row for path, row in parsed_rules.items() if row is not None}
+        written = self.kuzu_ops.bulk_load("SigmaRule", SigmaNode, list(parsed_rules.values()))
+        logger.info(f"Wrote {written} Sigma rules to KuzuDB")
+
+        if incremental:
+            # Only record the rules that made it into the graph, so that rules dropped by
+            # validation are parsed again on the next run
+            stored = self.kuzu_ops.stored_keys(
+                "SigmaRule", [row["id"] for row in parsed_rules.values()]
+            )
+            self.manifest.record(
+                "sigma",
+                {path: [row["id"]] for path, row in parsed_rules.items() if row["id"] in stored},
             )
-        """)
-
-        for file_path in file_paths:
-            try:
-                with open(file_path) as f:
-                    sigma_rule_data = yaml.safe_load(f)
-
-                # Convert back to YAML string so we can add it to "raw_document" field
-                yaml_string = yaml.dump(sigma_rule_data)
-                # Grab URL value for the rule too
-                base_url = "https://github.com/SigmaHQ/sigma/blob/master/"
-                # fmt: off
-                try:
-                    # Find the index of "rules/" in the path parts
-                    parts = file_path.parts
-                    sigma_index = parts.index("sigma")
-                    # Join the parts from "rules/" onwards
-                    relative_path = PurePosixPath(*parts[sigma_index + 1:])
-                    # Join the base URL and the relative path
-                    full_url = base_url + str(relative_path)
-                except ValueError:
-                    logger.error(f"Could not find 'rules/' in path: {file_path}")
-                # fmt: on
-                logger.debug(f"Loading Sigma rule: {sigma_rule_data['title']}")
-
-                # Process the 'detection' field dynamically, storing results in a list of strings
-                detection_data = []
-                for selection_key, selection_value in sigma_rule_data["detection"].items():
-                    if selection_key.startswith("selection_"):
-                        if isinstance(selection_value, list):
-                            # Handle the case where selection_value is a list
-                            for item in selection_value:
-                                if isinstance(item, dict):
-                                    # If item is a dictionary, process it as before
-                                    for field, value in item.items():
-                                        if isinstance(value, list):
-                                            detection_data.append(
-                                                f"{selection_key}_{field}: {', '.join(value)}"
-                                            )
-                                        else:
-                                            detection_data.append(
-                                                f"{selection_key}_{field}: {value}"
-                                            )
-                                else:
-                                    # If item is not a dictionary, handle it appropriately (e.g., append as is)
-                                    detection_data.append(f"{selection_key}: {item}")
-                        else:
-                            # Handle the case where selection_value is a dictionary (as before)
-                            for field, value in selection_value.items():
-                                if isinstance(value, list):
-                                    detection_data.append(
-                                        f"{selection_key}_{field}: {', '.join(value)}"
-                                    )
-                                else:
-                                    detection_data.append(f"{selection_key}_{field}: {value}")
-                    else:
-                        detection_data.append(f"{selection_key}: {selection_value}")
-
-                # Process the 'logsource' attribute
-                logsource_data = [
-                    f"{key}: {value}" for key, value in sigma_rule_data["logsource"].items()
-                ]
-
-                # Update the sigma_rule_data with the processed logsource data
-                sigma_rule_data["logsource"] = logsource_data
-                # Update the sigma_rule_data with the processed detection data
-                sigma_rule_data["detection"] = detection_data
-
-                self.conn.execute(f"""
-                    CREATE (s:SigmaRule {{
-                        node_type: "detection",
-                        node_subtype: "sigma",
-                        source_url: "{full_url}",
-                        title: {json.dumps(sigma_rule_data.get('title', 'NA'))},
-                        id: "{sigma_rule_data.get('id', 'NA')}",
-                        status: "{sigma_rule_data.get('status', 'NA')}",
-                        description: {json.dumps(sigma_rule_data.get('description', 'NA'))},
-                        references: {sigma_rule_data.get('references', ['NA'])},
-                        author: {json.dumps(sigma_rule_data.get('author', 'NA'))},
-                        date: "{sigma_rule_data.get('date', 'NA')}",
-                        modified: "{sigma_rule_data.get('modified', 'NA')}",
-                        tags: {sigma_rule_data.get('tags', ['NA'])},
-                        logsource: {json.dumps(sigma_rule_data.get('logsource', ['NA']))},
-                        detection: {json.dumps(sigma_rule_data.get('detection', ['NA']))},
-                        falsepositives: {sigma_rule_data.get('falsepositives', ['NA'])},
-                        level: {json.dumps(sigma_rule_data.get('level', 'NA'))},
-                        raw_document: {json.dumps(yaml_string)}
-                    }})
-                """)
-            except Exception as e:
-                logger.error(f"Error loading Sigma rule: {e}. Continuing to next rule.")
-                continue
 
         logger.info("Finished loading Sigma rules to KuzuDB")
 
@@ -235,6 +178,99 @@ class SigmaLoader:
                     f"Error loading Sigma rules to ChromaDB: {e}. Continuing to next rule."
                 )
 
+    def parse_sigma_rule(self, file_path: Path) -> dict | None:
+        """
+        Parses a Sigma rule YAML file into the parameters of a SigmaRule node.
+
+        Args:
+            file_path (Path): The path to the Sigma rule file.
+
+        Returns:
+            dict | None: The node properties keyed by SigmaNode field name, or None if the rule
+            could not be parsed.
+        """
+        try:
+            with open(file_path) as f:
+                sigma_rule_data = yaml.safe_load(f)
+
+            # Convert back to YAML string so we can add it to "raw_document" field
+            yaml_string = yaml.dump(sigma_rule_data)
+            # Grab URL value for the rule too
+            base_url = "https://github.com/SigmaHQ/sigma/blob/master/"
+            full_url = "NA"
+            # fmt: off
+            try:
+                # Find the index of "rules/" in the path parts
+                parts = Path(file_path).parts
+                sigma_index = parts.index("sigma")
+                # Join the parts from "rules/" onwards
+                relative_path = PurePosixPath(*parts[sigma_index + 1:])
+                # Join the base URL and the relative path
+                full_url = base_url + str(relative_path)
+            except ValueError:
+                logger.error(f"Could not find 'rules/' in path: {file_path}")
+            # fmt: on
+            logger.debug(f"Loading Sigma rule: {sigma_rule_data['title']}")
+
+            # Process the 'detection' field dynamically, storing results in a list of strings
+            detection_data = []
+            for selection_key, selection_value in sigma_rule_data["detection"].items():
+                if selection_key.startswith("selection_"):
+                    if isinstance(selection_value, list):
+                        # Handle the case where selection_value is a list
+                        for item in selection_value:
+                            if isinstance(item, dict):
+                                # If item is a dictionary, process it as before
+                                for field, value in item.items():
+                                    if isinstance(value, list):
+                                        detection_data.append(
+                                            f"{selection_key}_{field}: {', '.join(value)}"
+                                        )
+                                    else:
+                                        detection_data.append(f"{selection_key}_{field}: {value}")
+                            else:
+                                # If item is not a dictionary, handle it appropriately (e.g., append as is)
+                                detection_data.append(f"{selection_key}: {item}")
+                    else:
+                        # Handle the case where selection_value is a dictionary (as before)
+                        for field, value in selection_value.items():
+                            if isinstance(value, list):
+                                detection_data.append(
+                                    f"{selection_key}_{field}: {', '.join(value)}"
+                                )
+                            else:
+                                detection_data.append(f"{selection_key}_{field}: {value}")
+                else:
+                    detection_data.append(f"{selection_key}: {selection_value}")
+
+            # Process the 'logsource' attribute
+            logsource_data = [
+                f"{key}: {value}" for key, value in sigma_rule_data["logsource"].items()
+            ]
+
+            return {
+                "node_type": "detection",
+                "node_subtype": "sigma",
+                "source_url": full_url,
+                "title": str(sigma_rule_data.get("title", "NA")),
+                "id": str(sigma_rule_data.get("id", "NA")),
+                "status": str(sigma_rule_data.get("status", "NA")),
+                "description": str(sigma_rule_data.get("description", "NA")),
+                "references": [str(r) for r in sigma_rule_data.get("references", ["NA"])],
+                "author": str(sigma_rule_data.get("author", "NA")),
+                "date": str(sigma_rule_data.get("date", "NA")),
+                "modified": str(sigma_rule_data.get("modified", "NA")),
+                "tags": [str(t) for t in sigma_rule_data.get("tags", ["NA"])],
+                "logsource": logsource_data or ["NA"],
+                "detection": detection_data or ["NA"],
+                "falsepositives": [str(f) for f in sigma_rule_data.get("falsepositives", ["NA"])],
+                "level": str(sigma_rule_data.get("level", "NA")),
+                "raw_document": yaml_string,
+            }
+        except Exception as e:
+            logger.error(f"Error loading Sigma rule: {e}. Continuing to next rule.")
+            return None
+
     def load_rules_to_vector_store(
         self,
         embedder: str = "chroma",
@@ -302,18 +338,30 @@ class SigmaLoader:
 
         return
 
-    def query_sigma_rules(self, cypher_query: str) -> list:
+    def query_sigma_rules(
+        self,
+        cypher_query: str,
+        parameters: dict | None = None,
+        page_size: int = 10_000,
+        output: Literal["arrow", "pandas"] = "arrow",
+    ) -> Iterator[pa.RecordBatch | pd.DataFrame]:
         """
         Queries the database for Sigma rules.
 
-        :param query: str, the query to search for in the database.
-        :return: List, a list of Sigma rules that match the query.
+        Args:
+            cypher_query (str): The Cypher query, e.g.
+                "MATCH (s:SigmaRule) WHERE s.level = $level RETURN s.title, s.id".
+            parameters (dict | None): Values for the $placeholders in the query.
+            page_size (int): Maximum number of rows per page. Default is 10000.
+            output (str): "arrow" for pyarrow.RecordBatch pages or "pandas" for DataFrames.
 
-        This function queries the database for Sigma rules that match the provided query.
+        Returns:
+            Iterator[pa.RecordBatch | pd.DataFrame]: The pages of Sigma rules matching the query.
 
         Raises:
-        - None
+            None
         """
 
-        cypher_query = cypher_query.lower()
-        return self.conn.execute(cypher_query)
+        return self.kuzu_ops.query(
+            cypher_query, parameters=parameters, page_size=page_size, output=output
+        )
@@ -1,7 +1,69 @@
+import types
+from collections.abc import Iterable
+from datetime import date, datetime
+from typing import Any, Union, get_args, get_origin
+
+import pyarrow as pa
 from loguru import logger
 
+from pydantic import BaseModel, ValidationError
+
+# Scalar Python annotations and their (Kuzu, Arrow) counterparts
+_SCALAR_TYPES: dict[type, tuple[str, pa.DataType]] = {
+    str: ("STRING", pa.string()),
+    int: ("INT64", pa.int64()),
+    float: ("DOUBLE", pa.float64()),
+    bool: ("BOOLEAN", pa.bool_()),
+    datetime: ("TIMESTAMP", pa.timestamp("us")),
+    date: ("DATE", pa.date32()),
+}
+
 
 class PydanticAdaptor:
+    def _unwrap_optional(self, annotation: Any) -> tuple[Any, bool]:
+        """
+        Strips Optional[...] / "X | None" from an annotation.
+
+        Returns:
+            A tuple with the inner annotation and whether None was allowed.
+        """
+        if get_origin(annotation) in (Union, types.UnionType):
+            args = [arg for arg in get_args(annotation) if arg is not type(None)]
+            if len(args) == 1:
+                return args[0], True
+            msg = f"Unsupported union annotation for KuzuDB: {annotation}"
+            raise ValueError(msg)
+        return annotation, False
+
+    def _resolve_type(self, annotation: Any) -> tuple[str, pa.DataType, bool]:
+        """
+        Maps a field annotation to its Kuzu type string, Arrow type and nullability.
+        """
+        annotation, nullable = self._unwrap_optional(annotation)
+
+        if get_origin(annotation) is list:
+            args = get_args(annotation)
+            inner, _ = self._unwrap_optional(args[0] if args else str)
+            if inner not in _SCALAR_TYPES:
+                msg = f"Unsupported list item type for KuzuDB: {inner}"
+                raise ValueError(msg)
+            kuzu_type, arrow_type = _SCALAR_TYPES[inner]
+            return f"{kuzu_type}[]", pa.list_(arrow_type), nullable
+
+        if annotation in _SCALAR_TYPES:
+            kuzu_type, arrow_type = _SCALAR_TYPES[annotation]
+            return kuzu_type, arrow_type, nullable
+
+        msg = f"Unsupported field type for KuzuDB: {annotation}"
+        raise ValueError(msg)
+
+    def _field_names(self, model_class: type[BaseModel]) -> list[tuple[str, Any]]:
+        # Handle aliases if present
+        return [
+            (field_info.alias if field_info.alias else field_name, field_info)
+            for field_name, field_info in model_class.model_fields.items()
+        ]
+
     def pydantic_to_schema_string(self, model_class):
         """
         Converts a Pydantic model class into a string literal schema representation.
@@ -14,25 +76,88 @@ class PydanticAdaptor:
         """
 
         schema_lines = []
-        for field_name, field_info in model_class.model_fields.items():
-            # Handle aliases if present
-            _field_name = field_info.alias if field_info.alias else field_name
-
-            # Determine the type representation
-            if field_info.annotation is str:
-                type_str = "STRING"
-            elif (
-                field_info.annotation.__origin__ is list
-                and field_info.annotation.__args__[0] is str
-            ):
-                type_str = "STRING[]"
-            else:
-                type_str = field_info.annotation.__name__.upper()
-
+        for _field_name, field_info in self._field_names(model_class):
+            type_str, _, _ = self._resolve_type(field_info.annotation)
             schema_lines.append(f"  {_field_name} {type_str},")
 
         # Add the PRIMARY KEY line if 'id' is present
         if "id" in model_class.model_fields:
             schema_lines.append("  PRIMARY KEY (id)")
+        else:
+            # Kuzu rejects a trailing comma when there is no PRIMARY KEY clause after it
+            schema_lines[-1] = schema_lines[-1].rstrip(",")
 
         return "\n".join(schema_lines)
+
+    def pydantic_to_arrow_schema(self, model_class: type[BaseModel]) -> pa.Schema:
+        """
+        Converts a Pydantic model class into an Arrow schema with the same column order as the
+        KuzuDB schema produced by pydantic_to_schema_string.
+
+        Args:
+            model_class: The Pydantic model class to convert.
+
+        Returns:
+            pa.Schema: The Arrow schema. Fields are non-nullable unless annotated as Optional.
+        """
+        fields = []
+        for _field_name, field_info in self._field_names(model_class):
+            _, arrow_type, nullable = self._resolve_type(field_info.annotation)
+            fields.append(pa.field(_field_name, arrow_type, nullable=nullable))
+
+        return pa.schema(fields)
+
+    def pydantic_to_arrow_table(
+        self, model_class: type[BaseModel], records: Iterable[BaseModel | dict]
+    ) -> pa.Table:
+        """
+        Converts a batch of model instances or plain dicts into a columnar Arrow table.
+
+        Defaults declared on the model are filled in for missing keys, and the whole batch is then
+        type-checked by Arrow in one pass. Only when that fails are the rows validated one by one
+        through Pydantic, so that invalid rows are logged and dropped instead of failing the batch.
+
+        Args:
+            model_class: The Pydantic model class describing a row.
+            records: The rows, either instances of model_class or dicts keyed by field name/alias.
+
+        Returns:
+            pa.Table: The valid rows, laid out according to pydantic_to_arrow_schema.
+        """
+        schema = self.pydantic_to_arrow_schema(model_class)
+        defaults = {
+            name: field_info.get_default(call_default_factory=True)
+            for name, field_info in self._field_names(model_class)
+            if not field_info.is_required()
+        }
+
+        rows = []
+        for record in records:
+            if isinstance(record, BaseModel):
+                rows.append(record.model_dump(by_alias=True))
+            else:
+                rows.append({**defaults, **record})
+
+        try:
+            table = pa.Table.from_pylist(rows, schema=schema)
+            self._check_required_columns(table)
+            return table
+        except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError) as e:
+            logger.warning(f"Columnar validation failed ({e}). Validating rows individually.")
+
+        valid_rows = []
+        for index, row in enumerate(rows):
+            try:
+                valid_rows.append(model_class.model_validate(row).model_dump(by_alias=True))
+            except ValidationError as e:
+                logger.error(f"Dropping invalid {model_class.__name__} row {index}: {e}")
+
+        table = pa.Table.from_pylist(valid_rows, schema=schema)
+        self._check_required_columns(table)
+        return table
+
+    def _check_required_columns(self, table: pa.Table) -> None:
+        for field in table.schema:
+            if not field.nullable and table.column(field.name).null_count:
+                msg = f"Column '{field.name}' contains nulls but is not Optional"
+                raise ValueError(msg)
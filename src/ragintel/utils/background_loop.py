@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from collections.abc import AsyncIterator, Coroutine, Iterator
+from typing import Any, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+_EXHAUSTED = object()
+
+
+async def _next_item(agen: AsyncIterator[T]) -> T | object:
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        return _EXHAUSTED
+
+
+class BackgroundLoop:
+    """An asyncio event loop running in a daemon thread, for driving async code from sync code.
+
+    Objects bound to an event loop, such as HTTP clients and their connection pools, can be kept
+    on this loop and reused across calls instead of being rebuilt by every asyncio.run(). It also
+    works when the caller already runs inside an event loop (e.g. a notebook).
+    """
+
+    def __init__(self, name: str = "ragintel-loop"):
+        self.name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._loop is not None and not self._loop.is_closed()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if not self.started:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name=self.name, daemon=True
+                )
+                self._thread.start()
+                logger.debug(f"Started background event loop {self.name}")
+            return self._loop
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: float | None = None) -> T:
+        """
+        Runs a coroutine on the background loop and waits for its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def iterate(self, agen: AsyncIterator[T]) -> Iterator[T]:
+        """
+        Consumes an async iterator from sync code, one item at a time.
+
+        The iterator is closed on the loop if the caller stops early, so that its cleanup (e.g.
+        cancelling pending requests) still runs.
+        """
+        try:
+            while (item := self.run(_next_item(agen))) is not _EXHAUSTED:
+                yield item
+        finally:
+            aclose = getattr(agen, "aclose", None)
+            if aclose is not None and self.started:
+                self.run(aclose())
+
+    def close(self) -> None:
+        with self._lock:
+            if not self.started:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            logger.debug(f"Stopped background event loop {self.name}")
@@ -1,6 +1,8 @@
 from loguru import logger
 
 from ragintel.utils.base.config_loader import ConfigLoader
+from ragintel.utils.base.extraction_cache import ExtractionCache
+from ragintel.utils.base.file_manifest import FileManifest, ManifestDiff
 from ragintel.utils.base.llamaindex_doc_dedup import LlamaIndexDocDedup
 
-__all__ = ["ConfigLoader", "LlamaIndexDocDedup"]
+__all__ = ["ConfigLoader", "ExtractionCache", "FileManifest", "LlamaIndexDocDedup", "ManifestDiff"]
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+import zlib
+from collections.abc import Callable
+from pathlib import Path
+
+from loguru import logger
+
+DEFAULT_MAX_BYTES = 1024**3
+
+
+class ExtractionCache:
+    """Content-addressed on-disk cache of extracted text.
+
+    Entries are keyed by the hash of the source bytes plus the extractor name and version, so a
+    new extractor version never serves text produced by an older one. Values are zlib-compressed
+    files sharded into 256 folders. Reading an entry refreshes its modification time, and once
+    the cache grows past max_bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir: str | Path | None = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize the ExtractionCache.
+
+        Args:
+            cache_dir (str | Path | None): The cache folder. Defaults to the
+                RAGINTEL_EXTRACTION_CACHE_DIR environment variable or "./data/extraction_cache".
+            max_bytes (int): Size the cache is trimmed to, in bytes. Default is 1 GiB.
+        """
+        if cache_dir is None:
+            cache_dir = os.getenv("RAGINTEL_EXTRACTION_CACHE_DIR", "./data/extraction_cache")
+
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = sum(entry.stat().st_size for entry in self._entries())
+        logger.debug(f"Initialized ExtractionCache at {self.cache_dir} ({self._size} bytes)")
+
+    def _entries(self) -> list[os.DirEntry]:
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if shard.is_dir():
+                entries.extend(entry for entry in os.scandir(shard.path) if entry.is_file())
+        return entries
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.zz"
+
+    def key(self, content: bytes, extractor: str) -> str:
+        """
+        Builds the cache key of some source bytes for an extractor.
+
+        Args:
+            content (bytes): The raw source, e.g. the file or HTML bytes.
+            extractor (str): The extractor name and version, e.g. "html2text:2024.2.26".
+        """
+        digest = hashlib.blake2b(content, digest_size=20)
+        digest.update(b"\0" + extractor.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        try:
+            text = zlib.decompress(data).decode("utf-8")
+        except (zlib.error, UnicodeDecodeError):
+            logger.warning(f"Dropping corrupt extraction cache entry {path.name}")
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+
+        # Mark the entry as recently used for eviction
+        os.utime(path)
+        self.hits += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        data = zlib.compress(text.encode("utf-8"), 6)
+
+        # Write to a temporary file and rename it, so concurrent readers never see half an entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+
+        with self._lock:
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def get_or_extract(self, content: bytes, extractor: str, extract: Callable[[], str]) -> str:
+        """
+        Returns the cached text for content, calling extract() and caching its result on a miss.
+
+        Args:
+            content (bytes): The raw source the text is extracted from.
+            extractor (str): The extractor name and version.
+            extract (Callable[[], str]): Produces the text when it is not cached.
+        """
+        key = self.key(content, extractor)
+        text = self.get(key)
+        if text is None:
+            text = extract()
+            self.put(key, text)
+        return text
+
+    def _evict(self) -> None:
+        # Trim to 90% of the limit so that we do not rescan the folder on every following put
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        self._size = sum(entry.stat().st_size for entry in entries)
+
+        evicted = 0
+        for entry in entries:
+            if self._size <= target:
+                break
+            size = entry.stat().st_size
+            Path(entry.path).unlink(missing_ok=True)
+            self._size -= size
+            evicted += 1
+
+        logger.debug(f"Evicted {evicted} extraction cache entries, {self._size} bytes remain")
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
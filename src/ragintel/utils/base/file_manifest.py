@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+from loguru import logger
+from pydantic import BaseModel, Field
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: str | Path) -> str:
+    """
+    Returns the BLAKE2b content hash of a file, read in 1 MiB chunks.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ManifestDiff(BaseModel):
+    """Files sorted by what happened to them since the last recorded run of a loader."""
+
+    added: list[Path] = Field(default_factory=list)
+    modified: list[Path] = Field(default_factory=list)
+    deleted: list[Path] = Field(default_factory=list)
+    unchanged: list[Path] = Field(default_factory=list)
+
+    @property
+    def changed(self) -> list[Path]:
+        """Files that have to be (re)loaded, i.e. added plus modified."""
+        return self.added + self.modified
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.modified or self.deleted)
+
+
+class FileManifest:
+    """SQLite store of the files each loader has already ingested."""
+
+    def __init__(self, db_path: str | Path | None = None):
+        """
+        Initialize the FileManifest.
+
+        Args:
+            db_path (str | Path | None): Path to the SQLite database. Defaults to the
+                RAGINTEL_MANIFEST_PATH environment variable or "./data/ragintel_manifest.sqlite".
+        """
+        if db_path is None:
+            db_path = os.getenv("RAGINTEL_MANIFEST_PATH", "./data/ragintel_manifest.sqlite")
+
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                loader TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                target_ids TEXT NOT NULL,
+                loaded_at REAL NOT NULL,
+                PRIMARY KEY (loader, path)
+            )
+        """)
+        self.conn.commit()
+        logger.debug(f"Initialized FileManifest at {self.db_path}")
+
+    def _key(self, file_path: str | Path) -> str:
+        return str(Path(file_path).resolve())
+
+    def _stored(self, loader: str) -> dict[str, tuple[int, int, str]]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path, size, mtime_ns, content_hash FROM files WHERE loader = ?", (loader,)
+            ).fetchall()
+        return {path: (size, mtime_ns, content_hash) for path, size, mtime_ns, content_hash in rows}
+
+    def diff(
+        self,
+        loader: str,
+        file_paths: Iterable[str | Path],
+        root: str | Path | None = None,
+        quick: bool = True,
+    ) -> ManifestDiff:
+        """
+        Compares the current files of a loader against what was recorded on its last run.
+
+        Args:
+            loader (str): The loader name the files are recorded under, e.g. "sigma".
+            file_paths (Iterable[str | Path]): The files the loader would ingest now.
+            root (str | Path | None): The directory the files were listed from. Recorded files
+                under it that are no longer present are reported as deleted. If None, nothing is
+                reported as deleted.
+            quick (bool): Trust size and modification time when both are unchanged and only hash
+                files whose stat differs. If False, every file is hashed. Default is True.
+
+        Returns:
+            ManifestDiff: The added, modified, deleted and unchanged files.
+        """
+        stored = self._stored(loader)
+        result = ManifestDiff()
+        seen = set()
+        touched = []
+
+        for file_path in file_paths:
+            key = self._key(file_path)
+            seen.add(key)
+            try:
+                stat = Path(key).stat()
+            except OSError:
+                continue
+
+            previous = stored.get(key)
+            if previous is None:
+                result.added.append(Path(file_path))
+                continue
+
+            size, mtime_ns, content_hash = previous
+            if quick and stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+                result.unchanged.append(Path(file_path))
+                continue
+
+            # The stat changed (or we were asked not to trust it), fall back to the content hash
+            # so that a touch or a fresh clone of the same content does not trigger a reload
+            if stat.st_size == size and hash_file(key) == content_hash:
+                result.unchanged.append(Path(file_path))
+                touched.append((stat.st_size, stat.st_mtime_ns, loader, key))
+            else:
+                result.modified.append(Path(file_path))
+
+        if root is not None:
+            root_prefix = self._key(root) + os.sep
+            result.deleted = [
+                Path(path) for path in stored if path.startswith(root_prefix) and path not in seen
+            ]
+
+        if touched:
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    "UPDATE files SET size = ?, mtime_ns = ? WHERE loader = ? AND path = ?",
+                    touched,
+                )
+
+        logger.info(
+            f"Manifest [{loader}]: {len(result.added)} added, {len(result.modified)} modified, "
+            f"{len(result.deleted)} deleted, {len(result.unchanged)} unchanged"
+        )
+        return result
+
+    def record(self, loader: str, files: dict[str | Path, list[str]]) -> None:
+        """
+        Records files as ingested by a loader, together with the IDs they produced.
+
+        Args:
+            loader (str): The loader name, e.g. "sigma".
+            files (dict[str | Path, list[str]]): The ingested files mapped to the IDs of the nodes
+                or documents created from each of them.
+        """
+        rows = []
+        now = time.time()
+        for file_path, target_ids in files.items():
+            key = self._key(file_path)
+            try:
+                stat = Path(key).stat()
+            except OSError:
+                continue
+            rows.append(
+                (
+                    loader,
+                    key,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    hash_file(key),
+                    json.dumps(list(target_ids)),
+                    now,
+                )
+            )
+
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def target_ids(self, loader: str, file_paths: Iterable[str | Path]) -> list[str]:
+        """
+        Returns the IDs previously produced from the given files.
+        """
+        ids = []
+        with self._lock:
+            for file_path in file_paths:
+                row = self.conn.execute(
+                    "SELECT target_ids FROM files WHERE loader = ? AND path = ?",
+                    (loader, self._key(file_path)),
+                ).fetchone()
+                if row is not None:
+                    ids.extend(json.loads(row[0]))
+        return ids
+
+    def forget(self, loader: str, file_paths: Iterable[str | Path]) -> None:
+        """
+        Removes files from the manifest, e.g. after their nodes were deleted.
+        """
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "DELETE FROM files WHERE loader = ? AND path = ?",
+                [(loader, self._key(file_path)) for file_path in file_paths],
+            )
+
+    def close(self) -> None:
+        self.conn.close()
@@ -7,8 +7,6 @@ from loguru import logger
 class LlamaIndexDocDedup:
     def __init__(self):
         logger.debug("Initialized LlamaIndexDocDedup")
-        # Crear un objeto hash SHA-256
-        self.hash = hashlib.sha256()
 
     def deduplicate_documents(self, documents: list[Document]) -> list[dict]:
         seen_paths = {}
@@ -19,8 +17,11 @@ class LlamaIndexDocDedup:
             if relative_path not in seen_paths:
                 seen_paths[relative_path] = True
 
-                self.hash.update(str(doc.metadata.get("relative_path")).encode("utf-8"))
-                doc_hash_hex = self.hash.hexdigest()
+                # Hash each path on its own so a document keeps the same ID no matter which other
+                # documents are loaded alongside it (incremental loads only see changed files)
+                doc_hash_hex = hashlib.sha256(
+                    str(doc.metadata.get("relative_path")).encode("utf-8")
+                ).hexdigest()
 
                 deduplicated_docs.append(
                     {"relative_path": doc.metadata.get("relative_path"), "doc_hash": doc_hash_hex}
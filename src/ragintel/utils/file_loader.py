@@ -1,3 +1,10 @@
+import fnmatch
+import hashlib
+import json
+import os
+import re
+from collections.abc import Iterable, Iterator
+from importlib.metadata import PackageNotFoundError, version
 from pathlib import Path
 
 from langchain.docstore.document import Document
@@ -8,33 +15,254 @@ from langchain_community.document_loaders import (
 )
 from loguru import logger
 
+from ragintel.utils.base.extraction_cache import ExtractionCache
+from ragintel.utils.base.file_manifest import FileManifest, ManifestDiff, hash_file
+from ragintel.utils.isolated_pool import imap_isolated
+
+
+def _extract_with_unstructured(file_name: str) -> list[Document]:
+    # Module-level so that it can be pickled into worker processes
+    return UnstructuredFileLoader(file_name).load()
+
+
+def document_id(file_path: str | Path, index: int, page_content: str) -> str:
+    """
+    Returns a stable ID for the index-th document extracted from a file, derived from the file
+    path, the position of the document and its content.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{Path(file_path).as_posix()}\0{index}\0".encode())
+    digest.update(page_content.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+def _unstructured_version() -> str:
+    try:
+        return version("unstructured")
+    except PackageNotFoundError:
+        return "unknown"
+
 
 class FileLoader:
-    def __init__(self, loader_type: str | None = None):
+    def __init__(
+        self,
+        loader_type: str | None = None,
+        manifest: FileManifest | None = None,
+        cache: ExtractionCache | None = None,
+    ):
+        """
+        Initialize the FileLoader.
+
+        Args:
+            loader_type (str | None): Name the loaded files are recorded under in the manifest.
+            manifest (FileManifest | None): The manifest used by incremental loads. Opened lazily
+                with its defaults if not given.
+            cache (ExtractionCache | None): If given, the documents extracted from each file are
+                cached by content hash, and files whose content was already extracted by the same
+                unstructured version are not extracted again.
+        """
         self.loader_type = loader_type
         self.documents = []
+        self.manifest_diff: ManifestDiff | None = None
+        self.stale_ids: list[str] = []
+        self._manifest = manifest
+        self.cache = cache
+        self.extractor_id = f"unstructured:{_unstructured_version()}"
         logger.debug("Initialized FileLoader loader")
 
-    def load_single_document(self, file_name: str) -> list[Document]:
-        try:
-            loader = UnstructuredFileLoader(file_name)
-            self.documents = loader.load()
+    @property
+    def manifest(self) -> FileManifest:
+        # Only open the manifest database when an incremental load asks for it
+        if self._manifest is None:
+            self._manifest = FileManifest()
+        return self._manifest
+
+    def _cache_key(self, file_path: str | Path) -> str:
+        return self.cache.key(hash_file(file_path).encode("ascii"), self.extractor_id)
+
+    def _get_cached(self, key: str, file_path: str | Path) -> list[Document] | None:
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        docs = [Document(**doc) for doc in json.loads(cached)]
+        # Identical content may have been cached from another path
+        for doc in docs:
+            if "source" in doc.metadata:
+                doc.metadata["source"] = str(file_path)
+        return docs
+
+    def _put_cached(self, key: str, docs: list[Document]) -> None:
+        self.cache.put(
+            key,
+            json.dumps(
+                [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs],
+                default=str,
+            ),
+        )
+
+    def load_single_document(
+        self, file_name: str, timeout: float | None = None, memory_limit_mb: int | None = None
+    ) -> list[Document]:
+        """
+        Loads a single file with unstructured.
+
+        Args:
+            file_name (str): The file to load.
+            timeout (float | None): If set (or if memory_limit_mb is set), the file is extracted
+                in a separate process that is killed after this many seconds.
+            memory_limit_mb (int | None): Address-space cap for the extraction process, in MiB.
+
+        Returns:
+            List[Document]: The loaded documents, empty if extraction failed.
+        """
+        workers = 1 if timeout is not None or memory_limit_mb is not None else None
+        self.documents = []
+        for _, docs in self.iter_extract_files(
+            [file_name], workers=workers, timeout=timeout, memory_limit_mb=memory_limit_mb
+        ):
+            self.documents = docs
             logger.info(f"Loaded {len(self.documents)} documents")
-        except Exception as e:
-            logger.error(f"Error loading file: {e}")
 
         return self.documents
 
-    def load_directory(self, directory: str, glob_pattern: str) -> list[Document]:
-        try:
-            loader = DirectoryLoader(directory, glob_pattern)
-            self.documents = loader.load()
-            logger.info(f"Loaded {len(self.documents)} documents")
-        except Exception as e:
-            logger.error(f"Error loading directory: {e}")
+    def load_directory(
+        self,
+        directory: str,
+        glob_pattern: str,
+        incremental: bool = False,
+        workers: int | None = None,
+        timeout: float | None = 300,
+        memory_limit_mb: int | None = None,
+    ) -> list[Document]:
+        """
+        Loads every file matching glob_pattern under directory with unstructured.
+
+        Args:
+            directory (str): The directory to load.
+            glob_pattern (str): The glob pattern relative to the directory, e.g. "**/*.pdf".
+            incremental (bool): Consult the file manifest and only load files added or modified
+                since the last incremental run. The added, modified and deleted files are exposed
+                as manifest_diff, and the IDs of the documents previously loaded from modified and
+                deleted files as stale_ids, so callers can drop them from their stores. Default is
+                False.
+            workers (int | None): Extract files in this many isolated worker processes, see
+                iter_extract_files. If None and incremental is False, langchain's DirectoryLoader
+                is used in-process. Default is None.
+            timeout (float | None): Per-file timeout in seconds for worker processes. Default is 300.
+            memory_limit_mb (int | None): Per-file memory cap for worker processes, in MiB.
+
+        Returns:
+            List[Document]: The loaded documents. Documents loaded through the manifest or worker
+            processes carry a stable "id" in their metadata, see document_id.
+        """
+        self.manifest_diff = None
+        self.stale_ids = []
+        if not incremental and workers is None:
+            try:
+                loader = DirectoryLoader(directory, glob_pattern)
+                self.documents = loader.load()
+                logger.info(f"Loaded {len(self.documents)} documents")
+            except Exception as e:
+                logger.error(f"Error loading directory: {e}")
 
+            return self.documents
+
+        manifest_name = f"file_loader:{self.loader_type or 'unstructured'}"
+        file_paths = [path for path in Path(directory).glob(glob_pattern) if path.is_file()]
+        if incremental:
+            diff = self.manifest.diff(manifest_name, file_paths, root=directory)
+            self.manifest_diff = diff
+            self.stale_ids = self.manifest.target_ids(manifest_name, diff.modified + diff.deleted)
+            self.manifest.forget(manifest_name, diff.deleted)
+            file_paths = diff.changed
+
+        self.documents = []
+        loaded_files = {}
+        for file_path, docs in self.iter_extract_files(
+            file_paths, workers=workers, timeout=timeout, memory_limit_mb=memory_limit_mb
+        ):
+            for index, doc in enumerate(docs):
+                doc.metadata.setdefault("id", document_id(file_path, index, doc.page_content))
+            self.documents.extend(docs)
+            loaded_files[file_path] = [doc.metadata["id"] for doc in docs]
+
+        if incremental:
+            self.manifest.record(manifest_name, loaded_files)
+
+        logger.info(f"Loaded {len(self.documents)} documents from {len(loaded_files)} files")
         return self.documents
 
+    def iter_extract_files(
+        self,
+        file_paths: Iterable[str | Path],
+        workers: int | None = None,
+        timeout: float | None = 300,
+        memory_limit_mb: int | None = None,
+    ) -> Iterator[tuple[Path, list[Document]]]:
+        """
+        Extracts files with unstructured and streams back the documents of each file as soon as
+        it is done. With a cache, files whose content is already cached are yielded first without
+        being extracted.
+
+        With workers set, every file is extracted in its own worker process, at most `workers` at
+        a time. A file that hangs past `timeout`, exceeds `memory_limit_mb` or crashes the
+        interpreter is logged and skipped without affecting the others.
+
+        Args:
+            file_paths (Iterable[str | Path]): The files to extract.
+            workers (int | None): Number of concurrent worker processes. If None, files are
+                extracted one by one in this process (no timeouts or memory caps).
+            timeout (float | None): Per-file timeout in seconds. Default is 300.
+            memory_limit_mb (int | None): Per-file memory cap in MiB (POSIX only).
+
+        Yields:
+            tuple[Path, list[Document]]: Each successfully extracted file and its documents, in
+            completion order.
+        """
+        cache_keys = {}
+        if self.cache is not None:
+            pending = []
+            for file_path in file_paths:
+                try:
+                    key = self._cache_key(file_path)
+                except OSError as e:
+                    logger.error(f"Error reading file {file_path}: {e}. Skipping.")
+                    continue
+                docs = self._get_cached(key, file_path)
+                if docs is not None:
+                    yield Path(file_path), docs
+                else:
+                    cache_keys[str(file_path)] = key
+                    pending.append(file_path)
+            logger.debug(f"{len(cache_keys)} files not found in the extraction cache")
+            file_paths = pending
+
+        if workers is None:
+            for file_path in file_paths:
+                try:
+                    docs = _extract_with_unstructured(str(file_path))
+                except Exception as e:
+                    logger.error(f"Error loading file {file_path}: {e}. Continuing to next file.")
+                    continue
+                if str(file_path) in cache_keys:
+                    self._put_cached(cache_keys[str(file_path)], docs)
+                yield Path(file_path), docs
+            return
+
+        for outcome in imap_isolated(
+            _extract_with_unstructured,
+            (str(file_path) for file_path in file_paths),
+            max_workers=workers,
+            timeout=timeout,
+            memory_limit_mb=memory_limit_mb,
+        ):
+            if outcome.ok:
+                if outcome.item in cache_keys:
+                    self._put_cached(cache_keys[outcome.item], outcome.result)
+                yield Path(outcome.item), outcome.result
+            else:
+                logger.error(f"Error loading file {outcome.item}: {outcome.error}. Skipping.")
+
     def load_obsidian_vault(self, directory: str) -> list[Document]:
         try:
             loader = ObsidianLoader(directory)
@@ -45,12 +273,93 @@ class FileLoader:
 
         return self.documents
 
+    def _compile_patterns(self, patterns: list[str], prefix: str = "") -> re.Pattern | None:
+        """
+        Compiles a list of glob patterns into a single regular expression, so every path is tested
+        once instead of once per pattern.
+        """
+        if not patterns:
+            return None
+        flags = re.IGNORECASE if os.name == "nt" else 0
+        return re.compile("|".join(fnmatch.translate(f"{prefix}{p}") for p in patterns), flags)
+
+    def iter_directory_recursive(
+        self,
+        directory: str | Path,
+        glob_patterns: list[str] | str,
+        exclude_patterns: list[str] | None = None,
+        limit: int | None = None,
+    ) -> Iterator[Path]:
+        """
+        Lazily walks a directory tree in a single os.scandir pass, yielding matching files.
+
+        Directories whose name (or relative path) matches an exclude pattern are pruned before
+        descending, so folders such as ".git" or "deprecated" are never listed.
+
+        Args:
+            directory (str or Path): The root directory to search for files.
+            glob_patterns (List[str] or str): Filename patterns to include. Each pattern is matched
+                as "*<pattern>", so both ".kql" and "*.yml" work.
+            exclude_patterns (List[str], optional): Glob patterns matched against file and folder
+                names, and against paths relative to the root for patterns containing "/".
+            limit (int, optional): Stop walking once this many files have been yielded.
+
+        Yields:
+            Path: Every matching file, in the order it is found.
+        """
+        if isinstance(glob_patterns, str):
+            glob_patterns = [glob_patterns]
+
+        include = self._compile_patterns([p.lstrip("*") for p in glob_patterns], prefix="*")
+        exclude_name = self._compile_patterns([p for p in exclude_patterns or [] if "/" not in p])
+        exclude_path = self._compile_patterns([p for p in exclude_patterns or [] if "/" in p])
+
+        def is_excluded(name: str, relative_path: str) -> bool:
+            if exclude_name is not None and exclude_name.match(name):
+                return True
+            return exclude_path is not None and bool(exclude_path.match(relative_path))
+
+        root = Path(directory)
+        found = 0
+        stack = [(str(root), "")]
+
+        while stack:
+            current, relative = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    subdirectories = []
+                    for entry in entries:
+                        relative_path = f"{relative}{entry.name}"
+                        if is_excluded(entry.name, relative_path):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirectories.append((entry.path, f"{relative_path}/"))
+                                continue
+                            if not entry.is_file():
+                                continue
+                        except OSError:
+                            continue
+
+                        if include is None or include.match(entry.name):
+                            yield Path(entry.path)
+                            found += 1
+                            if limit is not None and found >= limit:
+                                return
+            except OSError as e:
+                logger.warning(f"Could not list directory '{current}': {e}")
+                continue
+
+            # Reverse so that directories are visited in the order scandir returned them
+            stack.extend(reversed(subdirectories))
+
     def list_directory_recursive(
         self,
         directory: str | Path,
-        glob_patterns: list[str],
+        glob_patterns: list[str] | str,
         exclude_patterns: list[str] | None = None,
         sample_only: bool = False,
+        limit: int | None = None,
     ) -> list[Path]:
         """
         Recursively lists all files matching a glob pattern within a directory, excluding files and directories
@@ -58,33 +367,21 @@ class FileLoader:
 
         Args:
             directory (str or Path): The root directory to search for files.
-            glob_pattern (str): The glob pattern to match filenames against (e.g., "*.txt", "**/*.pdf").
+            glob_patterns (List[str] or str): The patterns to match filenames against (e.g., ".kql", "*.pdf").
             exclude_patterns (List[str], optional): A list of glob patterns to exclude files and directories from the search.
+            sample_only (bool, optional): Only return the first 5 matching files.
+            limit (int, optional): Only return the first `limit` matching files.
 
         Returns:
             List[Path]: A list containing the Path objects of all files matching the glob pattern
                         within the specified directory and its subdirectories.
         """
-        if exclude_patterns is None:
-            exclude_patterns = []
-
         if sample_only:
             logger.debug("Sampling 5 files for testing purposes")
-            counter = 0
-
-        directory = Path(directory)  # Ensure directory is a Path object
-        all_files = []
-
-        for glob_pattern in glob_patterns:
-            _glob_pattern = f"**/*{glob_pattern}"  # Convert to a proper n-depth glob
-            for path in directory.rglob(_glob_pattern):
-                if path.is_file() and not any(path.match(pattern) for pattern in exclude_patterns):
-                    all_files.append(path)
-                    if sample_only:
-                        counter += 1
-                        if counter == 5:
-                            break
-
-        all_files = list(set(all_files))  # Remove duplicates
+            limit = 5 if limit is None else min(limit, 5)
+
+        all_files = list(
+            self.iter_directory_recursive(directory, glob_patterns, exclude_patterns, limit=limit)
+        )
         logger.info(f"Found {len(all_files)} files matching the glob pattern(s)")
         return all_files
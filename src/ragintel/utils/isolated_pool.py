@@ -0,0 +1,136 @@
+import multiprocessing
+import os
+import time
+from collections.abc import Callable, Iterable, Iterator
+from multiprocessing.connection import Connection, wait
+from typing import Any, NamedTuple
+
+from loguru import logger
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module, memory caps are skipped there
+    resource = None
+
+
+class IsolatedResult(NamedTuple):
+    item: Any
+    result: Any = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _isolated_worker(
+    func: Callable[[Any], Any], item: Any, conn: Connection, memory_limit_mb: int | None
+) -> None:
+    if memory_limit_mb and resource is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    try:
+        conn.send((True, func(item)))
+    except BaseException as e:
+        conn.send((False, f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def imap_isolated(
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: int | None = None,
+    timeout: float | None = None,
+    memory_limit_mb: int | None = None,
+) -> Iterator[IsolatedResult]:
+    """
+    Runs func over items, each call in its own short-lived process, and yields results as they
+    finish (not in input order).
+
+    Unlike a ProcessPoolExecutor, a call that hangs is killed once it exceeds its timeout, a call
+    that crashes its interpreter (segfault, OOM kill) only loses that item, and neither of them
+    takes the rest of the run down with it.
+
+    Args:
+        func (Callable): A picklable, module-level function taking one item.
+        items (Iterable): The items to process. Consumed lazily.
+        max_workers (int | None): Maximum number of concurrent processes. Defaults to the CPU count.
+        timeout (float | None): Seconds after which a call is killed. None means no limit.
+        memory_limit_mb (int | None): Address-space cap for each process, in MiB (POSIX only).
+
+    Yields:
+        IsolatedResult: The item together with func's result, or with an error message.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    ctx = multiprocessing.get_context()
+    pending = iter(items)
+    exhausted = False
+    running: dict[Connection, tuple[multiprocessing.Process, Any, float | None]] = {}
+
+    def finish(conn: Connection) -> None:
+        process, _, _ = running.pop(conn)
+        conn.close()
+        process.join(timeout=1)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    try:
+        while running or not exhausted:
+            # Keep max_workers processes busy for as long as there are items left
+            while not exhausted and len(running) < max_workers:
+                try:
+                    item = next(pending)
+                except StopIteration:
+                    exhausted = True
+                    break
+                reader, writer = ctx.Pipe(duplex=False)
+                process = ctx.Process(
+                    target=_isolated_worker,
+                    args=(func, item, writer, memory_limit_mb),
+                    daemon=True,
+                )
+                process.start()
+                # Close our copy of the write end so that a child dying without answering shows up
+                # as EOF on the reader instead of blocking forever
+                writer.close()
+                deadline = time.monotonic() + timeout if timeout is not None else None
+                running[reader] = (process, item, deadline)
+
+            if not running:
+                break
+
+            deadlines = [deadline for _, _, deadline in running.values() if deadline is not None]
+            wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+
+            for conn in wait(list(running), timeout=wait_for):
+                process, item, _ = running[conn]
+                try:
+                    succeeded, payload = conn.recv()
+                except (EOFError, OSError):
+                    process.join(timeout=1)
+                    error = f"Worker crashed with exit code {process.exitcode}"
+                    finish(conn)
+                    yield IsolatedResult(item, error=error)
+                    continue
+
+                finish(conn)
+                if succeeded:
+                    yield IsolatedResult(item, result=payload)
+                else:
+                    yield IsolatedResult(item, error=payload)
+
+            now = time.monotonic()
+            for conn, (process, item, deadline) in list(running.items()):
+                if deadline is not None and now >= deadline:
+                    logger.warning(f"Killing worker for {item} after {timeout} seconds")
+                    process.kill()
+                    finish(conn)
+                    yield IsolatedResult(item, error=f"Timed out after {timeout} seconds")
+    finally:
+        # Kill whatever is still running if the consumer stops iterating early
+        for conn, (process, _, _) in list(running.items()):
+            process.kill()
+            finish(conn)
@@ -0,0 +1,73 @@
+import io
+import os
+
+import pytest
+from langchain.docstore.document import Document
+from loguru import logger
+
+from ragintel.tools.loaders.html import HTMLLoader
+from ragintel.tools.loaders.multi import ExtractorRegistry, MultiLoader
+from ragintel.utils.base import ExtractionCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExtractionCache(cache_dir=tmp_path / "cache")
+
+
+def test_key_depends_on_content_and_extractor(cache):
+    key = cache.key(b"<p>report</p>", "html2text:1")
+    assert key == cache.key(b"<p>report</p>", "html2text:1")
+    assert key != cache.key(b"<p>report!</p>", "html2text:1")
+    assert key != cache.key(b"<p>report</p>", "html2text:2")
+
+
+def test_get_or_extract_only_extracts_once(cache):
+    calls = []
+
+    def extract():
+        calls.append(1)
+        return "extracted text"
+
+    assert cache.get_or_extract(b"data", "test:1", extract) == "extracted text"
+    assert cache.get_or_extract(b"data", "test:1", extract) == "extracted text"
+    assert len(calls) == 1
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = ExtractionCache(cache_dir=tmp_path / "cache", max_bytes=2000)
+    keys = [cache.key(str(i).encode(), "test:1") for i in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, os.urandom(500).hex())
+        os.utime(cache._path(key), (age, age))
+
+    # Reading the oldest entry makes it the most recently used one
+    assert cache.get(keys[0]) is not None
+    cache.put(cache.key(b"new", "test:1"), os.urandom(500).hex())
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+
+
+def test_multi_loader_skips_cached_extraction(cache):
+    calls = []
+
+    def extractor(content):
+        calls.append(1)
+        return content.read().decode()
+
+    loader = MultiLoader(registry=ExtractorRegistry({"text/plain": extractor}), cache=cache)
+    for _ in range(2):
+        text = loader.parse_text_from_file("notes.txt", io.BytesIO(b"threat notes"))
+        assert text == "threat notes"
+    assert len(calls) == 1
+
+
+def test_html_loader_reuses_cached_text(cache):
+    docs = [Document(page_content="<html><body><p>Test</p></body></html>")]
+    first = HTMLLoader(cache=cache).convert_html_to_text(docs, parser="ragintel.html2text")
+    second = HTMLLoader(cache=cache).convert_html_to_text(docs, parser="ragintel.html2text")
+    assert first[0].page_content == second[0].page_content
+    assert cache.hits == 1
@@ -0,0 +1,88 @@
+from pathlib import Path
+
+import pytest
+from langchain.docstore.document import Document
+from loguru import logger
+
+from ragintel.utils.base import FileManifest
+from ragintel.utils.file_loader import FileLoader
+
+
+@pytest.fixture
+def rules_tree(tmp_path):
+    for relative in [
+        "rules/windows/proc.yml",
+        "rules/linux/auditd.yml",
+        "deprecated/old.yml",
+        ".git/objects/pack.yml",
+        "README.md",
+        "rules/README.md",
+        "rules/hunt.md",
+    ]:
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("title: test")
+    return tmp_path
+
+
+def test_list_directory_prunes_excluded_folders(rules_tree):
+    files = FileLoader().list_directory_recursive(
+        rules_tree, "*.yml", exclude_patterns=[".git", "deprecated"]
+    )
+    assert sorted(p.relative_to(rules_tree).as_posix() for p in files) == [
+        "rules/linux/auditd.yml",
+        "rules/windows/proc.yml",
+    ]
+
+
+def test_list_directory_excludes_file_names(rules_tree):
+    files = FileLoader().list_directory_recursive(
+        rules_tree, [".md"], exclude_patterns=["README.md"]
+    )
+    assert [p.name for p in files] == ["hunt.md"]
+
+
+def test_list_directory_limit(rules_tree):
+    files = FileLoader().list_directory_recursive(rules_tree, [".yml", ".md"], limit=2)
+    assert len(files) == 2
+    assert all(isinstance(p, Path) for p in files)
+
+
+def test_list_directory_sample_only(rules_tree):
+    files = FileLoader().list_directory_recursive(rules_tree, [".yml", ".md"], sample_only=True)
+    assert len(files) == 5
+
+
+def fake_extract(file_name):
+    text = Path(file_name).read_text()
+    return [
+        Document(page_content=line, metadata={"source": file_name}) for line in text.split("\n")
+    ]
+
+
+def test_incremental_load_records_document_ids_and_reports_diff(tmp_path, monkeypatch):
+    monkeypatch.setattr("ragintel.utils.file_loader._extract_with_unstructured", fake_extract)
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    (docs_dir / "a.txt").write_text("alpha\nbeta")
+    (docs_dir / "b.txt").write_text("gamma")
+    loader = FileLoader(manifest=FileManifest(tmp_path / "manifest.sqlite"))
+
+    docs = loader.load_directory(str(docs_dir), "*.txt", incremental=True)
+    ids = {doc.page_content: doc.metadata["id"] for doc in docs}
+    assert sorted(ids) == ["alpha", "beta", "gamma"]
+    assert len(set(ids.values())) == 3
+    assert loader.stale_ids == []
+
+    (docs_dir / "a.txt").write_text("alpha\nbeta, edited")
+    (docs_dir / "b.txt").unlink()
+    (docs_dir / "c.txt").write_text("delta")
+    docs = loader.load_directory(str(docs_dir), "*.txt", incremental=True)
+
+    logger.info(f"Manifest diff: {loader.manifest_diff}")
+    assert [path.name for path in loader.manifest_diff.added] == ["c.txt"]
+    assert [path.name for path in loader.manifest_diff.modified] == ["a.txt"]
+    assert [path.name for path in loader.manifest_diff.deleted] == ["b.txt"]
+    assert sorted(loader.stale_ids) == sorted(ids.values())
+    # An unchanged document keeps its ID across loads
+    assert {doc.page_content: doc.metadata["id"] for doc in docs}["alpha"] == ids["alpha"]
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+from loguru import logger
+
+from ragintel.utils.base import FileManifest
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return FileManifest(db_path=tmp_path / "manifest.sqlite")
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    source = tmp_path / "rules"
+    source.mkdir()
+    for name in ["a.yml", "b.yml", "c.yml"]:
+        (source / name).write_text(f"title: {name}")
+    return source
+
+
+def test_first_run_reports_everything_added(manifest, source_dir):
+    files = sorted(source_dir.iterdir())
+    diff = manifest.diff("sigma", files, root=source_dir)
+    assert diff.added == files
+    assert not diff.modified
+    assert not diff.deleted
+
+
+def test_changes_after_record(manifest, source_dir):
+    files = sorted(source_dir.iterdir())
+    manifest.record("sigma", {path: [path.stem] for path in files})
+
+    (source_dir / "a.yml").write_text("title: changed a")
+    (source_dir / "c.yml").unlink()
+    (source_dir / "d.yml").write_text("title: d")
+
+    diff = manifest.diff("sigma", sorted(source_dir.iterdir()), root=source_dir)
+    assert [p.name for p in diff.added] == ["d.yml"]
+    assert [p.name for p in diff.modified] == ["a.yml"]
+    assert [p.name for p in diff.deleted] == ["c.yml"]
+    assert [p.name for p in diff.unchanged] == ["b.yml"]
+    assert manifest.target_ids("sigma", diff.modified + diff.deleted) == ["a", "c"]
+
+
+def test_touch_without_content_change_is_unchanged(manifest, source_dir):
+    files = sorted(source_dir.iterdir())
+    manifest.record("sigma", {path: [] for path in files})
+
+    stat = files[0].stat()
+    os.utime(files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000_000))
+
+    diff = manifest.diff("sigma", files, root=source_dir)
+    assert not diff.has_changes
+    assert len(diff.unchanged) == 3
+
+
+def test_loaders_are_isolated(manifest, source_dir):
+    files = sorted(source_dir.iterdir())
+    manifest.record("sigma", {path: [] for path in files})
+    diff = manifest.diff("kql:repo", files, root=source_dir)
+    assert diff.added == files
@@ -1,10 +1,16 @@
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import MagicMock, patch
 
+import httpx
 import pytest
 from langchain.docstore.document import Document
 from loguru import logger
 
 from ragintel.tools.loaders.html import HTMLLoader
+from ragintel.tools.loaders.html.fetch_archive import FetchArchive
+from ragintel.tools.loaders.html.fetcher import AsyncHTMLFetcher, FetchResult
 
 
 @pytest.fixture
@@ -35,30 +41,108 @@ def test_convert_html_to_text_langchain(processor):
     assert result[0].metadata["parser"] == "langchain.html_parser"
 
 
-def test_load_html_ragintel(processor):
-    url = "http://example.com"
-    mock_response = MagicMock()
-    mock_response.text = "<html><body>Test</body></html>"
-    with patch("requests.get", return_value=mock_response):
-        result = processor.load_html(url, loader_type="ragintel.simple_html")
+def test_load_html_ragintel():
+    def handler(request):
+        return httpx.Response(200, text=f"<html><body>{request.url.path}</body></html>")
+
+    processor = HTMLLoader(fetcher=AsyncHTMLFetcher(transport=httpx.MockTransport(handler)))
+    result = processor.load_html("http://example.com/a", loader_type="ragintel.simple_html")
     assert len(result) == 1
-    assert result[0].page_content == "<html><body>Test</body></html>"
+    assert result[0].page_content == "<html><body>/a</body></html>"
     assert result[0].metadata["source"] == "ragintel.simple_html"
 
+    # Documents are returned per call instead of accumulating across calls
+    urls = [f"http://example.com/{i}" for i in range(20)]
+    result = processor.load_html(urls, loader_type="ragintel.simple_html")
+    assert sorted(doc.metadata["url"] for doc in result) == sorted(urls)
+    processor.close()
 
-def test_load_html_langchain_async(processor):
-    """
-    For this unit test, we need to download playwright browsers: playwright install.
-    """
-    url = "http://example.com"
-    mock_loader = MagicMock()
-    mock_loader.load.return_value = [Document(page_content="Test")]
-    with patch(
-        "langchain_community.document_loaders.AsyncChromiumLoader", return_value=mock_loader
-    ):
-        result = processor.load_html(url, loader_type="langchain.async_html")
+
+def test_load_html_ragintel_retries_and_revalidates():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            return httpx.Response(503)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text="<p>report</p>", headers={"ETag": '"v1"'})
+
+    fetcher = AsyncHTMLFetcher(transport=httpx.MockTransport(handler), backoff=0)
+    processor = HTMLLoader(fetcher=fetcher)
+    first = list(processor.iter_html("http://example.com/report"))
+    second = list(processor.iter_html("http://example.com/report"))
+    processor.close()
+
+    assert len(calls) == 3
+    assert first[0].page_content == second[0].page_content == "<p>report</p>"
+    assert second[0].metadata["not_modified"]
+
+
+def test_load_html_ragintel_skips_failed_urls():
+    def handler(request):
+        return httpx.Response(404 if request.url.path == "/missing" else 200, text="ok")
+
+    processor = HTMLLoader(fetcher=AsyncHTMLFetcher(transport=httpx.MockTransport(handler)))
+    result = processor.load_html(
+        ["http://example.com/missing", "http://example.com/found"],
+        loader_type="ragintel.simple_html",
+    )
+    processor.close()
+    assert [doc.metadata["url"] for doc in result] == ["http://example.com/found"]
+
+
+def test_load_html_langchain_async():
+    class FakeBrowserPool:
+        async def iter_render(self, urls, wait_for_selector=None):
+            for url in urls:
+                yield FetchResult(url, 200, "Test")
+
+        async def aclose(self):
+            pass
+
+    processor = HTMLLoader(browser_pool=FakeBrowserPool())
+    result = processor.load_html("http://example.com", loader_type="langchain.async_html")
+    processor.close()
     assert len(result) == 1
     assert result[0].page_content == "Test"
+    assert result[0].metadata["source"] == "http://example.com"
+
+
+@pytest.fixture
+def static_site(tmp_path):
+    (tmp_path / "report.html").write_text(
+        "<html><body><script>"
+        "setTimeout(() => { const a = document.createElement('article');"
+        " a.textContent = 'Rendered report'; document.body.appendChild(a); }, 200);"
+        "</script><img src='missing.png'></body></html>"
+    )
+    handler = partial(SimpleHTTPRequestHandler, directory=str(tmp_path))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_browser_pool_renders_javascript(static_site):
+    """
+    Needs the playwright browsers: playwright install chromium.
+    """
+    pytest.importorskip("playwright")
+    from ragintel.tools.loaders.html.browser_pool import BrowserPool
+
+    processor = HTMLLoader(browser_pool=BrowserPool(max_pages=2, num_contexts=1))
+    try:
+        docs = list(processor.iter_rendered_html(f"{static_site}/report.html", "article"))
+    except Exception as e:
+        processor.close()
+        pytest.skip(f"Chromium is not available: {e}")
+    processor.close()
+
+    assert len(docs) == 1
+    assert "Rendered report" in docs[0].page_content
 
 
 def test_load_html_langchain_web_based(processor):
@@ -69,3 +153,97 @@ def test_load_html_langchain_web_based(processor):
         result = processor.load_html(url, loader_type="langchain.web_based_loader")
     assert len(result) == 1
     assert result[0].page_content == "Test"
+
+
+REPORT_HTML = """<html><body class="no-sidebar">
+<nav><a href="/">Home</a><a href="/blog">Blog</a></nav>
+<div class="social-share">Share on X</div>
+<article><header><h1>APT99 targets energy</h1></header>
+<p>The actor used a new loader called FOOBAR.</p><!-- tracking pixel -->
+<div class="post-iocs"><p>evil.example.com</p></div>
+<div class="comments">Great post!</div></article>
+<footer>Copyright</footer><script>var tracking = 1;</script></body></html>"""
+
+
+def test_load_html_with_filter_strips_boilerplate(processor):
+    docs = [Document(page_content=REPORT_HTML, metadata={"source": "ragintel.simple_html"})]
+    result = processor.load_html_with_filter(docs=docs)
+    assert len(result) == 1
+    text = result[0].page_content
+    assert "APT99 targets energy" in text
+    assert "FOOBAR" in text
+    for boilerplate in ["Home", "Share on X", "Great post", "Copyright", "tracking"]:
+        assert boilerplate not in text
+    assert result[0].metadata["parser"] == "ragintel.html_filter"
+
+
+def test_load_html_with_filter_ignores_comments_before_html(processor):
+    saved_page = f"<!DOCTYPE html><!-- saved from url=(0024)https://example.com/ -->{REPORT_HTML}"
+    docs = [Document(page_content=saved_page), Document(page_content=REPORT_HTML)]
+    result = processor.load_html_with_filter(docs=docs)
+    assert len(result) == 2
+    assert result[0].page_content == result[1].page_content
+    assert "FOOBAR" in result[0].page_content
+    assert "saved from" not in result[0].page_content
+
+
+def test_load_html_with_filter_selectors_in_process_pool(processor):
+    docs = [Document(page_content=REPORT_HTML) for _ in range(10)]
+    result = processor.load_html_with_filter(["h1", "div.post-iocs"], docs=docs, workers=2)
+    assert len(result) == 10
+    assert all(doc.page_content == "# APT99 targets energy\n\nevil.example.com" for doc in result)
+
+
+def test_fetch_archive_replays_offline(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, text=f"<p>{request.url.path}</p>", headers={"ETag": '"v1"'})
+
+    archive = FetchArchive(db_path=tmp_path / "archive.sqlite", ttl=0)
+    processor = HTMLLoader(fetcher=AsyncHTMLFetcher(transport=httpx.MockTransport(handler)))
+    processor.fetcher.archive = archive
+    processor.load_html(["http://example.com/a", "http://example.com/b"])
+    processor.close()
+    assert archive.get("http://example.com/a").text == "<p>/a</p>"
+
+    def offline(request):
+        msg = f"replay mode must not fetch {request.url}"
+        raise AssertionError(msg)
+
+    replay_archive = FetchArchive(db_path=tmp_path / "archive.sqlite", replay=True)
+    fetcher = AsyncHTMLFetcher(transport=httpx.MockTransport(offline))
+    processor = HTMLLoader(fetcher=fetcher, archive=replay_archive)
+    result = processor.load_html(["http://example.com/a", "http://example.com/missing"])
+    processor.close()
+
+    assert [doc.page_content for doc in result] == ["<p>/a</p>"]
+    assert result[0].metadata["from_archive"]
+    assert len(calls) == 2
+
+
+def test_fetch_archive_ttl_policy(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text="<p>report</p>", headers={"ETag": '"v1"'})
+
+    archive = FetchArchive(db_path=tmp_path / "archive.sqlite", ttl=3600)
+    fetcher = AsyncHTMLFetcher(transport=httpx.MockTransport(handler), validator_cache_size=0)
+    processor = HTMLLoader(fetcher=fetcher, archive=archive)
+    processor.load_html("http://example.com/report")
+    # Within the TTL the archived copy is served without a request
+    processor.load_html("http://example.com/report")
+    assert calls == [None]
+
+    # Once expired, the archived ETag is used to revalidate
+    archive.ttl = 0
+    result = processor.load_html("http://example.com/report")
+    processor.close()
+    assert calls == [None, '"v1"']
+    assert result[0].page_content == "<p>report</p>"
+    assert result[0].metadata["not_modified"]
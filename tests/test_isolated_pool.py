@@ -0,0 +1,36 @@
+import os
+import time
+
+from loguru import logger
+
+from ragintel.utils.isolated_pool import imap_isolated
+
+
+def _work(item):
+    if item == "hang":
+        time.sleep(30)
+    if item == "crash":
+        os._exit(3)
+    if item == "raise":
+        msg = "bad input"
+        raise ValueError(msg)
+    return item.upper()
+
+
+def test_results_are_isolated():
+    items = ["a", "hang", "crash", "raise", "b"]
+    outcomes = {o.item: o for o in imap_isolated(_work, items, max_workers=2, timeout=1)}
+
+    assert outcomes["a"].result == "A"
+    assert outcomes["b"].result == "B"
+    assert "Timed out" in outcomes["hang"].error
+    assert "exit code 3" in outcomes["crash"].error
+    assert outcomes["raise"].error == "ValueError: bad input"
+
+
+def test_early_exit_stops_workers():
+    outcomes = imap_isolated(_work, ["a", "hang", "hang"], max_workers=3, timeout=30)
+    start = time.monotonic()
+    assert next(outcomes).result == "A"
+    outcomes.close()
+    assert time.monotonic() - start < 10
@@ -0,0 +1,220 @@
+import threading
+
+import pytest
+from loguru import logger
+from pydantic import BaseModel
+
+from ragintel.tools.archivers.kuzudb import KuzuOps
+
+CREATE_ITEM = "CREATE (:Item {id: $id, rank: $rank})"
+
+
+@pytest.fixture
+def ops(tmp_path):
+    ops = KuzuOps(tmp_path / "kuzu", pool_size=2, statement_cache_size=2)
+    ops.execute("CREATE NODE TABLE Item(id STRING, rank INT64, PRIMARY KEY (id))")
+    yield ops
+    ops.close()
+
+
+def item_ids(ops):
+    return [row[0] for row in ops.execute("MATCH (n:Item) RETURN n.id ORDER BY n.id")]
+
+
+def test_execute_returns_rows(ops):
+    assert ops.execute(CREATE_ITEM, {"id": "a", "rank": 1}) == []
+    assert ops.execute("MATCH (n:Item) RETURN n.id, n.rank") == [["a", 1]]
+
+
+def test_database_is_shared_and_read_only_mismatch_raises(ops):
+    other = KuzuOps(ops.db_path)
+    assert other.db is ops.db
+    with pytest.raises(ValueError, match="read_only"):
+        KuzuOps(ops.db_path, read_only=True)
+
+
+def test_pool_never_exceeds_pool_size(ops):
+    borrowed = []
+
+    def borrow():
+        with ops.connection() as pooled:
+            borrowed.append(pooled)
+
+    with ops.connection() as first, ops.connection() as second:
+        waiter = threading.Thread(target=borrow)
+        waiter.start()
+        waiter.join(timeout=0.5)
+        # Both connections are out, so the third borrower has to wait for one to come back
+        assert waiter.is_alive()
+
+    waiter.join(timeout=5)
+    logger.info(f"Pool created {ops._created} connections")
+    assert ops._created == 2
+    assert borrowed[0] in (first, second)
+
+
+def test_prepared_statements_are_reused_per_connection(ops):
+    with ops.connection() as pooled:
+        statement = pooled.prepare(CREATE_ITEM)
+        assert pooled.prepare(CREATE_ITEM) is statement
+
+        # The cache keeps the statement_cache_size most recently used statements
+        pooled.prepare("MATCH (n:Item) RETURN n.id")
+        pooled.prepare(CREATE_ITEM)
+        pooled.prepare("MATCH (n:Item) RETURN n.rank")
+        assert list(pooled.statements) == [CREATE_ITEM, "MATCH (n:Item) RETURN n.rank"]
+
+        pooled.execute(CREATE_ITEM, {"id": "a", "rank": 1})
+        assert pooled.prepare(CREATE_ITEM) is statement
+
+
+def create_items(ops, *item_ids, abort=False):
+    with ops.transaction() as pooled:
+        for rank, item_id in enumerate(item_ids):
+            pooled.execute(CREATE_ITEM, {"id": item_id, "rank": rank})
+        if abort:
+            msg = "abort"
+            raise ValueError(msg)
+
+
+def test_transaction_commits_or_rolls_back(ops):
+    create_items(ops, "a", "b")
+    assert item_ids(ops) == ["a", "b"]
+
+    with pytest.raises(ValueError, match="abort"):
+        create_items(ops, "c", abort=True)
+    assert item_ids(ops) == ["a", "b"]
+
+    # A failing statement makes Kuzu roll back the transaction on its own
+    with pytest.raises(RuntimeError):
+        create_items(ops, "d", "a")
+    assert item_ids(ops) == ["a", "b"]
+
+    # The write lock and the connection were released either way
+    assert ops.execute(CREATE_ITEM, {"id": "e", "rank": 6}) == []
+
+
+def test_execute_writes_wait_for_running_transaction(ops):
+    create_items(ops, "a")
+    writer = threading.Thread(target=ops.execute, args=(CREATE_ITEM, {"id": "b", "rank": 2}))
+
+    with ops.transaction() as pooled:
+        pooled.execute(CREATE_ITEM, {"id": "c", "rank": 3})
+        writer.start()
+        writer.join(timeout=0.5)
+        # The auto-commit write waits for the transaction, a read does not
+        assert writer.is_alive()
+        assert ops.execute("MATCH (n:Item) RETURN n.id") == [["a"]]
+
+    writer.join(timeout=5)
+    assert not writer.is_alive()
+    assert item_ids(ops) == ["a", "b", "c"]
+
+
+def test_write_batch_replays_failed_batch_row_by_row(ops):
+    ops.execute(CREATE_ITEM, {"id": "b", "rank": 0})
+    rows = [{"id": item_id, "rank": rank} for rank, item_id in enumerate("abcdef")]
+
+    # The batch holding the existing "b" fails as a whole and is replayed row by row, the other
+    # batch is committed in one transaction
+    written = ops.write_batch(CREATE_ITEM, rows, batch_size=3)
+    assert written == 5
+    assert item_ids(ops) == ["a", "b", "c", "d", "e", "f"]
+    assert ops.execute("MATCH (n:Item {id: 'b'}) RETURN n.rank") == [[0]]
+
+
+@pytest.fixture
+def ranked_ops(ops):
+    ops.write_batch(CREATE_ITEM, ({"id": f"item-{rank:02d}", "rank": rank} for rank in range(25)))
+    return ops
+
+
+def test_query_yields_arrow_or_pandas_pages(ranked_ops):
+    query = "MATCH (n:Item) WHERE n.rank >= $min_rank RETURN n.id AS id, n.rank AS rank"
+    pages = list(ranked_ops.query(query, {"min_rank": 5}, page_size=8))
+    assert [page.num_rows for page in pages] == [8, 8, 4]
+    assert pages[0].schema.names == ["id", "rank"]
+    assert sorted(rank for page in pages for rank in page.column("rank").to_pylist()) == list(
+        range(5, 25)
+    )
+
+    frames = list(ranked_ops.query(query, {"min_rank": 20}, output="pandas"))
+    assert sorted(frames[0]["rank"]) == [20, 21, 22, 23, 24]
+
+
+def test_paginate_pages_through_ordered_query(ranked_ops):
+    pages = list(
+        ranked_ops.paginate(
+            "MATCH (n:Item) RETURN n.id AS id, n.rank AS rank ORDER BY n.rank;", page_size=10
+        )
+    )
+    assert [page.num_rows for page in pages] == [10, 10, 5]
+    assert [rank for page in pages for rank in page.column("rank").to_pylist()] == list(range(25))
+
+    frames = list(
+        ranked_ops.paginate(
+            "MATCH (n:Item) WHERE n.rank < $max_rank RETURN n.rank AS rank ORDER BY n.rank",
+            {"max_rank": 10},
+            page_size=5,
+            output="pandas",
+        )
+    )
+    # A last page that is exactly full is followed by one empty page, which is not yielded
+    assert [list(frame["rank"]) for frame in frames] == [[0, 1, 2, 3, 4], [5, 6, 7, 8, 9]]
+
+
+def test_paginate_requires_order_by(ranked_ops):
+    with pytest.raises(ValueError, match="ORDER BY"):
+        next(ranked_ops.paginate("MATCH (n:Item) RETURN n.id"))
+
+
+def test_explain_and_profile(ranked_ops):
+    query = "MATCH (n:Item) WHERE n.rank > $rank RETURN n.id"
+    explained = ranked_ops.explain(query, {"rank": 3})
+    logger.info(f"Query plan:\n{explained['plan']}")
+    assert explained["plan"]
+    assert explained["wall_time_ms"] >= 0
+    assert {"compiling_time_ms", "execution_time_ms"} <= explained.keys()
+
+    profiled = ranked_ops.explain(query, {"rank": 3}, profile=True)
+    assert profiled["plan"]
+
+
+class Rule(BaseModel):
+    id: str
+    title: str
+    tags: list[str]
+
+
+def test_bulk_load_updates_changed_rows_in_place(ops):
+    rules = [
+        {"id": "r1", "title": "First", "tags": ["a"]},
+        {"id": "r2", "title": "Second", "tags": ["b"]},
+        {"id": "r1", "title": "Duplicate", "tags": []},
+    ]
+    assert ops.bulk_load("Rule", Rule, rules) == 2
+    ops.create_rel_table("Covers", "Rule", "Item")
+    ops.execute(CREATE_ITEM, {"id": "i1", "rank": 1})
+    ops.execute("MATCH (r:Rule {id: 'r1'}), (i:Item {id: 'i1'}) CREATE (r)-[:Covers]->(i)")
+
+    # Reloading unchanged rows writes nothing
+    assert ops.bulk_load("Rule", Rule, rules[:2]) == 0
+
+    changed = [
+        {"id": "r1", "title": "First", "tags": ["a", "c"]},
+        rules[1],
+        {**rules[1], "id": "r3"},
+    ]
+    assert ops.bulk_load("Rule", Rule, changed) == 2
+    assert ops.execute("MATCH (r:Rule) RETURN r.id, r.title, r.tags ORDER BY r.id") == [
+        ["r1", "First", ["a", "c"]],
+        ["r2", "Second", ["b"]],
+        ["r3", "Second", ["b"]],
+    ]
+    assert ops.execute("MATCH (r:Rule)-[:Covers]->(i:Item) RETURN r.id, i.id") == [["r1", "i1"]]
+
+
+def test_stored_keys(ops):
+    ops.write_batch(CREATE_ITEM, [{"id": "a", "rank": 1}, {"id": "b", "rank": 2}])
+    assert ops.stored_keys("Item", ["a", "b", "missing"]) == {"a", "b"}
+    assert ops.stored_keys("Item", []) == set()
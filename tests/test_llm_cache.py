@@ -0,0 +1,78 @@
+import pickle
+
+import pytest
+from loguru import logger
+
+from ragintel.stolons.runners import llm_cache
+from ragintel.stolons.runners.llm_cache import LLMResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMResponseCache(db_path=tmp_path / "llm_cache.sqlite")
+    yield cache
+    cache.close()
+
+
+def test_key_depends_on_settings_prompt_and_schema(cache):
+    key = cache.key("gpt-4o", 0.0, 1.0, 512, "prompt", "text")
+    assert key == cache.key("gpt-4o", 0.0, 1.0, 512, "prompt", "text")
+    assert key != cache.key("gpt-4o-mini", 0.0, 1.0, 512, "prompt", "text")
+    assert key != cache.key("gpt-4o", 0.0, 0.9, 512, "prompt", "text")
+    assert key != cache.key("gpt-4o", 0.0, 1.0, 1024, "prompt", "text")
+    assert key != cache.key("gpt-4o", 0.0, 1.0, 512, "other prompt", "text")
+    assert key != cache.key("gpt-4o", 0.0, 1.0, 512, "prompt", '{"type": "object"}')
+
+
+def test_round_trip_and_temperature_guard(cache):
+    assert cache.get(b"key") is None
+    cache.put(b"key", '{"article_name": "Über"}')
+    assert cache.get(b"key") == '{"article_name": "Über"}'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    assert cache.cacheable(0.0)
+    assert cache.cacheable(None)
+    assert not cache.cacheable(0.7)
+    assert LLMResponseCache(db_path=cache.db_path, max_temperature=1.0).cacheable(0.7)
+
+
+def test_expires_after_ttl(tmp_path, monkeypatch):
+    cache = LLMResponseCache(db_path=tmp_path / "llm_cache.sqlite", ttl=60)
+    now = llm_cache.time.time()
+    cache.put(b"old", "old")
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now + 30)
+    cache.put(b"new", "new")
+
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now + 61)
+    assert cache.get(b"old") is None
+    assert cache.get(b"new") == "new"
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now + 91)
+    assert cache.purge_expired() == 1
+    assert cache.get(b"new") is None
+    cache.close()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = LLMResponseCache(db_path=tmp_path / "llm_cache.sqlite", max_bytes=1000)
+    keys = [bytes([i]) for i in range(15)]
+    for key in keys[:9]:
+        cache.put(key, "x" * 100)
+    cache.get(keys[0])
+    for key in keys[9:]:
+        cache.put(key, "x" * 100)
+
+    remaining = [key for key in keys if cache.get(key) is not None]
+    logger.info(f"{len(remaining)} responses left after eviction")
+    assert len(remaining) * 100 <= 1000
+    assert keys[0] in remaining
+    assert keys[-1] in remaining
+    assert keys[1] not in remaining
+    cache.close()
+
+
+def test_pickles_by_path(cache):
+    cache.put(b"key", "value")
+    copy = pickle.loads(pickle.dumps(cache))
+    assert (copy.db_path, copy.ttl) == (cache.db_path, cache.ttl)
+    assert copy.get(b"key") == "value"
+    copy.close()
@@ -0,0 +1,162 @@
+import json
+
+import pytest
+from loguru import logger
+
+from ragintel.nodes.detections import SigmaNode
+from ragintel.tools.archivers.kuzudb import KuzuOps
+from ragintel.tools.loaders.mitre import MitreLoader
+from ragintel.tools.loaders.mitre.base import iter_stix_objects
+
+
+def attack_object(stix_type, stix_id, attack_id, name, domain="enterprise-attack", **extra):
+    source = "mitre-attack" if domain == "enterprise-attack" else "mitre-mobile-attack"
+    return {
+        "type": stix_type,
+        "id": stix_id,
+        "name": name,
+        "description": f"{name} description",
+        "external_references": [
+            {"source_name": source, "external_id": attack_id, "url": f"https://attack/{attack_id}"}
+        ],
+        "x_mitre_domains": [domain],
+        "x_mitre_version": "1.0",
+        **extra,
+    }
+
+
+def relationship(source_ref, relationship_type, target_ref):
+    return {
+        "type": "relationship",
+        "id": f"relationship--{source_ref}-{target_ref}",
+        "relationship_type": relationship_type,
+        "source_ref": source_ref,
+        "target_ref": target_ref,
+        "description": f"{source_ref} {relationship_type} {target_ref}",
+    }
+
+
+def execution_phase():
+    return [{"kill_chain_name": "mitre-attack", "phase_name": "execution"}]
+
+
+@pytest.fixture
+def bundles(tmp_path):
+    enterprise = [
+        # Relationships may come before the objects they reference
+        relationship("intrusion-set--apt", "uses", "attack-pattern--powershell"),
+        attack_object("x-mitre-tactic", "x-mitre-tactic--execution", "TA0002", "Execution",
+                      x_mitre_shortname="execution"),
+        attack_object("attack-pattern", "attack-pattern--interpreter", "T1059", "Interpreter",
+                      kill_chain_phases=execution_phase(), x_mitre_platforms=["Windows"]),
+        attack_object("attack-pattern", "attack-pattern--powershell", "T1059.001", "PowerShell",
+                      kill_chain_phases=execution_phase(), x_mitre_is_subtechnique=True),
+        attack_object("attack-pattern", "attack-pattern--old", "T1086", "Old PowerShell",
+                      x_mitre_deprecated=True),
+        attack_object("intrusion-set", "intrusion-set--apt", "G0007", "APT28",
+                      aliases=["APT28", "Sofacy"]),
+        attack_object("tool", "tool--cmd", "S0106", "cmd", x_mitre_aliases=["cmd"]),
+        attack_object("course-of-action", "course-of-action--ep", "M1038", "Execution Prevention"),
+        {"type": "identity", "id": "identity--mitre", "name": "The MITRE Corporation"},
+        relationship("attack-pattern--powershell", "subtechnique-of", "attack-pattern--interpreter"),
+        relationship("intrusion-set--apt", "uses", "tool--cmd"),
+        relationship("tool--cmd", "uses", "attack-pattern--interpreter"),
+        relationship("course-of-action--ep", "mitigates", "attack-pattern--interpreter"),
+        relationship("intrusion-set--apt", "uses", "attack-pattern--old"),
+    ]  # fmt: skip
+    mobile = [
+        attack_object("intrusion-set", "intrusion-set--apt", "G0007", "APT28", "mobile-attack",
+                      aliases=["APT28"]),
+    ]  # fmt: skip
+
+    paths = []
+    for name, objects in (("enterprise-attack", enterprise), ("mobile-attack", mobile)):
+        path = tmp_path / f"{name}.json"
+        path.write_text(json.dumps({"type": "bundle", "id": f"bundle--{name}", "objects": objects}))
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture
+def kuzu_ops(tmp_path):
+    ops = KuzuOps(db_path=tmp_path / "graph")
+    yield ops
+    ops.close()
+
+
+def scalar(kuzu_ops, query):
+    return next(kuzu_ops.query(query)).column(0).to_pylist()
+
+
+def test_streaming_decoder_matches_json_load(bundles, monkeypatch):
+    monkeypatch.setattr("ragintel.tools.loaders.mitre.base.HAS_IJSON", False)
+    expected = json.loads(bundles[0].read_text())["objects"]
+    assert list(iter_stix_objects(bundles[0], chunk_size=64)) == expected
+
+
+def test_streaming_decoder_rejects_malformed_json(tmp_path, monkeypatch):
+    monkeypatch.setattr("ragintel.tools.loaders.mitre.base.HAS_IJSON", False)
+    # Strings much longer than a chunk still decode
+    long_object = {"type": "identity", "id": "identity--long", "description": "x" * 1000}
+    objects = [long_object, {"type": "identity", "id": "identity--bad"}, long_object]
+    text = json.dumps({"type": "bundle", "objects": objects})
+    bundle = tmp_path / "bundle.json"
+    bundle.write_text(text)
+    assert list(iter_stix_objects(bundle, chunk_size=64)) == objects
+
+    # A missing colon is reported right away, with the decoder's message and its position
+    bad = text.replace('"id": "identity--bad"', '"id" "identity--bad"')
+    bundle.write_text(bad)
+    decoded = iter_stix_objects(bundle, chunk_size=64)
+    assert next(decoded) == long_object
+    with pytest.raises(ValueError, match="Expecting ':' delimiter") as error:
+        next(decoded)
+    logger.info(f"Malformed bundle: {error.value}")
+    position = bad.index('"identity--bad"')
+    assert f"at character {position}" in str(error.value)
+
+    bundle.write_text(text[:-200])
+    with pytest.raises(ValueError, match="ends inside its objects array"):
+        list(iter_stix_objects(bundle, chunk_size=64))
+
+
+def test_load_attack_graph(bundles, kuzu_ops):
+    kuzu_ops.bulk_load(
+        "SigmaRule",
+        SigmaNode,
+        [
+            {
+                "source_url": "NA", "title": "Encoded PowerShell", "id": "rule-1",
+                "status": "test", "description": "NA", "references": [], "author": "NA",
+                "date": "NA", "modified": "NA", "tags": ["attack.execution", "attack.t1059.001"],
+                "logsource": [], "detection": [], "falsepositives": [], "level": "high",
+                "raw_document": "NA",
+            }
+        ],
+    )  # fmt: skip
+
+    counts = MitreLoader(kuzu_ops).load_mitre_attack(bundles)
+    logger.info(f"Loaded {counts}")
+    assert counts["AttackTechnique"] == 2
+    assert counts["AttackGroup"] == 1
+    assert counts["GroupUsesTechnique"] == 1
+    assert counts["TechniqueInTactic"] == 2
+    assert counts["DetectsTechnique"] == 1
+
+    assert scalar(kuzu_ops, "MATCH (g:AttackGroup) RETURN g.domains") == [
+        ["enterprise-attack", "mobile-attack"]
+    ]
+    assert scalar(
+        kuzu_ops,
+        "MATCH (r:SigmaRule)-[:DetectsTechnique]->(:AttackTechnique)-[:SubtechniqueOf]->"
+        "(:AttackTechnique)<-[:MitigatesTechnique]-(m:AttackMitigation) RETURN m.id",
+    ) == ["M1038"]
+    assert scalar(
+        kuzu_ops,
+        "MATCH (:AttackGroup)-[:GroupUsesSoftware]->(:AttackSoftware)-[:SoftwareUsesTechnique]->"
+        "(t:AttackTechnique)-[:TechniqueInTactic]->(a:AttackTactic) RETURN t.id + ' ' + a.id",
+    ) == ["T1059 TA0002"]
+
+    # Loading the same bundles again writes nothing new
+    again = MitreLoader(kuzu_ops).load_mitre_attack(bundles)
+    assert not any(again.values())
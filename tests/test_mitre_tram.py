@@ -0,0 +1,170 @@
+import numpy as np
+import pytest
+from loguru import logger
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from ragintel.stolons.runners.mitre_tram import MitreTRAMInteractor  # noqa: E402
+from ragintel.stolons.runners.tram_cache import WindowPredictionCache  # noqa: E402
+
+WORDS = [
+    "the", "actor", "used", "powershell", "to", "download", "a", "loader", "that", "injects",
+    "into", "lsass", "and", "dumps", "credentials", "before", "moving", "laterally", "over",
+    "rdp", "with", "stolen", "accounts",
+]  # fmt: skip
+
+REPORT = " ".join(WORDS * 4)
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp("tram")
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", ",", ".", *sorted(set(WORDS))]
+    (path / "vocab.txt").write_text("\n".join(vocab))
+    tokenizer = transformers.BertTokenizerFast(vocab_file=str(path / "vocab.txt"))
+    tokenizer.save_pretrained(path)
+
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        num_labels=50,
+        problem_type="multi_label_classification",
+    )
+    transformers.BertForSequenceClassification(config).save_pretrained(path)
+    return path
+
+
+@pytest.fixture(scope="module")
+def interactor(model_dir):
+    return MitreTRAMInteractor(
+        model_path=str(model_dir), tokenizer_path=str(model_dir), device="cpu", num_threads=1
+    )
+
+
+def test_dynamic_padding_matches_max_length_padding(interactor):
+    texts = [*interactor.create_subsequences(REPORT), "powershell"]
+    probabilities = interactor.predict_proba(texts, show_progress=False)
+
+    padded = interactor.tokenizer(
+        texts, return_tensors="pt", padding="max_length", truncation=True, max_length=512
+    ).input_ids
+    with torch.inference_mode():
+        reference = interactor.bert(padded, attention_mask=padded.ne(0).long()).logits.sigmoid()
+
+    assert probabilities.shape == (len(texts), len(interactor.CLASSES))
+    assert probabilities == pytest.approx(reference.numpy(), abs=1e-4)
+
+
+def test_batches_respect_token_budget(interactor):
+    lengths = torch.randint(3, 40, (200,)).numpy()
+    interactor.max_batch_tokens = 256
+    batches = list(interactor._iter_batches(lengths))
+    interactor.max_batch_tokens = 8192
+
+    assert sorted(index for batch in batches for index in batch) == list(range(200))
+    for batch in batches:
+        assert len(batch) == 1 or len(batch) * lengths[batch].max() <= 256
+
+
+def test_predict_multi_label_covers_document(interactor):
+    result = interactor.predict_multi_label(REPORT, threshold=0.5)
+    assert list(result.columns) == ["segment", "label(s)", "start", "end"]
+    for segment, start, end in zip(result["segment"], result["start"], result["end"], strict=True):
+        assert REPORT[start:end] == segment
+    assert " ".join(result["segment"]).split()[-1] == WORDS[-1]
+    assert interactor.predict_multi_label("").empty
+
+
+def test_token_windows_match_word_windows(interactor):
+    document = "The actor,  used\tpowershell.\n\n" + " ".join(WORDS[4:] * 2) + "  "
+    windows = interactor.tokenize_windows(document, n=13, stride=5)
+    texts = interactor.create_subsequences(document, n=13, stride=5)
+
+    assert windows.count == len(texts)
+    for i, text in enumerate(texts):
+        expected = interactor.tokenizer(text, add_special_tokens=False).input_ids
+        assert windows.window(i).tolist() == expected
+        assert windows.text(i).split() == text.split()
+
+    probabilities = interactor.predict_token_windows(
+        [windows.window(i) for i in range(windows.count)],
+        show_progress=False,
+        add_special_tokens=True,
+    )
+    assert probabilities == pytest.approx(
+        interactor.predict_proba(texts, show_progress=False), abs=1e-5
+    )
+
+
+def test_onnx_backend_is_cached_and_verified(model_dir, tmp_path):
+    pytest.importorskip("onnxruntime")
+    onnx_dir = tmp_path / "onnx"
+    kwargs = {
+        "model_path": str(model_dir),
+        "tokenizer_path": str(model_dir),
+        "device": "cpu",
+        "num_threads": 1,
+        "backend": "onnx",
+        "onnx_dir": str(onnx_dir),
+        "onnx_sessions": 2,
+        "agreement_tolerance": 1.0,
+    }
+    interactor = MitreTRAMInteractor(**kwargs)
+    assert interactor.onnx_backend is not None
+    assert interactor.bert is None
+    assert 0.0 <= interactor.onnx_backend.metadata["agreement"] <= 1.0
+
+    # The second instance reuses the export and never loads the PyTorch model
+    cached = MitreTRAMInteractor(**kwargs)
+    assert cached.bert is None
+    assert len(list(onnx_dir.glob("*/model.int8.onnx"))) == 1
+
+    texts = cached.create_subsequences(REPORT)
+    assert cached.predict_proba(texts, show_progress=False).shape == (len(texts), 50)
+
+
+def test_predict_many_matches_single_documents(interactor):
+    documents = [REPORT, "", " ".join(WORDS[:7]), " ".join(reversed(WORDS * 2)), REPORT[:60]]
+    expected = [interactor.predict_multi_label(document) for document in documents]
+
+    for workers in (None, 2):
+        results = list(interactor.predict_many(documents, workers=workers, docs_per_task=2))
+        assert len(results) == len(documents)
+        for result, reference in zip(results, expected, strict=True):
+            assert result["segment"].tolist() == reference["segment"].tolist()
+            assert result["label(s)"].tolist() == reference["label(s)"].tolist()
+
+
+def test_prediction_cache_skips_known_windows(interactor, tmp_path, monkeypatch):
+    windows = interactor.tokenize_windows(REPORT)
+    slices = [windows.window(i) for i in range(windows.count)]
+    expected = interactor.predict_token_windows(
+        slices, show_progress=False, add_special_tokens=True
+    )
+
+    forwarded = []
+    forward = interactor._forward
+    monkeypatch.setattr(
+        interactor, "_forward", lambda ids, mask: forwarded.append(len(ids)) or forward(ids, mask)
+    )
+    monkeypatch.setattr(
+        interactor, "prediction_cache", WindowPredictionCache(db_path=tmp_path / "cache.sqlite")
+    )
+
+    # Repeated windows only run once
+    first = interactor.predict_token_windows(
+        slices * 2, show_progress=False, add_special_tokens=True
+    )
+    assert sum(forwarded) == len(slices)
+    np.testing.assert_allclose(first, np.concatenate([expected, expected]), atol=1e-5)
+
+    forwarded.clear()
+    second = interactor.predict_token_windows(slices, show_progress=False, add_special_tokens=True)
+    assert not forwarded
+    assert interactor.prediction_cache.hits == len(slices)
+    np.testing.assert_allclose(second, expected, atol=1e-3)
@@ -0,0 +1,92 @@
+import io
+import sys
+import zipfile
+
+import pytest
+from loguru import logger
+
+from ragintel.tools.loaders.multi import ExtractorRegistry, MultiLoader, registry
+from ragintel.tools.loaders.multi.registry import DOCX_MIME
+
+DOCX_EXTRACTOR = "ragintel.tools.loaders.multi.docx_extractor"
+
+
+def zip_bytes(name: str, data: str) -> bytes:
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w") as archive:
+        archive.writestr(name, data)
+    return content.getvalue()
+
+
+@pytest.mark.parametrize(
+    ("content", "file_name", "mime_type"),
+    [
+        # Content wins over a misleading file name
+        (b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n", "report.txt", "application/pdf"),
+        (b"<!DOCTYPE html><html><body><p>report</p></body></html>", "report", "text/html"),
+        # Generic answers fall back to the file name
+        (b"# Report\n\nSome notes\n", "report.md", "text/markdown"),
+        (b"technique,tactic\nT1059,execution\n", "techniques.csv", "text/csv"),
+        (zip_bytes("word/other.xml", "<w:document/>"), "report.docx", DOCX_MIME),
+        (b"\x00" * 64, "techniques.csv", "text/csv"),
+        (b"\x00" * 64, "blob.bin", "application/octet-stream"),
+    ],
+)
+def test_sniff(content, file_name, mime_type):
+    pytest.importorskip("magic")
+    buffer = io.BytesIO(content)
+    assert ExtractorRegistry().sniff(buffer, file_name) == mime_type
+    assert buffer.tell() == 0
+
+
+def test_sniff_falls_back_to_suffix_without_libmagic(monkeypatch):
+    monkeypatch.setitem(sys.modules, "magic", None)
+    extractors = ExtractorRegistry()
+    assert extractors.sniff(io.BytesIO(b"%PDF-1.4\n"), "report.pdf") == "application/pdf"
+    assert extractors.sniff(io.BytesIO(b"%PDF-1.4\n"), "report.docx") == DOCX_MIME
+    assert extractors.sniff(io.BytesIO(b"%PDF-1.4\n")) == "application/octet-stream"
+
+
+def test_extractors_are_imported_on_first_use(monkeypatch):
+    monkeypatch.delitem(sys.modules, DOCX_EXTRACTOR, raising=False)
+    imported = []
+    import_module = registry.importlib.import_module
+
+    def tracking_import_module(name):
+        imported.append(name)
+        return import_module(name)
+
+    monkeypatch.setattr(registry.importlib, "import_module", tracking_import_module)
+    extractors = ExtractorRegistry()
+    extractors.get("text/plain")
+    assert DOCX_EXTRACTOR not in sys.modules
+
+    extract = extractors.get(DOCX_MIME)
+    assert extractors.get(DOCX_MIME) is extract
+    logger.info(f"Imported extractor modules {imported}")
+    assert imported.count(DOCX_EXTRACTOR) == 1
+    assert extract is sys.modules[DOCX_EXTRACTOR].extract
+    assert extractors.extractor_id(DOCX_MIME).startswith(f"{DOCX_EXTRACTOR}.extract:")
+
+
+def test_register_replaces_extractor():
+    extractors = ExtractorRegistry()
+    with pytest.raises(ValueError, match="application/rtf"):
+        extractors.get("application/rtf")
+
+    extractors.register("application/rtf", "ragintel.tools.loaders.multi.text_extractor:extract")
+    assert extractors.get("application/rtf")(io.BytesIO(b"  rich\n text ")) == "rich text"
+
+    extractors.register("application/rtf", str.upper)
+    assert extractors.get("application/rtf") is str.upper
+
+
+def test_extract_and_parse_text_from_file():
+    content = b"<html><body><p>Threat</p>\n<p>report</p></body></html>"
+    assert ExtractorRegistry().extract(io.BytesIO(content), "report.html") == "Threat report"
+    assert MultiLoader().parse_text_from_file("report.html", io.BytesIO(content)) == "Threat report"
+
+    extractors = ExtractorRegistry()
+    extractors.register("text/html", lambda _: "custom")
+    loader = MultiLoader(registry=extractors)
+    assert loader.parse_text_from_file("report.html", io.BytesIO(content)) == "custom"
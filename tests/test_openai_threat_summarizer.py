@@ -0,0 +1,166 @@
+import multiprocessing
+from types import SimpleNamespace
+
+import pytest
+from langchain.docstore.document import Document
+from langchain.output_parsers import PydanticOutputParser
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from loguru import logger
+
+pytest.importorskip("langchain_openai")
+
+from ragintel.stolons.runners import openai_threat_summarizer
+from ragintel.stolons.runners.llm_cache import LLMResponseCache
+from ragintel.stolons.runners.openai_threat_summarizer import (
+    CHAIN_CACHE_SIZE,
+    OpenAIInteractor,
+)
+from ragintel.stolons.templates import RagIntelMITRE
+
+SUMMARY = '{"article_name": "Report", "mitre_ttps": ["T1059.001"], "short_description": "PS"}'
+ECHO_TEMPLATE = "{context}|{query}"
+
+
+def echo(prompt):
+    text = prompt.to_messages()[-1].content
+    if "boom" in text:
+        raise ValueError(text)
+    return AIMessage(content=text)
+
+
+@pytest.fixture
+def interactor():
+    retriever = RunnableLambda(lambda query: [Document(page_content=f"context of {query}")])
+    rag_db = SimpleNamespace(vector_store=SimpleNamespace(as_retriever=lambda: retriever))
+    interactor = OpenAIInteractor(api_key="test", rag_db=rag_db)
+    interactor._llm = RunnableLambda(echo)
+    return interactor
+
+
+def test_builds_one_chain_per_template_and_model(interactor):
+    chain = interactor._text_chain("simple_text", None)
+    assert interactor._text_chain("simple_text", None) is chain
+    assert interactor._text_chain("prompt_json", None) is not chain
+
+    structured = interactor._structured_chain(None, None)
+    assert interactor._structured_chain(RagIntelMITRE, None) is structured
+    assert interactor._structured_chain(None, "{context} {query} {format_instructions}") is not (
+        structured
+    )
+    assert len(interactor._chains) == 4
+
+
+def test_evicts_least_recently_used_chain(interactor):
+    templates = [f"{i} {{context}} {{query}}" for i in range(CHAIN_CACHE_SIZE + 1)]
+    first = interactor._text_chain("simple_text", templates[0])
+    for template in templates[1:-1]:
+        interactor._text_chain("simple_text", template)
+    interactor._text_chain("simple_text", templates[0])
+    interactor._text_chain("simple_text", templates[-1])
+
+    assert len(interactor._chains) == CHAIN_CACHE_SIZE
+    assert ("text", templates[0]) in interactor._chains
+    assert ("text", templates[1]) not in interactor._chains
+    assert interactor._text_chain("simple_text", templates[0]) is first
+
+
+def test_interact_many_keeps_order(interactor):
+    queries = [f"query {i}" for i in range(20)]
+    answers = interactor.interact_many(queries, template=ECHO_TEMPLATE, max_concurrency=4)
+    assert answers == [f"context of {query}|{query}" for query in queries]
+    assert interactor.interact("query 3", template=ECHO_TEMPLATE) == answers[3]
+
+
+def test_interact_many_returns_exceptions(interactor):
+    answers = interactor.interact_many(
+        ["one", "boom", "three"], template=ECHO_TEMPLATE, return_exceptions=True
+    )
+    assert answers[0] == "context of one|one"
+    assert isinstance(answers[1], ValueError)
+    assert answers[2] == "context of three|three"
+
+    with pytest.raises(ValueError, match="boom"):
+        interactor.interact_many(["one", "boom"], template=ECHO_TEMPLATE)
+
+
+def test_structured_returns_parsed_models(interactor):
+    interactor._llm = FakeListChatModel(responses=[SUMMARY])
+    summary = interactor.interact_structured("report")
+    assert isinstance(summary, RagIntelMITRE)
+    assert summary.mitre_ttps == ["T1059.001"]
+
+    summaries = interactor.interact_structured_many(["a", "b", "c"])
+    assert summaries == [summary] * 3
+
+
+def _interact_in_child(interactor, results):
+    results.put(interactor.interact_many(["child"], template=ECHO_TEMPLATE))
+
+
+def test_interact_many_after_fork(interactor):
+    # Starts the shared loop in the parent, whose thread does not survive a fork
+    assert interactor.interact_many(["parent"], template=ECHO_TEMPLATE)
+    parent_loop = openai_threat_summarizer.shared_loop()
+    assert parent_loop.started
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    child = context.Process(target=_interact_in_child, args=(interactor, results))
+    child.start()
+    try:
+        answers = results.get(timeout=30)
+    finally:
+        child.join(timeout=30)
+        if child.is_alive():
+            child.kill()
+
+    logger.info(f"Child process answered {answers}")
+    assert answers == ["context of child|child"]
+    assert child.exitcode == 0
+    assert openai_threat_summarizer.shared_loop() is parent_loop
+
+
+@pytest.fixture
+def response_cache(tmp_path):
+    cache = LLMResponseCache(db_path=tmp_path / "llm_cache.sqlite")
+    yield cache
+    cache.close()
+
+
+def test_cache_hit_skips_model_and_parser(interactor, response_cache, monkeypatch):
+    # The fake model cycles through its responses, so .i counts the calls
+    model = FakeListChatModel(responses=[SUMMARY] * 10)
+    interactor._llm = model
+    interactor.response_cache = response_cache
+    summary = interactor.interact_structured("report")
+    assert model.i == 1
+
+    def fail(*args, **kwargs):
+        msg = "output parser called on a cache hit"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr(PydanticOutputParser, "parse_result", fail)
+    assert interactor.interact_structured("report") == summary
+    assert interactor.interact_structured_many(["report", "report"]) == [summary] * 2
+    assert model.i == 1
+    assert response_cache.hits == 3
+
+    # Another prompt misses the cache, so it goes through the parser
+    with pytest.raises(AssertionError, match="output parser"):
+        interactor.interact_structured("other report")
+
+
+def test_cache_skipped_above_max_temperature(response_cache):
+    retriever = RunnableLambda(lambda _: [])
+    rag_db = SimpleNamespace(vector_store=SimpleNamespace(as_retriever=lambda: retriever))
+    interactor = OpenAIInteractor(
+        api_key="test", rag_db=rag_db, response_cache=response_cache, temperature=0.7
+    )
+    model = FakeListChatModel(responses=["answer"] * 10)
+    interactor._llm = model
+    assert interactor.interact_many(["q", "q"]) == ["answer", "answer"]
+    assert interactor.interact("q") == "answer"
+    assert model.i == 3
+    assert response_cache.hits + response_cache.misses == 0
@@ -0,0 +1,111 @@
+import io
+
+import pdfplumber
+import pytest
+from loguru import logger
+
+from ragintel.tools.loaders.multi import pdf_extractor
+from ragintel.tools.loaders.multi.pdf_extractor import extract, iter_pdf_pages
+
+# Pages 4 and 7 are scanned, i.e. they only show an image
+PAGES = [None if number in (4, 7) else f"Page {number} text" for number in range(1, 12)]
+EXPECTED = [(number, text) for number, text in enumerate(PAGES, start=1) if text is not None]
+
+
+def build_pdf(pages: list[str | None]) -> bytes:
+    """
+    Writes a minimal PDF with one page per item: a line of text, or an image for None.
+    """
+    font, image = 3, 4
+    objects = {
+        font: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        image: (
+            b"<< /Type /XObject /Subtype /Image /Width 1 /Height 1 /ColorSpace /DeviceGray "
+            b"/BitsPerComponent 8 /Length 1 >>\nstream\n\xff\nendstream"
+        ),
+    }
+    page_ids = []
+    for index, text in enumerate(pages):
+        page_id, content_id = 5 + 2 * index, 6 + 2 * index
+        if text is None:
+            resources = f"<< /XObject << /Im1 {image} 0 R >> >>"
+            content = b"q 100 0 0 100 72 600 cm /Im1 Do Q"
+        else:
+            resources = f"<< /Font << /F1 {font} 0 R >> >>"
+            content = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources {resources} /Contents {content_id} 0 R >>"
+        ).encode()
+        objects[content_id] = (
+            f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream"
+        )
+        page_ids.append(page_id)
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(pdf)
+        pdf += f"{object_id} 0 obj\n".encode() + objects[object_id] + b"\nendobj\n"
+
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for object_id in sorted(objects):
+        pdf += f"{offsets[object_id]:010d} 00000 n \n".encode()
+    pdf += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    )
+    return bytes(pdf)
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(build_pdf(PAGES))
+    return path
+
+
+def test_pages_are_yielded_in_order_without_scanned_pages(pdf_path):
+    assert list(iter_pdf_pages(pdf_path)) == EXPECTED
+
+
+def test_parallel_page_ranges_match_sequential(pdf_path):
+    # 11 pages in ranges of 2 give 6 tasks for 2 workers, so ranges complete out of order
+    pages = list(iter_pdf_pages(pdf_path, workers=2, pages_per_task=2))
+    logger.info(f"Extracted pages {[number for number, _ in pages]}")
+    assert pages == EXPECTED
+
+
+def test_bytes_source_and_extract(pdf_path, monkeypatch):
+    content = io.BytesIO(pdf_path.read_bytes())
+    assert list(iter_pdf_pages(content, workers=2, pages_per_task=3)) == EXPECTED
+
+    # Without workers the bytes are read in place, never written to a temporary file
+    def fail(*args, **kwargs):
+        msg = "in-memory PDF spilled to disk"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr(pdf_extractor.tempfile, "TemporaryDirectory", fail)
+    assert list(iter_pdf_pages(io.BytesIO(pdf_path.read_bytes()))) == EXPECTED
+    assert extract(io.BytesIO(pdf_path.read_bytes())) == " ".join(text for _, text in EXPECTED)
+
+
+def test_scanned_pages_are_not_parsed(pdf_path, monkeypatch):
+    with pdfplumber.open(pdf_path) as pdf:
+        layers = [pdf_extractor._page_has_text_layer(page) for page in pdf.pages]
+    assert layers == [text is not None for text in PAGES]
+
+    parsed = []
+    extract_text = pdfplumber.page.Page.extract_text
+
+    def tracking_extract_text(page, *args, **kwargs):
+        parsed.append(page.page_number)
+        return extract_text(page, *args, **kwargs)
+
+    monkeypatch.setattr(pdfplumber.page.Page, "extract_text", tracking_extract_text)
+    assert list(iter_pdf_pages(pdf_path)) == EXPECTED
+    assert parsed == [number for number, _ in EXPECTED]
@@ -0,0 +1,55 @@
+import pyarrow as pa
+import pytest
+from loguru import logger
+from pydantic import BaseModel
+
+from ragintel.nodes.detections import KQLNode, SigmaNode
+from ragintel.utils.adaptors.pydantic import PydanticAdaptor
+
+
+class OptionalNode(BaseModel):
+    id: str
+    score: float | None = None
+    aliases: list[str] | None = None
+
+
+@pytest.fixture
+def adaptor():
+    return PydanticAdaptor()
+
+
+def test_schema_string_sigma(adaptor):
+    schema = adaptor.pydantic_to_schema_string(SigmaNode)
+    assert "  references STRING[]," in schema
+    assert "  title STRING," in schema
+    assert schema.endswith("PRIMARY KEY (id)")
+
+
+def test_schema_string_optional(adaptor):
+    schema = adaptor.pydantic_to_schema_string(OptionalNode)
+    assert "  score DOUBLE," in schema
+    assert "  aliases STRING[]," in schema
+
+
+def test_arrow_schema_matches_model(adaptor):
+    schema = adaptor.pydantic_to_arrow_schema(OptionalNode)
+    assert schema.names == ["id", "score", "aliases"]
+    assert not schema.field("id").nullable
+    assert schema.field("score").nullable
+    assert schema.field("aliases").type == pa.list_(pa.string())
+
+
+def test_arrow_table_fills_defaults(adaptor):
+    rows = [
+        {"source_url": "https://example.com/a", "title": "a", "id": "1", "raw_document": "x"},
+        KQLNode(source_url="https://example.com/b", title="b", id="2", raw_document="y"),
+    ]
+    table = adaptor.pydantic_to_arrow_table(KQLNode, rows)
+    assert table.num_rows == 2
+    assert table.column("node_subtype").to_pylist() == ["kql", "kql"]
+
+
+def test_arrow_table_drops_invalid_rows(adaptor):
+    rows = [{"id": "1", "score": 0.5}, {"id": None, "score": 1.0}, {"id": "3", "score": "high"}]
+    table = adaptor.pydantic_to_arrow_table(OptionalNode, rows)
+    assert table.column("id").to_pylist() == ["1"]
@@ -0,0 +1,196 @@
+import json
+import os
+
+import pytest
+from loguru import logger
+
+from ragintel.tools.interactors.mitre import (
+    CAPECAttackPatterns,
+    CAPECCoursesOfAction,
+    StixStore,
+    stix_store,
+)
+
+
+def attack_pattern(number, name, description, modified="2022-01-01T00:00:00.000Z"):
+    return {
+        "type": "attack-pattern",
+        "id": f"attack-pattern--{number}",
+        "name": name,
+        "description": description,
+        "modified": modified,
+        "external_references": [
+            {"source_name": "capec", "external_id": f"CAPEC-{number}"},
+            {"source_name": "cwe", "external_id": "CWE-89"},
+        ],
+    }
+
+
+OBJECTS = [
+    attack_pattern(66, "SQL Injection", "An adversary crafts SQL statements.", "2021-01-01"),
+    attack_pattern(66, "SQL Injection", "Crafted SQL statements reach the database.", "2023-01-01"),
+    attack_pattern(7, "Blind SQL Injection", "Injection without error messages."),
+    attack_pattern(63, "Cross-Site Scripting (XSS)", "Scripts injected into web pages."),
+    {
+        "type": "course-of-action",
+        "id": "course-of-action--1",
+        "name": "Use parameterized queries",
+        "description": "Bind variables instead of concatenating SQL.",
+    },
+    {
+        "type": "relationship",
+        "id": "relationship--1",
+        "relationship_type": "mitigates",
+        "source_ref": "course-of-action--1",
+        "target_ref": "attack-pattern--66",
+    },
+]  # fmt: skip
+
+
+@pytest.fixture
+def capec_folder(tmp_path, monkeypatch):
+    monkeypatch.setenv("RAGINTEL_STIX_SNAPSHOT_DIR", str(tmp_path / "default_snapshots"))
+    # Laid out like a stix2 FileSystemSource, with two versions of CAPEC-66
+    for index, obj in enumerate(OBJECTS):
+        folder = tmp_path / "capec" / obj["type"]
+        folder.mkdir(parents=True, exist_ok=True)
+        bundle = {"type": "bundle", "id": f"bundle--{index}", "objects": [obj]}
+        (folder / f"{obj['id']}-{index}.json").write_text(json.dumps(bundle))
+    return tmp_path / "capec"
+
+
+@pytest.fixture
+def store(capec_folder):
+    return StixStore.from_path(capec_folder)
+
+
+def test_hash_indexes(store):
+    assert len(store) == 5
+    assert store.get("attack-pattern--66").description.startswith("Crafted")
+    assert store.get("attack-pattern--66", stix_type="course-of-action") is None
+    assert [r.id for r in store.of_type("relationship")] == ["relationship--1"]
+    assert [r.id for r in store.lookup_external_id("CAPEC-7", source_name="capec")] == [
+        "attack-pattern--7"
+    ]
+    assert store.lookup_external_id("CAPEC-7", source_name="cwe") == []
+    assert len(store.lookup_external_id("CWE-89", stix_type="attack-pattern")) == 3
+
+
+def test_search(store):
+    def names(field, text):
+        return {r.name for r in store.search(field, text, stix_type="attack-pattern")}
+
+    assert names("name", "sql injection") == {"SQL Injection", "Blind SQL Injection"}
+    assert names("name", "Inj") == {"SQL Injection", "Blind SQL Injection"}
+    assert names("name", "injection sql") == set()
+    assert names("description", "inject") == {"Blind SQL Injection", "Cross-Site Scripting (XSS)"}
+    assert names("description", "") == set()
+    with pytest.raises(ValueError, match="not indexed"):
+        store.search("aliases", "sql")
+
+
+def test_interactors_share_the_store(capec_folder):
+    attack_patterns = CAPECAttackPatterns(str(capec_folder))
+    courses_of_action = CAPECCoursesOfAction(str(capec_folder))
+    assert attack_patterns.store is courses_of_action.store
+
+    # The methods are wrapped as LangChain tools, call the underlying functions directly
+    found = CAPECAttackPatterns.get_attack_pattern_by_capec_id.func(attack_patterns, "66")
+    logger.info(f"Found {found}")
+    assert [r.name for r in found] == ["SQL Injection"]
+
+    mitigations = list(
+        CAPECCoursesOfAction.get_relationship_by_attack_pattern_id.func(courses_of_action, found)
+    )
+    assert [[r.source_ref for r in group] for group in mitigations] == [["course-of-action--1"]]
+
+
+def test_adjacency_and_multi_hop(store):
+    mitigations = store.relationships_of(["attack-pattern--66", "attack-pattern--7"], "mitigates")
+    assert [r.id for r in mitigations["attack-pattern--66"]] == ["relationship--1"]
+    assert mitigations["attack-pattern--7"] == []
+    assert store.relationships_of(["course-of-action--1"], direction="outgoing") == {
+        "course-of-action--1": [store.get("relationship--1")]
+    }
+    with pytest.raises(ValueError, match="Unknown direction"):
+        store.relationships_of(["attack-pattern--66"], direction="sideways")
+
+    # Mitigation -> pattern -> back to its mitigations
+    reached = store.traverse(
+        ["course-of-action--1"], [("mitigates", "outgoing"), ("mitigates", "incoming")]
+    )
+    assert [r.id for r in reached["course-of-action--1"]] == ["course-of-action--1"]
+
+
+def test_courses_of_action_batch_and_weakness(capec_folder):
+    courses_of_action = CAPECCoursesOfAction(str(capec_folder))
+    ids = ["attack-pattern--66", "attack-pattern--7", "attack-pattern--404"]
+
+    direct = CAPECCoursesOfAction.get_courses_of_action_by_attack_pattern_ids.func(
+        courses_of_action, ids
+    )
+    assert {key: [r.id for r in records] for key, records in direct.items()} == {
+        "attack-pattern--66": ["course-of-action--1"],
+        "attack-pattern--7": [],
+        "attack-pattern--404": [],
+    }
+
+    # CAPEC-7 is not mitigated directly, but shares CWE-89 with CAPEC-66
+    by_weakness = CAPECCoursesOfAction.get_courses_of_action_by_weakness.func(
+        courses_of_action, ids
+    )
+    assert [r.id for r in by_weakness["attack-pattern--7"]] == ["course-of-action--1"]
+    assert by_weakness["attack-pattern--404"] == []
+
+
+def test_snapshot_round_trip(capec_folder, tmp_path, monkeypatch):
+    snapshots = tmp_path / "snapshots"
+    built = StixStore.open(capec_folder, snapshots)
+    snapshot_path = StixStore.snapshot_path(capec_folder, snapshots)
+    assert snapshot_path.is_file()
+
+    opened = StixStore.open(capec_folder, snapshots)
+    assert not isinstance(opened.records, list)
+    assert not isinstance(opened._postings["name"], dict)
+    assert opened.get("attack-pattern--404") is None
+    assert [r.id for r in opened.of_type("course-of-action")] == ["course-of-action--1"]
+    assert opened.of_type("malware") == []
+    assert opened.relationships_of(["attack-pattern--66", "attack-pattern--7"]) == {
+        "attack-pattern--66": [opened.get("relationship--1")],
+        "attack-pattern--7": [],
+    }
+    assert opened.relationships_of(["attack-pattern--66"], "uses") == {"attack-pattern--66": []}
+    assert len(opened) == len(built)
+    assert opened.get("attack-pattern--66") == built.get("attack-pattern--66")
+    assert opened.get("attack-pattern--66").name == "SQL Injection"
+    for store in (built, opened):
+        assert {r.id for r in store.search("name", "sql inj")} == {
+            "attack-pattern--66",
+            "attack-pattern--7",
+        }
+        assert store.lookup_external_id("CAPEC-7", source_name="capec")[0].id == "attack-pattern--7"
+        assert [
+            r.id for r in store.neighbors(["attack-pattern--66"], "mitigates")["attack-pattern--66"]
+        ] == ["course-of-action--1"]
+
+    # Reopening an unchanged source only compares file stats, without hashing it
+    def fail(_):
+        msg = "source hashed again"
+        raise AssertionError(msg)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(stix_store, "source_hash", fail)
+        assert StixStore.open(capec_folder, snapshots).get("attack-pattern--7")
+
+    # Touching a file hashes the source again, but the content and so the snapshot are the same
+    touched = next((capec_folder / "attack-pattern").iterdir())
+    os.utime(touched, ns=(touched.stat().st_atime_ns, touched.stat().st_mtime_ns + 10**9))
+    assert StixStore.snapshot_path(capec_folder, snapshots) == snapshot_path
+
+    # Changing the source invalidates the snapshot, and the stale one is removed
+    (capec_folder / "attack-pattern" / "new.json").write_text(
+        json.dumps(attack_pattern(100, "Overflow Buffers", "Write past a buffer."))
+    )
+    updated = StixStore.open(capec_folder, snapshots)
+    assert updated.get("attack-pattern--100").name == "Overflow Buffers"
+    assert sorted(snapshots.glob("*.arrow")) == [StixStore.snapshot_path(capec_folder, snapshots)]
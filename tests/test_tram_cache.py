@@ -0,0 +1,63 @@
+import pickle
+
+import numpy as np
+import pytest
+from loguru import logger
+
+from ragintel.stolons.runners.tram_cache import WindowPredictionCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = WindowPredictionCache(db_path=tmp_path / "tram_cache.sqlite")
+    yield cache
+    cache.close()
+
+
+def test_key_depends_on_model_version_and_tokens(cache):
+    tokens = np.array([2, 10, 11, 3])
+    key = cache.key("model-a", tokens)
+    assert key == cache.key("model-a", tokens.tolist())
+    assert key != cache.key("model-b", tokens)
+    assert key != cache.key("model-a", tokens[:-1])
+
+
+def test_round_trip_as_float16(cache):
+    probabilities = np.random.default_rng(0).random((3, 50), dtype=np.float32)
+    keys = [cache.key("model", [i]) for i in range(3)]
+    cache.put_many(dict(zip(keys, probabilities, strict=True)))
+
+    found = cache.get_many([*keys, cache.key("model", [99]), keys[0]])
+    assert set(found) == set(keys)
+    for key, row in zip(keys, probabilities, strict=True):
+        assert found[key].dtype == np.float32
+        np.testing.assert_allclose(found[key], row, atol=1e-3)
+    assert (cache.hits, cache.misses) == (4, 1)
+    assert cache.hit_rate == pytest.approx(0.8)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    # Every entry holds 50 float16 probabilities, i.e. 100 bytes
+    cache = WindowPredictionCache(db_path=tmp_path / "tram_cache.sqlite", max_bytes=1000)
+    keys = [cache.key("model", [i]) for i in range(15)]
+    for key in keys[:9]:
+        cache.put_many({key: np.zeros(50)})
+    cache.get_many(keys[:1])
+    for key in keys[9:]:
+        cache.put_many({key: np.zeros(50)})
+
+    remaining = cache.get_many(keys)
+    logger.info(f"{len(remaining)} predictions left after eviction")
+    assert len(remaining) * 100 <= 1000
+    assert keys[0] in remaining
+    assert keys[-1] in remaining
+    assert keys[1] not in remaining
+    cache.close()
+
+
+def test_pickles_by_path(cache):
+    cache.put_many({b"key": np.ones(50)})
+    copy = pickle.loads(pickle.dumps(cache))
+    assert copy.db_path == cache.db_path
+    assert b"key" in copy.get_many([b"key"])
+    copy.close()